@@ -0,0 +1,335 @@
+"""Fast, row-oriented versions of the API serializers for bulk data.
+
+Running millions of objects through the DRF serializers is slow. Every field
+of every object is looked up through the model instance, and every hyperlink
+is made by calling reverse(). The serializers here are compiled once from a
+DRF serializer. They read plain values() rows, pull related IDs in one query
+per relation per chunk, and fill in URLs from templates, but they still use
+the DRF fields to represent scalar values, so the output is the same.
+
+Serializers with fields that can't be compiled raise UnsupportedFieldError,
+and callers should fall back to DRF.
+"""
+from collections import OrderedDict, defaultdict
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.db.models import QuerySet
+from rest_framework import relations, serializers
+
+from cl.audio.models import Audio
+from cl.people_db.models import Person
+from cl.search.models import Docket, Opinion, OpinionCluster
+
+# A number that won't show up in a URL by chance, used to find out where IDs
+# go in the URLs that fields make.
+URL_SENTINEL = 987654321
+
+# How to get the values that each model's get_absolute_url uses from a
+# values() row. Keys are attributes of the model instance, values are
+# lookups for values().
+ABSOLUTE_URL_LOOKUPS = {
+    Audio: OrderedDict([("pk", "pk"), ("docket.slug", "docket__slug")]),
+    Docket: OrderedDict([("pk", "pk"), ("slug", "slug")]),
+    Opinion: OrderedDict(
+        [("cluster.pk", "cluster_id"), ("cluster.slug", "cluster__slug")]
+    ),
+    OpinionCluster: OrderedDict([("pk", "pk"), ("slug", "slug")]),
+    Person: OrderedDict([("pk", "pk"), ("slug", "slug")]),
+}
+
+
+class UnsupportedFieldError(Exception):
+    """A serializer field can't be compiled into a row serializer."""
+
+
+def make_url_template(get_url: Callable, count: int = 1) -> str:
+    """Find out what a URL making function returns for every input.
+
+    :param get_url: A function that takes count sentinel values and returns
+    a URL.
+    :param count: The number of values get_url takes.
+    :return: A str.format template that takes the same values as get_url.
+    """
+    sentinels = [URL_SENTINEL + i for i in range(count)]
+    url = get_url(*sentinels)
+    if url is None:
+        raise UnsupportedFieldError("Unable to make a URL template.")
+    template = url.replace("{", "{{").replace("}", "}}")
+    for i, sentinel in enumerate(sentinels):
+        if str(sentinel) not in template:
+            raise UnsupportedFieldError("Unable to make a URL template.")
+        template = template.replace(str(sentinel), "{%s}" % i)
+    return template
+
+
+def make_fake_instance(attrs: Dict[str, Any]) -> SimpleNamespace:
+    """Make an object that has the dotted attributes in attrs."""
+    root = SimpleNamespace()
+    for path, value in attrs.items():
+        obj = root
+        parts = path.split(".")
+        for part in parts[:-1]:
+            if not hasattr(obj, part):
+                setattr(obj, part, SimpleNamespace())
+            obj = getattr(obj, part)
+        setattr(obj, parts[-1], value)
+    return root
+
+
+def get_relation_path(model: Any, source: str) -> Tuple[Any, str]:
+    """Get the model on the other side of a many relation, and the lookup
+    that leads from it back to this model.
+    """
+    try:
+        field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        raise UnsupportedFieldError("%s is not a relation." % source)
+    if field.many_to_many and not field.auto_created:
+        # A ManyToManyField on this model.
+        if field.remote_field.is_hidden():
+            raise UnsupportedFieldError("%s has no reverse." % source)
+        return field.related_model, field.related_query_name()
+    if field.one_to_many or field.many_to_many:
+        # The reverse side of a ForeignKey or ManyToManyField.
+        return field.related_model, field.field.name
+    raise UnsupportedFieldError("%s is not a many relation." % source)
+
+
+def get_ordered_queryset(model: Any) -> QuerySet:
+    """Get all of a model's rows in its default order, or by PK if it has
+    none, so that lists come out in a repeatable order.
+    """
+    qs = model.objects.all()
+    if not model._meta.ordering:
+        qs = qs.order_by("pk")
+    return qs
+
+
+class RowSerializer(object):
+    """A DRF model serializer, compiled to serialize values() rows.
+
+    :param serializer: An instance of the DRF serializer to compile. It must
+    have the same context the DRF serializer would be used with.
+    """
+
+    def __init__(self, serializer: serializers.ModelSerializer) -> None:
+        self.model = serializer.Meta.model
+        self.columns = {"pk"}
+        self.getters = []
+        self.relations = []
+        for field in serializer._readable_fields:
+            self.getters.append((field.field_name, self.compile(field)))
+
+    def get_model_field(self, field: serializers.Field) -> models.Field:
+        if len(field.source_attrs) != 1:
+            raise UnsupportedFieldError("%s has a dotted source." % field)
+        try:
+            return self.model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            raise UnsupportedFieldError("%s isn't a model field." % field)
+
+    def compile(self, field: serializers.Field) -> Callable:
+        """Make a function that gets a field's value from a row and the
+        related values.
+        """
+        request = field.context.get("request")
+        if isinstance(field, relations.HyperlinkedIdentityField):
+            if field.lookup_field != "pk":
+                raise UnsupportedFieldError(
+                    "%s isn't looked up by pk." % field
+                )
+            template = make_url_template(
+                lambda pk: field.get_url(
+                    SimpleNamespace(pk=pk), field.view_name, request, None
+                )
+            )
+            return lambda row, related: template.format(row["pk"])
+
+        if isinstance(field, relations.ManyRelatedField):
+            return self.compile_many(field, field.child_relation)
+
+        if isinstance(field, serializers.ListSerializer):
+            return self.compile_nested(field)
+
+        if isinstance(field, relations.RelatedField):
+            model_field = self.get_model_field(field)
+            if not model_field.concrete or not model_field.is_relation:
+                raise UnsupportedFieldError("%s isn't a foreign key." % field)
+            column = model_field.attname
+            self.columns.add(column)
+            if isinstance(field, relations.HyperlinkedRelatedField):
+                if field.lookup_field != "pk":
+                    raise UnsupportedFieldError(
+                        "%s isn't looked up by pk." % field
+                    )
+                template = make_url_template(
+                    lambda pk: field.get_url(
+                        SimpleNamespace(pk=pk), field.view_name, request, None
+                    )
+                )
+                return lambda row, related: (
+                    None
+                    if row[column] is None
+                    else template.format(row[column])
+                )
+            if isinstance(field, relations.PrimaryKeyRelatedField):
+                if field.pk_field is not None:
+                    raise UnsupportedFieldError("%s has a pk_field." % field)
+                return lambda row, related: row[column]
+            raise UnsupportedFieldError("%s isn't supported." % field)
+
+        if isinstance(field, serializers.BaseSerializer):
+            raise UnsupportedFieldError("%s is a nested serializer." % field)
+
+        if field.source == "get_absolute_url":
+            return self.compile_absolute_url(field)
+
+        model_field = self.get_model_field(field)
+        if model_field.is_relation:
+            raise UnsupportedFieldError("%s is a relation." % field)
+        column = model_field.attname
+        self.columns.add(column)
+        if isinstance(model_field, models.FileField):
+
+            def get_file(row, related):
+                value = row[column]
+                if value is None:
+                    return None
+                value = model_field.attr_class(None, model_field, value)
+                return field.to_representation(value)
+
+            return get_file
+
+        return lambda row, related: (
+            None
+            if row[column] is None
+            else field.to_representation(row[column])
+        )
+
+    def compile_absolute_url(self, field: serializers.Field) -> Callable:
+        try:
+            lookups = ABSOLUTE_URL_LOOKUPS[self.model]
+        except KeyError:
+            raise UnsupportedFieldError(
+                "No absolute URL lookups for %s." % self.model
+            )
+        columns = list(lookups.values())
+        self.columns.update(columns)
+        template = make_url_template(
+            lambda *values: self.model.get_absolute_url(
+                make_fake_instance(dict(zip(lookups.keys(), values)))
+            ),
+            count=len(columns),
+        )
+
+        def get_absolute_url(row, related):
+            return field.to_representation(
+                template.format(*(row[c] for c in columns))
+            )
+
+        return get_absolute_url
+
+    def compile_many(
+        self,
+        field: relations.ManyRelatedField,
+        child: relations.RelatedField,
+    ) -> Callable:
+        related_model, path = get_relation_path(self.model, field.source)
+        if isinstance(child, relations.HyperlinkedRelatedField):
+            if child.lookup_field != "pk":
+                raise UnsupportedFieldError(
+                    "%s isn't looked up by pk." % field
+                )
+            request = field.context.get("request")
+            template = make_url_template(
+                lambda pk: child.get_url(
+                    SimpleNamespace(pk=pk), child.view_name, request, None
+                )
+            )
+            represent = template.format
+        elif isinstance(child, relations.PrimaryKeyRelatedField):
+            if child.pk_field is not None:
+                raise UnsupportedFieldError("%s has a pk_field." % field)
+
+            def represent(pk):
+                return pk
+
+        else:
+            raise UnsupportedFieldError("%s isn't supported." % field)
+
+        def fetch(pks):
+            values = defaultdict(list)
+            for parent_pk, pk in (
+                get_ordered_queryset(related_model)
+                .filter(**{"%s__in" % path: pks})
+                .values_list(path, "pk")
+            ):
+                values[parent_pk].append(represent(pk))
+            return values
+
+        name = field.field_name
+        self.relations.append((name, fetch))
+        return lambda row, related: related[name][row["pk"]]
+
+    def compile_nested(self, field: serializers.ListSerializer) -> Callable:
+        if not isinstance(field.child, serializers.ModelSerializer):
+            raise UnsupportedFieldError("%s isn't a model serializer." % field)
+        related_model, path = get_relation_path(self.model, field.source)
+        child = RowSerializer(field.child)
+        if child.model != related_model:
+            raise UnsupportedFieldError("%s has the wrong model." % field)
+
+        def fetch(pks):
+            values = defaultdict(list)
+            rows = (
+                get_ordered_queryset(related_model)
+                .filter(**{"%s__in" % path: pks})
+                .values(path, *child.columns)
+            )
+            for row, data in zip(rows, child.serialize_rows(rows)):
+                values[row[path]].append(data)
+            return values
+
+        name = field.field_name
+        self.relations.append((name, fetch))
+        return lambda row, related: related[name][row["pk"]]
+
+    def serialize_rows(self, rows: List[Dict[str, Any]]) -> List[OrderedDict]:
+        """Serialize a list of values() rows that have self.columns."""
+        rows = list(rows)
+        pks = [row["pk"] for row in rows]
+        related = {}
+        if pks:
+            related = {name: fetch(pks) for name, fetch in self.relations}
+        return [
+            OrderedDict(
+                (name, getter(row, related)) for name, getter in self.getters
+            )
+            for row in rows
+        ]
+
+    def serialize(
+        self, qs: QuerySet, chunk_size: int = 1000
+    ) -> Iterator[Tuple[Any, OrderedDict]]:
+        """Serialize every item in a queryset, in PK order.
+
+        :param qs: A queryset of the serializer's model.
+        :param chunk_size: The number of items to get from the DB at a time.
+        :return: An iterator of (PK, data) tuples, where data is what the DRF
+        serializer's data would be for that item.
+        """
+        qs = qs.order_by("pk").values(*self.columns)
+        last_pk = None
+        while True:
+            chunk = qs
+            if last_pk is not None:
+                chunk = qs.filter(pk__gt=last_pk)
+            rows = list(chunk[:chunk_size])
+            if not rows:
+                return
+            for row, data in zip(rows, self.serialize_rows(rows)):
+                yield row["pk"], data
+            last_pk = rows[-1]["pk"]
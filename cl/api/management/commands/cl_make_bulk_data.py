@@ -38,6 +38,15 @@ from cl.search.models import Court, Docket, Opinion, OpinionCluster
 class Command(VerboseCommand):
     help = 'Create the bulk files for all jurisdictions and for "all".'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=None,
+            help="The number of worker processes to make court archives "
+            "with. Defaults to the number of CPUs.",
+        )
+
     def handle(self, *args: List[str], **options: Dict[str, Any]):
         super(Command, self).handle(*args, **options)
         courts = Court.objects.all()
@@ -117,7 +126,7 @@ class Command(VerboseCommand):
         )
         for kwargs in kwargs_list:
             make_bulk_data_and_swap_it_in(
-                courts, settings.BULK_DATA_DIR, kwargs
+                courts, settings.BULK_DATA_DIR, kwargs, options["processes"]
             )
 
         # Make the citation bulk data
@@ -0,0 +1,23 @@
+from django.core.cache import cache
+
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.lib.search_utils import COVERAGE_COUNTS_CACHE_KEY, make_coverage_counts
+
+
+class Command(VerboseCommand):
+    help = (
+        "Count the opinions in every court, in total and by year, for the "
+        "coverage API and the court pages. Run this nightly."
+    )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        coverage_counts = make_coverage_counts()
+        # Keep them a few days, so the pages still work if a run fails, but
+        # go back to querying Solr if the runs stop.
+        three_days = 60 * 60 * 24 * 3
+        cache.set(COVERAGE_COUNTS_CACHE_KEY, coverage_counts, three_days)
+        logger.info(
+            "Made coverage counts for %s courts.",
+            len(coverage_counts["annual_counts"]) - 1,
+        )
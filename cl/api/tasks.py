@@ -1,15 +1,21 @@
 import glob
+import hashlib
+import io
+import multiprocessing
 import os
 import shutil
 import tarfile
+import time
 from os.path import join
-from typing import Any, Dict
+from typing import IO, Any, Dict, Optional, Tuple
 
+from django.db import connections
 from django.db.models import QuerySet
 from django.test import RequestFactory
 from rest_framework.renderers import JSONRenderer
 from rest_framework.versioning import URLPathVersioning
 
+from cl.api.bulk_serializers import RowSerializer, UnsupportedFieldError
 from cl.api.utils import BulkJsonHistory, HyperlinkedModelSerializerWithId
 from cl.celery_init import app
 from cl.lib.db_tools import queryset_generator
@@ -22,24 +28,19 @@ from cl.lib.utils import deepgetattr, mkdir_p
 def make_bulk_data_and_swap_it_in(
     courts: QuerySet,
     bulk_dir: str,
-    kwargs: Dict[str, str],
+    kwargs: Dict[str, Any],
+    processes: Optional[int] = None,
 ) -> None:
     """We can't wrap the handle() function, but we can wrap this one."""
     # Create a directory where we'll put temporary files
     tmp_bulk_dir = join(bulk_dir, "tmp")
 
-    print(" - Creating bulk %s files..." % kwargs["obj_type_str"])
-    num_written = write_json_to_disk(courts, bulk_dir=tmp_bulk_dir, **kwargs)
+    print(" - Creating bulk %s archives..." % kwargs["obj_type_str"])
+    num_written = stream_json_to_archives(
+        courts, bulk_dir=tmp_bulk_dir, processes=processes, **kwargs
+    )
 
     if num_written > 0:
-        print(
-            "   - Tarring and compressing all %s files..."
-            % kwargs["obj_type_str"]
-        )
-        targz_json_files(
-            courts, tmp_bulk_dir, kwargs["obj_type_str"], kwargs["court_attr"]
-        )
-
         print(
             "   - Swapping in the new %s archives..." % kwargs["obj_type_str"]
         )
@@ -55,8 +56,11 @@ def swap_archives(
     tmp_gz_dir = join(tmp_bulk_dir, obj_type_str)
     final_gz_dir = join(bulk_dir, obj_type_str)
     mkdir_p(final_gz_dir)
-    for f in glob.glob(join(tmp_gz_dir, "*.tar*")):
-        shutil.move(f, join(final_gz_dir, os.path.basename(f)))
+    # Archives are written to .tmp files first. Leave any that are left over
+    # from a crashed run behind.
+    for pattern in ["*.tar", "*.tar.gz"]:
+        for f in glob.glob(join(tmp_gz_dir, pattern)):
+            shutil.move(f, join(final_gz_dir, os.path.basename(f)))
 
     # Move the info files too.
     try:
@@ -71,38 +75,208 @@ def swap_archives(
             raise
 
 
-def targz_json_files(
+class HashingWriter(object):
+    """A write-only file wrapper that hashes everything written through it.
+
+    This lets us checksum archives as they are made, instead of reading them
+    back afterwards.
+    """
+
+    def __init__(self, f: IO[bytes]) -> None:
+        self.f = f
+        self.name = f.name
+        self.sha256 = hashlib.sha256()
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        self.sha256.update(data)
+        self.position += len(data)
+        return self.f.write(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        self.f.flush()
+
+    def hexdigest(self) -> str:
+        return self.sha256.hexdigest()
+
+
+def get_bulk_serializer_context() -> Dict[str, Any]:
+    """Make a serializer context so URLs in the bulk data point at
+    CourtListener instead of at the test server.
+    """
+    r = RequestFactory().request()
+    r.META["SERVER_NAME"] = "www.courtlistener.com"  # Else, it's testserver
+    r.META["SERVER_PORT"] = "443"  # Else, it's 80
+    r.META["wsgi.url_scheme"] = "https"  # Else, it's http.
+    r.version = "v3"
+    r.versioning_scheme = URLPathVersioning()
+    return dict(request=r)
+
+
+def write_archive(
+    tar_path: str,
+    qs: QuerySet,
+    serializer: HyperlinkedModelSerializerWithId,
+) -> Tuple[int, str]:
+    """Serialize every item in a queryset straight into a tar.gz archive.
+
+    Each item becomes a member named after its PK, just like the files that
+    used to be written to disk and tarred up, but nothing touches the disk
+    except the archive itself. The archive is written next to its final
+    location and moved into place once it's complete.
+
+    :param tar_path: Where to put the archive.
+    :param qs: The items to put in it.
+    :param serializer: A DRF serializer to use to generate the data. If it
+    can be compiled into a RowSerializer, that's used instead, since it's
+    much faster.
+    :return: A tuple of the number of items written and the SHA256 of the
+    archive.
+    """
+    renderer = JSONRenderer()
+    context = get_bulk_serializer_context()
+    try:
+        data_list = RowSerializer(serializer(context=context)).serialize(qs)
+    except UnsupportedFieldError as e:
+        print(
+            "   - Unable to compile %s, falling back to DRF: %s"
+            % (serializer.__name__, e)
+        )
+        if qs.exists() and type(qs[0].pk) == int:
+            item_list = queryset_generator(qs)
+        else:
+            # Necessary for Court objects, which don't have ints for ids.
+            item_list = qs
+        data_list = (
+            (item.pk, serializer(item, context=context).data)
+            for item in item_list
+        )
+
+    mtime = time.time()
+    i = 0
+    tmp_path = "%s.tmp" % tar_path
+    with open(tmp_path, "wb") as f:
+        writer = HashingWriter(f)
+        with tarfile.open(fileobj=writer, mode="w:gz", compresslevel=3) as tar:
+            for pk, data in data_list:
+                json_str = renderer.render(
+                    data, accepted_media_type="application/json; indent=2"
+                )
+                info = tarfile.TarInfo("%s.json" % pk)
+                info.size = len(json_str)
+                info.mtime = mtime
+                tar.addfile(info, io.BytesIO(json_str))
+                i += 1
+    os.replace(tmp_path, tar_path)
+    return i, writer.hexdigest()
+
+
+def write_court_archive(
+    root_path: str,
+    obj_class: Any,
+    court_attr: Optional[str],
+    serializer: HyperlinkedModelSerializerWithId,
+    court_id: Optional[str],
+) -> Tuple[str, int, str]:
+    """Make the archive for one court, or for everything if court_id is None.
+
+    This is the unit of work for the worker processes in
+    stream_json_to_archives, so it takes only things that can be pickled.
+
+    :return: A tuple of the archive's file name, the number of items in it,
+    and its SHA256.
+    """
+    qs = obj_class.objects.all()
+    if court_id is None:
+        name = "all.tar.gz"
+    else:
+        name = "%s.tar.gz" % court_id
+        qs = qs.filter(**{court_attr.replace(".", "__"): court_id})
+    count, sha256 = write_archive(join(root_path, name), qs, serializer)
+    return name, count, sha256
+
+
+def stream_json_to_archives(
     courts: QuerySet,
-    bulk_dir: str,
     obj_type_str: str,
-    court_attr: str,
-) -> None:
-    """Create gz-compressed archives using the JSON on disk."""
+    obj_class: Any,
+    court_attr: Optional[str],
+    serializer: HyperlinkedModelSerializerWithId,
+    bulk_dir: str,
+    processes: Optional[int] = None,
+) -> int:
+    """Make the bulk archives for an object type without intermediate files.
+
+    For jurisdiction-centric data, each court gets its own tar.gz, made in
+    parallel worker processes, and those are gathered into all.tar.
+    Non-jurisdiction-centric data goes into a single all.tar.gz. Items are
+    serialized straight into the archives, so unlike write_json_to_disk,
+    this doesn't leave a JSON file per item on disk, and the archives are
+    always made from scratch.
+
+    The info.json file for the object type gets the SHA256 and item count of
+    every archive, so downloads can be checked.
+
+    :param courts: Court objects that you expect to make data for.
+    :param obj_type_str: A string to use for the directory name of a type of
+    data. For example, for clusters, it's 'clusters'.
+    :param obj_class: The actual class to make a bulk data for.
+    :param court_attr: A string that can be used to find the court attribute
+    on an object. For example, on clusters, this is currently docket.court_id.
+    :param serializer: A DRF serializer to use to generate the data.
+    :param bulk_dir: A directory to place the archives into.
+    :param processes: The number of worker processes to use. Defaults to the
+    number of CPUs. If 1, everything is done in this process.
+    :returns int: The number of items written
+    """
+    history = BulkJsonHistory(obj_type_str, bulk_dir)
+    history.add_current_attempt_and_save()
 
     root_path = join(bulk_dir, obj_type_str)
-    if court_attr is not None:
-        for court in courts:
-            tar_path = join(root_path, "%s.tar.gz" % court.pk)
-            tar = tarfile.open(tar_path, "w:gz", compresslevel=3)
-            for name in glob.glob(join(root_path, court.pk, "*.json")):
-                tar.add(name, arcname=os.path.basename(name))
-            tar.close()
+    mkdir_p(root_path)
+    if court_attr is None:
+        results = [
+            write_court_archive(
+                root_path, obj_class, court_attr, serializer, None
+            )
+        ]
+        num_written = results[0][1]
     else:
-        # Non-jurisdictional-centric object type (like an ABA Rating)
-        tar_path = join(root_path, "all.tar.gz")
-        tar = tarfile.open(tar_path, "w:gz", compresslevel=3)
-        for name in glob.glob(join(root_path, "*.json")):
-            tar.add(name, arcname=os.path.basename(name))
-        tar.close()
+        args = [
+            (root_path, obj_class, court_attr, serializer, court.pk)
+            for court in courts
+        ]
+        if processes == 1:
+            results = [write_court_archive(*a) for a in args]
+        else:
+            # Forked workers can't share the parent's DB connection. Close
+            # it so each of them opens its own.
+            connections.close_all()
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.starmap(write_court_archive, args)
 
-    if court_attr is not None:
-        # Make the all.tar file by tarring up the other files.
-        # Non-court-centric objects already did this.
-        tar = tarfile.open(join(root_path, "all.tar"), "w")
-        for court in courts:
-            targz = join(root_path, "%s.tar.gz" % court.pk)
-            tar.add(targz, arcname=os.path.basename(targz))
-        tar.close()
+        # Gather the court archives into all.tar. They're compressed
+        # already, so this is quick.
+        tar_path = join(root_path, "all.tar")
+        with open("%s.tmp" % tar_path, "wb") as f:
+            writer = HashingWriter(f)
+            with tarfile.open(fileobj=writer, mode="w") as tar:
+                for name, _, _ in results:
+                    tar.add(join(root_path, name), arcname=name)
+        os.replace("%s.tmp" % tar_path, tar_path)
+        num_written = sum(count for _, count, _ in results)
+        results.append(("all.tar", num_written, writer.hexdigest()))
+
+    history.json["archives"] = {
+        name: {"count": count, "sha256": sha256}
+        for name, count, sha256 in results
+    }
+    history.mark_success_and_save()
+    print("   - %s %s items archived." % (num_written, obj_type_str))
+    return num_written
 
 
 def write_json_to_disk(
@@ -176,15 +350,7 @@ def write_json_to_disk(
 
         i = 0
         renderer = JSONRenderer()
-        r = RequestFactory().request()
-        r.META[
-            "SERVER_NAME"
-        ] = "www.courtlistener.com"  # Else, it's testserver
-        r.META["SERVER_PORT"] = "443"  # Else, it's 80
-        r.META["wsgi.url_scheme"] = "https"  # Else, it's http.
-        r.version = "v3"
-        r.versioning_scheme = URLPathVersioning()
-        context = dict(request=r)
+        context = get_bulk_serializer_context()
         for item in item_list:
             if i % 1000 == 0:
                 print("Completed %s items so far." % i)
@@ -1,6 +1,10 @@
+import hashlib
 import json
+import os
 import shutil
+import tarfile
 from datetime import date, timedelta
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth.models import Permission, User
@@ -17,19 +21,31 @@ from django.test import (
 )
 from django.urls import ResolverMatch, reverse
 from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
 from rest_framework.status import HTTP_200_OK, HTTP_403_FORBIDDEN
 
+from cl.api.bulk_serializers import RowSerializer, UnsupportedFieldError
+from cl.api.tasks import get_bulk_serializer_context, swap_archives
 from cl.api.utils import SEND_API_WELCOME_EMAIL_COUNT, BulkJsonHistory
 from cl.api.views import coverage_data
+from cl.audio.api_serializers import AudioSerializer
 from cl.audio.api_views import AudioViewSet
 from cl.audio.models import Audio
 from cl.lib.redis_utils import make_redis_interface
+from cl.lib.search_utils import COVERAGE_COUNTS_CACHE_KEY
 from cl.lib.test_helpers import IndexedSolrTestCase
 from cl.scrapers.management.commands.cl_scrape_oral_arguments import (
     Command as OralArgumentCommand,
 )
 from cl.scrapers.test_assets import test_oral_arg_scraper
+from cl.search.api_serializers import (
+    CourtSerializer,
+    DocketSerializer,
+    OpinionClusterSerializer,
+    OpinionSerializer,
+)
 from cl.search.models import (
+    Citation,
     Court,
     Docket,
     Opinion,
@@ -128,6 +144,25 @@ class CoverageTests(IndexedSolrTestCase):
         self.assertTrue(len(j["annual_counts"].keys()) > 0)
         self.assertIn("total", j)
 
+    def test_precomputed_coverage_matches_solr(self) -> None:
+        """Do the cached coverage counts give the same answers as Solr?"""
+        courts = ["all", "ca1"]
+        live = {
+            court: json.loads(
+                coverage_data(HttpRequest(), "v3", court).content
+            )
+            for court in courts
+        }
+        call_command("cl_make_coverage_counts")
+        try:
+            with mock.patch("cl.api.views.ExtraSolrInterface") as si:
+                for court in courts:
+                    response = coverage_data(HttpRequest(), "v3", court)
+                    self.assertEqual(json.loads(response.content), live[court])
+            si.assert_not_called()
+        finally:
+            cache.delete(COVERAGE_COUNTS_CACHE_KEY)
+
 
 class ApiQueryCountTests(TransactionTestCase):
     """Check that the number of queries for an API doesn't explode
@@ -960,7 +995,96 @@ class BulkDataTest(TestCase):
     @override_settings(BULK_DATA_DIR=tmp_data_dir)
     def test_make_all_bulk_files(self):
         """Can we successfully generate all bulk files?"""
-        call_command("cl_make_bulk_data")
+        # Worker processes can't see the test's transaction, so stay in this
+        # one.
+        call_command("cl_make_bulk_data", processes=1)
+
+        opinions_dir = os.path.join(self.tmp_data_dir, "opinions")
+        with tarfile.open(os.path.join(opinions_dir, "test.tar.gz")) as tar:
+            names = tar.getnames()
+            member = tar.extractfile(names[0])
+            data = json.loads(member.read().decode())
+        self.assertEqual(
+            sorted(names),
+            sorted(
+                "%s.json" % pk
+                for pk in Opinion.objects.filter(
+                    cluster__docket__court_id="test"
+                ).values_list("pk", flat=True)
+            ),
+        )
+        self.assertEqual("%s.json" % data["id"], names[0])
+
+        with open(os.path.join(opinions_dir, "info.json")) as f:
+            archives = json.load(f)["archives"]
+        with open(os.path.join(opinions_dir, "test.tar.gz"), "rb") as f:
+            sha256 = hashlib.sha256(f.read()).hexdigest()
+        self.assertEqual(archives["test.tar.gz"]["sha256"], sha256)
+        self.assertEqual(archives["test.tar.gz"]["count"], len(names))
+
+    def test_swap_skips_unfinished_archives(self) -> None:
+        """Are archives left half-written by a crashed run kept out of the
+        public directory?
+        """
+        tmp_bulk_dir = os.path.join(self.tmp_data_dir, "tmp")
+        tmp_gz_dir = os.path.join(tmp_bulk_dir, "opinions")
+        os.makedirs(tmp_gz_dir, exist_ok=True)
+        for name in ["test.tar.gz", "all.tar", "other.tar.gz.tmp"]:
+            open(os.path.join(tmp_gz_dir, name), "w").close()
+
+        swap_archives("opinions", self.tmp_data_dir, tmp_bulk_dir)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.tmp_data_dir, "opinions"))),
+            ["all.tar", "test.tar.gz"],
+        )
+
+    def test_row_serializers_match_drf(self) -> None:
+        """Do the compiled serializers make the same JSON as DRF?"""
+        Citation.objects.create(
+            cluster=self.doc_cluster,
+            volume=1,
+            reporter="U.S.",
+            page="1",
+            type=Citation.FEDERAL,
+        )
+        renderer = JSONRenderer()
+        context = get_bulk_serializer_context()
+        for serializer, model in (
+            (OpinionSerializer, Opinion),
+            (OpinionClusterSerializer, OpinionCluster),
+            (CourtSerializer, Court),
+            (AudioSerializer, Audio),
+        ):
+            qs = model.objects.all()
+            row_serializer = RowSerializer(serializer(context=context))
+            expected = [
+                (
+                    item.pk,
+                    renderer.render(
+                        serializer(item, context=context).data,
+                        accepted_media_type="application/json; indent=2",
+                    ),
+                )
+                for item in qs.order_by("pk")
+            ]
+            actual = [
+                (
+                    pk,
+                    renderer.render(
+                        data, accepted_media_type="application/json; indent=2"
+                    ),
+                )
+                for pk, data in row_serializer.serialize(qs, chunk_size=2)
+            ]
+            self.assertEqual(actual, expected, msg=serializer.__name__)
+
+    def test_unsupported_serializers_are_not_compiled(self) -> None:
+        """Do serializers with nested objects refuse to compile, so that we
+        fall back to DRF?
+        """
+        context = get_bulk_serializer_context()
+        with self.assertRaises(UnsupportedFieldError):
+            RowSerializer(DocketSerializer(context=context))
 
     def test_database_has_objects_for_bulk_export(self):
         self.assertTrue(Opinion.objects.count() > 0, "Opinions exist")
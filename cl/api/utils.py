@@ -392,8 +392,14 @@ class BulkJsonHistory(object):
       "last_good_date": ISO-Date,
       "last_attempt: ISO-Date,
       "duration": seconds,
+      "archives": {
+        file name: {"count": number of items, "sha256": hex digest},
+      },
     }
 
+    The archives entry is written by stream_json_to_archives, with one entry
+    per archive, including all.tar.
+
     """
 
     def __init__(self, obj_type_str, bulk_dir):
@@ -1,8 +1,8 @@
 import logging
 
 from django.conf import settings
-from django.http import HttpRequest, HttpResponse, JsonResponse
-from django.shortcuts import get_object_or_404, render
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
+from django.shortcuts import render
 from django.template import TemplateDoesNotExist
 from rest_framework import status
 from rest_framework.status import HTTP_400_BAD_REQUEST
@@ -13,8 +13,10 @@ from cl.lib.search_utils import (
     build_alert_estimation_query,
     build_court_count_query,
     build_coverage_query,
+    get_coverage_counts,
     get_solr_interface,
 )
+from cl.search.court_registry import copy_courts, get_court_registry
 from cl.search.forms import SearchForm
 from cl.search.models import Court
 
@@ -44,11 +46,19 @@ def annotate_courts_with_counts(courts, court_count_tuples):
 
 
 def make_court_variable():
-    courts = Court.objects.exclude(jurisdiction=Court.TESTING_COURT)
-    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
-    response = si.query().add_extra(**build_court_count_query()).execute()
-    si.conn.http_connection.close()
-    court_count_tuples = response.facet_counts.facet_fields["court_exact"]
+    courts = copy_courts(
+        c
+        for c in get_court_registry().courts
+        if c.jurisdiction != Court.TESTING_COURT
+    )
+    coverage_counts = get_coverage_counts()
+    if coverage_counts is not None:
+        court_count_tuples = coverage_counts["totals"].items()
+    else:
+        si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+        response = si.query().add_extra(**build_court_count_query()).execute()
+        si.conn.http_connection.close()
+        court_count_tuples = response.facet_counts.facet_fields["court_exact"]
     courts = annotate_courts_with_counts(courts, court_count_tuples)
     return courts
 
@@ -73,9 +83,13 @@ def rest_docs(request, version):
 
 
 def api_index(request: HttpRequest) -> HttpResponse:
-    court_count = Court.objects.exclude(
-        jurisdiction=Court.TESTING_COURT
-    ).count()
+    court_count = len(
+        [
+            c
+            for c in get_court_registry().courts
+            if c.jurisdiction != Court.TESTING_COURT
+        ]
+    )
     return render(
         request, "docs.html", {"court_count": court_count, "private": False}
     )
@@ -132,14 +146,29 @@ def strip_zero_years(data):
 def coverage_data(request, version, court):
     """Provides coverage data for a court.
 
-    Responds to either AJAX or regular requests.
+    Responds to either AJAX or regular requests. Unless there's a query,
+    the counts made by cl_make_coverage_counts are used, if there are any.
     """
 
     if court != "all":
-        court_str = get_object_or_404(Court, pk=court).pk
+        if get_court_registry().get(court) is None:
+            raise Http404("No court with ID '%s'." % court)
+        court_str = court
     else:
         court_str = "all"
     q = request.GET.get("q")
+    coverage_counts = get_coverage_counts()
+    if not q and coverage_counts is not None:
+        first_year, counts = coverage_counts["annual_counts"].get(
+            court_str, (None, [])
+        )
+        annual_counts = {
+            str(first_year + i): count for i, count in enumerate(counts)
+        }
+        return JsonResponse(
+            {"annual_counts": annual_counts, "total": sum(counts)}, safe=True
+        )
+
     si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
     facet_field = "dateFiled"
     response = (
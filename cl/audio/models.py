@@ -16,6 +16,7 @@ from cl.lib.search_index_utils import (
 from cl.lib.storage import IncrementingFileSystemStorage
 from cl.lib.utils import deepgetattr
 from cl.people_db.models import Person
+from cl.search.court_registry import get_court
 from cl.search.models import SOURCES, Docket
 
 
@@ -215,10 +216,11 @@ class Audio(AbstractDateTimeModel):
         out.update(docket)
 
         # Court
+        court = get_court(self.docket.court_id)
         out.update(
             {
-                "court": self.docket.court.full_name,
-                "court_citation_string": self.docket.court.citation_string,
+                "court": court.full_name,
+                "court_citation_string": court.citation_string,
                 "court_exact": self.docket.court_id,  # For faceting
             }
         )
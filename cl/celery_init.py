@@ -17,6 +17,9 @@ sys.setrecursionlimit(10000)
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
 
+# Connect the signal handlers that count the tasks of each CeleryThrottle.
+import cl.lib.celery_utils  # noqa: E402, F401
+
 
 @app.task(bind=True)
 def debug_task(self):
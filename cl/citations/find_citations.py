@@ -2,10 +2,8 @@
 # encoding: utf-8
 import re
 from datetime import datetime
-from functools import lru_cache
 from typing import Dict, List, Optional, Union
 
-from django.db.models import QuerySet
 from django.utils.timezone import now
 from juriscraper.lib.html_utils import get_visible_text
 from reporters_db import EDITIONS, REPORTERS, VARIATIONS_ONLY
@@ -20,7 +18,7 @@ from cl.citations.models import (
     SupraCitation,
 )
 from cl.lib.roman import isroman
-from cl.search.models import Court
+from cl.search.court_registry import get_court_registry
 
 FORWARD_SEEK = 20
 
@@ -103,14 +101,6 @@ def is_neutral_tc_reporter(reporter: str) -> bool:
     return False
 
 
-@lru_cache
-def get_cached_courts() -> QuerySet:
-    """Provide a cached queryset so that we only have to get these results
-    once.
-    """
-    return Court.objects.all().values("citation_string", "pk")
-
-
 def get_court_by_paren(paren_string: str, citation: Citation) -> str:
     """Takes the citation string, usually something like "2d Cir", and maps
     that back to the court code.
@@ -118,8 +108,7 @@ def get_court_by_paren(paren_string: str, citation: Citation) -> str:
     Does not work on SCOTUS, since that court lacks parentheticals, and
     needs to be handled after disambiguation has been completed.
     """
-    # Cache the ALL_COURTS value the first time it's needed.
-    all_courts = get_cached_courts()
+    citation_strings = get_court_registry().citation_strings
 
     if citation.year is None:
         court_str = strip_punct(paren_string)
@@ -132,11 +121,11 @@ def get_court_by_paren(paren_string: str, citation: Citation) -> str:
         court_code = None
     else:
         # Map the string to a court, if possible.
-        for court in all_courts:
+        for citation_string, pk in citation_strings:
             # Use startswith because citations are often missing final period,
             # e.g. "2d Cir"
-            if court["citation_string"].startswith(court_str):
-                court_code = court["pk"]
+            if citation_string.startswith(court_str):
+                court_code = pk
                 break
 
     return court_code
@@ -1,5 +1,7 @@
 import pandas as pd
+from django.core.cache import caches
 
+from cl.citations.utils import get_authorities_cache_key
 from cl.lib.command_utils import VerboseCommand, logger
 from cl.search.models import Opinion, OpinionsCited
 from cl.search.tasks import add_items_to_solr
@@ -34,6 +36,9 @@ def process_citations(data, debug):
             if not debug:
                 cite.save()
                 updated_ids.add(cite.citing_opinion.pk)
+                caches["db_cache"].delete(
+                    get_authorities_cache_key(cite.citing_opinion.cluster_id)
+                )
         try:
             logger.info(
                 "  %s"
@@ -1,8 +1,10 @@
 import re
 from collections import Counter
+from functools import partial
 from http.client import ResponseNotReady
 from typing import List, Set, Tuple, Union
 
+from django.core.cache import caches
 from django.db import transaction
 from django.db.models import F
 
@@ -10,6 +12,7 @@ from cl.celery_init import app
 from cl.citations import find_citations, match_citations
 from cl.citations.models import Citation, NonopinionCitation
 from cl.citations.utils import (
+    get_authorities_cache_key,
     is_balanced_html,
     remove_duplicate_citations_by_regex,
 )
@@ -215,6 +218,15 @@ def find_citations_for_opinion_by_pks(
                 ]
             )
 
+            # The cluster's authorities are cached. Clear them once the new
+            # citations are saved.
+            transaction.on_commit(
+                partial(
+                    caches["db_cache"].delete,
+                    get_authorities_cache_key(opinion.cluster_id),
+                )
+            )
+
             # Save all the changes to the citing opinion (send to solr later)
             opinion.save(index=False)
 
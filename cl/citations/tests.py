@@ -1082,6 +1082,30 @@ class UpdateTest(IndexedSolrTestCase):
             )
             print("✓")
 
+    def test_authorities_with_data(self):
+        """Are authorities summed up by cluster and sorted by depth?"""
+        remove_citations_from_imported_fixtures()
+        find_citations_for_opinion_by_pks.delay([10])
+
+        cluster = Opinion.objects.get(pk=10).cluster
+        authorities = cluster.authorities_with_data
+        self.assertEqual(
+            [(a.pk, a.citation_depth) for a in authorities],
+            [
+                (Opinion.objects.get(pk=pk).cluster_id, depth)
+                for pk, depth in [(8, 6), (7, 3), (9, 2)]
+            ],
+        )
+
+        # The depths are cached, but changes to the authorities show up.
+        OpinionCluster.objects.filter(pk=authorities[0].pk).update(
+            case_name="Renamed v. Case"
+        )
+        cluster = OpinionCluster.objects.get(pk=cluster.pk)
+        self.assertEqual(
+            cluster.authorities_with_data[0].case_name, "Renamed v. Case"
+        )
+
 
 class CitationFeedTest(IndexedSolrTestCase):
     def _tree_has_content(self, content, expected_count):
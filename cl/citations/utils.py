@@ -44,6 +44,15 @@ def get_citation_depth_between_clusters(citing_cluster_pk, cited_cluster_pk):
     ).aggregate(depth=Sum("depth"))["depth"]
 
 
+def get_authorities_cache_key(cluster_pk):
+    """Get the key where a cluster's authorities are cached.
+
+    :param cluster_pk: The primary key of the citing OpinionCluster
+    :return: The cache key for OpinionCluster.authorities_with_data
+    """
+    return "authorities:%s" % cluster_pk
+
+
 def is_balanced_html(text):
     """Test whether a given string contains balanced HTML tags
 
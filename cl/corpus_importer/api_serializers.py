@@ -132,4 +132,5 @@ class IADocketSerializer(ModelSerializer):
             "ia_upload_failure_count",
             "ia_needs_upload",
             "ia_date_first_change",
+            "ia_json_sha256",
         )
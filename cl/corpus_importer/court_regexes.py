@@ -1,7 +1,11 @@
 import os
 import pickle
 import re
+import sre_constants
+import sre_parse
+from functools import lru_cache
 from math import ceil
+from typing import List, Optional, Pattern, Sequence, Tuple
 
 from django.conf import settings
 
@@ -700,6 +704,123 @@ international_pairs = (
 # fmt: on
 
 
+def get_required_literal(regex: Pattern) -> Optional[str]:
+    """Find the longest run of plain characters that every match of a regex
+    must contain.
+
+    Only characters outside of optional parts, alternatives and character
+    classes count. For case-insensitive regexes, the run is lowercased.
+
+    :param regex: A compiled regex.
+    :return: The run, or None if the regex has none that is plain ASCII.
+    """
+    items = list(sre_parse.parse(regex.pattern, regex.flags))
+    runs = [[]]
+    while items:
+        op, av = items.pop(0)
+        if op == sre_constants.LITERAL:
+            runs[-1].append(chr(av))
+        elif op == sre_constants.SUBPATTERN and not av[1] and not av[2]:
+            # A plain group is matched exactly once, so look inside it.
+            items = list(av[3]) + items
+        else:
+            runs.append([])
+    literal = max(("".join(run) for run in runs), key=len)
+    if not literal or not literal.isascii():
+        return None
+    if regex.flags & re.IGNORECASE:
+        literal = literal.lower()
+    return literal
+
+
+class CourtStringMatcher(object):
+    """A table of court regexes, with a prefilter so that only the regexes
+    that can match a string are run against it.
+
+    Each regex is filed under the longest run of plain text it requires, so
+    one pass of substring checks over those keywords picks out the few
+    regexes worth running. The results are the same as running every regex
+    in the table, in the table's order.
+
+    :param pairs: A sequence of (compiled regex, court ID) tuples.
+    """
+
+    def __init__(self, pairs: Sequence[Tuple[Pattern, str]]) -> None:
+        self.pairs = tuple(pairs)
+        keywords = {}
+        self.unfiltered = []
+        for i, (regex, value) in enumerate(self.pairs):
+            literal = get_required_literal(regex)
+            if literal is None:
+                self.unfiltered.append(i)
+                continue
+            ignore_case = bool(regex.flags & re.IGNORECASE)
+            keywords.setdefault((literal, ignore_case), []).append(i)
+        self.keywords = tuple(
+            (literal, ignore_case, tuple(indexes))
+            for (literal, ignore_case), indexes in keywords.items()
+        )
+
+    def get_candidates(self, court_str: str) -> List[int]:
+        """Get the indexes of the regexes that might match a string, in
+        table order.
+        """
+        if not court_str.isascii():
+            # Case-insensitive regexes match some non-ASCII characters to
+            # ASCII ones, which lowercasing doesn't do, so check them all.
+            return list(range(len(self.pairs)))
+        lowered = court_str.lower()
+        candidates = list(self.unfiltered)
+        for literal, ignore_case, indexes in self.keywords:
+            if literal in (lowered if ignore_case else court_str):
+                candidates.extend(indexes)
+        return sorted(candidates)
+
+    def match(self, court_str: str) -> List[str]:
+        """Get the court IDs of every regex that matches a string."""
+        return [
+            self.pairs[i][1]
+            for i in self.get_candidates(court_str)
+            if self.pairs[i][0].search(court_str)
+        ]
+
+    def first(self, court_str: str) -> Optional[str]:
+        """Get the court ID of the first regex that matches a string."""
+        for i in self.get_candidates(court_str):
+            regex, value = self.pairs[i]
+            if regex.search(court_str):
+                return value
+        return None
+
+
+# The order of these is the order match_court_string tests them in.
+court_matchers = {
+    "international": CourtStringMatcher(international_pairs),
+    "state": CourtStringMatcher(state_pairs),
+    "state_ag": CourtStringMatcher(state_ag_pairs),
+    "federal_appeals": CourtStringMatcher(ca_pairs),
+    "bankruptcy": CourtStringMatcher(fb_pairs),
+    "federal_district": CourtStringMatcher(fd_pairs),
+}
+
+
+@lru_cache(maxsize=10000)
+def find_court_matches(court_str: str, kinds: Tuple[str, ...]) -> Tuple:
+    """Get every court ID that a string matches, for the kinds of courts
+    given. Importers see the same court strings over and over, so the results
+    are memoized.
+
+    :param court_str: The court string to look up.
+    :param kinds: Keys of court_matchers to check, in the order to check
+    them.
+    :return: A tuple of court IDs.
+    """
+    matches = []
+    for kind in kinds:
+        matches.extend(court_matchers[kind].match(court_str))
+    return tuple(matches)
+
+
 def match_court_string(
     court_str,
     federal_appeals=False,
@@ -731,33 +852,18 @@ def match_court_string(
     ), "federal_district and bankruptcy cannot be used in conjunction"
 
     # Generally, we test these from most specific regex to least specific. The
-    # order of the tests below should not be changed.
-    matches = []
-    if international:
-        for regex, value in international_pairs:
-            if re.search(regex, court_str):
-                matches.append(value)
-    if state:
-        for regex, value in state_pairs:
-            if re.search(regex, court_str):
-                matches.append(value)
-    if state_ag:
-        for regex, value in state_ag_pairs:
-            if re.search(regex, court_str):
-                matches.append(value)
-    if federal_appeals:
-        for regex, value in ca_pairs:
-            if re.search(regex, court_str):
-                matches.append(value)
-    if bankruptcy:
-        for regex, value in fb_pairs:
-            if re.search(regex, court_str):
-                matches.append(value)
-    # District go last because they've got some broad ones.
-    if federal_district:
-        for regex, value in fd_pairs:
-            if re.search(regex, court_str):
-                matches.append(value)
+    # order of court_matchers should not be changed. District go last because
+    # they've got some broad ones.
+    options = {
+        "international": international,
+        "state": state,
+        "state_ag": state_ag,
+        "federal_appeals": federal_appeals,
+        "bankruptcy": bankruptcy,
+        "federal_district": federal_district,
+    }
+    kinds = tuple(kind for kind in court_matchers if options[kind])
+    matches = find_court_matches(court_str, kinds)
 
     # Safety check. If we have more than one match, that's a problem
     assert len(matches) >= 1, "Too many matches for %s" % court_str
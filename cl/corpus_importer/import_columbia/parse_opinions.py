@@ -14,7 +14,7 @@ from juriscraper.lib.string_utils import (
 )
 from lxml import etree
 
-from cl.corpus_importer.court_regexes import state_pairs
+from cl.corpus_importer.court_regexes import court_matchers
 from cl.lib.crypto import sha1_of_file
 
 from .parse_judges import find_judge_names
@@ -393,9 +393,9 @@ def get_state_court_object(raw_court, file_path):
 
     raw_court = raw_court.strip(".")
 
-    for regex, value in state_pairs:
-        if re.search(regex, raw_court):
-            return value
+    court_id = court_matchers["state"].first(raw_court)
+    if court_id:
+        return court_id
 
     # this messes up for, e.g. 'St. Louis', and 'U.S. Circuit Court, but works
     # for all others
@@ -403,9 +403,9 @@ def get_state_court_object(raw_court, file_path):
         j = raw_court.find(".")
         r = raw_court[:j]
 
-        for regex, value in state_pairs:
-            if re.search(regex, r):
-                return value
+        court_id = court_matchers["state"].first(r)
+        if court_id:
+            return court_id
 
     # we need the comma to successfully match Superior Courts, the name of which
     # comes after the comma
@@ -413,9 +413,9 @@ def get_state_court_object(raw_court, file_path):
         j = raw_court.find(",")
         r = raw_court[:j]
 
-        for regex, value in state_pairs:
-            if re.search(regex, r):
-                return value
+        court_id = court_matchers["state"].first(r)
+        if court_id:
+            return court_id
     # Reduce to: /data/.../alabama/court_opinions'
     root_folder = file_path.split("/documents")[0]
     # Get the last two dirs off the end, leaving: 'alabama/court_opinions'
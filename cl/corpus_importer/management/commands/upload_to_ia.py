@@ -6,7 +6,7 @@ from django.utils.timezone import now
 
 from cl.audio.models import Audio
 from cl.audio.tasks import upload_audio_to_ia
-from cl.corpus_importer.tasks import upload_pdf_to_ia, upload_recap_json
+from cl.corpus_importer.tasks import upload_pdf_to_ia, upload_recap_json_batch
 from cl.corpus_importer.utils import get_start_of_quarter
 from cl.lib.celery_utils import CeleryThrottle
 from cl.lib.command_utils import VerboseCommand, logger
@@ -102,23 +102,27 @@ def upload_recap_data(options):
             "pk__gt": last_pk,
             "ia_date_first_change__lt": get_start_of_quarter(),
         }
-        for d in ds.filter(**params)[:chunk_size]:
+        pks = [d.pk for d in ds.filter(**params)[:chunk_size]]
+        if pks:
+            # Send the chunk as one task, so its JSON is made together and
+            # uploaded concurrently.
             throttle.maybe_wait()
-            upload_recap_json.apply_async(args=(d.pk, database), queue=q)
-            i += 1
-            if i % 100 == 0:
-                # Print a useful log line with expected finish date.
-                t2 = now()
-                elapsed_minutes = float((t2 - t1).seconds) / 60
-                try:
-                    rate = i / float(elapsed_minutes)
-                    logger.info(
-                        "Uploaded %s dockets to IA so far (%.01f/m)", i, rate
-                    )
-                except ZeroDivisionError:
-                    # First lap through can be completed in less than 1s.
-                    pass
-            last_pk = d.pk
+            upload_recap_json_batch.apply_async(
+                args=(pks, database, options["concurrency"]), queue=q
+            )
+            i += len(pks)
+            # Print a useful log line with expected finish date.
+            t2 = now()
+            elapsed_minutes = float((t2 - t1).seconds) / 60
+            try:
+                rate = i / float(elapsed_minutes)
+                logger.info(
+                    "Uploaded %s dockets to IA so far (%.01f/m)", i, rate
+                )
+            except ZeroDivisionError:
+                # First lap through can be completed in less than 1s.
+                pass
+            last_pk = pks[-1]
             r.set(redis_key, last_pk)
 
         # Detect if we've hit the end of the loop and reset it if so. We do
@@ -185,6 +189,13 @@ class Command(VerboseCommand):
             help="The database name to use when querying (currently only "
             "supported by the upload-recap-data-to-ia task).",
         )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=8,
+            help="The number of dockets each task uploads at a time "
+            "(currently only supported by the upload-recap-data-to-ia task).",
+        )
 
     def handle(self, *args, **options):
         super(Command, self).handle(*args, **options)
@@ -1,7 +1,9 @@
 import copy
+import json
 import logging
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
 from io import BytesIO
 from tempfile import NamedTemporaryFile
@@ -15,7 +17,7 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files.base import ContentFile
 from django.db import DatabaseError, IntegrityError, transaction
-from django.db.models import Prefetch
+from django.db.models import Prefetch, QuerySet
 from django.db.models.query import prefetch_related_objects
 from django.utils.encoding import force_bytes
 from django.utils.timezone import now
@@ -42,6 +44,7 @@ from rest_framework.status import (
     HTTP_500_INTERNAL_SERVER_ERROR,
     HTTP_504_GATEWAY_TIMEOUT,
 )
+from rest_framework.utils.encoders import JSONEncoder
 
 from cl.alerts.tasks import enqueue_docket_alert, send_docket_alert
 from cl.audio.models import Audio
@@ -49,7 +52,7 @@ from cl.celery_init import app
 from cl.corpus_importer.api_serializers import IADocketSerializer
 from cl.corpus_importer.utils import mark_ia_upload_needed
 from cl.custom_filters.templatetags.text_filters import best_case_name
-from cl.lib.crypto import sha1
+from cl.lib.crypto import sha1, sha256
 from cl.lib.pacer import (
     get_blocked_status,
     get_first_missing_de_date,
@@ -93,6 +96,14 @@ from cl.search.tasks import add_items_to_solr
 
 logger = logging.getLogger(__name__)
 
+RECAP_DOCKET_IA_DESCRIPTION = (
+    "This item represents a case in PACER, the U.S. Government's website "
+    "for federal case data. This information is uploaded quarterly. To see "
+    "our most recent version please use the source url parameter, linked "
+    "below. To see the canonical source for this data, please consult PACER "
+    "directly."
+)
+
 
 def increment_failure_count(obj: Union[Audio, Docket, RECAPDocument]) -> None:
     if obj.ia_upload_failure_count is None:
@@ -102,67 +113,62 @@ def increment_failure_count(obj: Union[Audio, Docket, RECAPDocument]) -> None:
     obj.save()
 
 
-def generate_ia_json(
-    d_pk: int,
-    database: str = "default",
-) -> Tuple[Docket, str]:
-    """Generate JSON for upload to Internet Archive
-
-    :param d_pk: The PK of the docket to generate JSON for
-    :param database: The name of the database to use for the queries
-    :return: A tuple of the docket object requested and a string of json data
-    to upload.
+def get_ia_docket_queryset(ds: QuerySet) -> QuerySet:
+    """Add the select and prefetch calls needed to make IA JSON to a queryset
+    of dockets.
     """
     # This is a pretty highly optimized query that minimizes the hits to the DB
     # when generating a docket JSON rendering, regardless of how many related
     # objects the docket has such as docket entries, parties, etc.
-    ds = (
-        Docket.objects.filter(pk=d_pk)
-        .select_related(
-            "originating_court_information",
-            "bankruptcy_information",
-            "idb_data",
-        )
-        .prefetch_related(
-            "panel",
-            "parties",
-            # Django appears to have a bug where you can't defer a field on a
-            # queryset where you prefetch the values. If you try to, it crashes.
-            # We should be able to just do the prefetch below like the ones above
-            # and then do the defer statement at the end, but that throws an error.
-            Prefetch(
-                "docket_entries__recap_documents",
-                queryset=RECAPDocument.objects.all().defer("plain_text"),
-            ),
-            Prefetch(
-                "claims__claim_history_entries",
-                queryset=ClaimHistory.objects.all().defer("plain_text"),
-            ),
-        )
-        .using(database)
+    return ds.select_related(
+        "originating_court_information",
+        "bankruptcy_information",
+        "idb_data",
+    ).prefetch_related(
+        "panel",
+        "parties",
+        # Django appears to have a bug where you can't defer a field on a
+        # queryset where you prefetch the values. If you try to, it crashes.
+        # We should be able to just do the prefetch below like the ones above
+        # and then do the defer statement at the end, but that throws an error.
+        Prefetch(
+            "docket_entries__recap_documents",
+            queryset=RECAPDocument.objects.all().defer("plain_text"),
+        ),
+        Prefetch(
+            "claims__claim_history_entries",
+            queryset=ClaimHistory.objects.all().defer("plain_text"),
+        ),
     )
-    d = ds[0]
 
-    # Prefetching attorneys needs to be done in a second pass where we can
-    # access the party IDs identified above. If we don't do it this way, Django
-    # generates a bad query that double-joins the attorney table to the role
-    # table. See notes in #901. Doing this way makes for a very large query,
-    # but one that is fairly efficient since the double-join, while still
-    # there, appears to be ignored by the query planner.
+
+def prefetch_ia_attorneys(d: Docket) -> None:
+    """Prefetch the attorneys and party types of a docket's parties.
+
+    Prefetching attorneys needs to be done in a second pass where we can
+    access the party IDs identified by get_ia_docket_queryset. If we don't do
+    it this way, Django generates a bad query that double-joins the attorney
+    table to the role table. See notes in #901. Doing this way makes for a
+    very large query, but one that is fairly efficient since the double-join,
+    while still there, appears to be ignored by the query planner.
+
+    The attorneys and their roles are limited to the docket, so this has to
+    be done one docket at a time.
+    """
     # Do not add a `using` method here, it causes an additional (unnecessary)
     # query to be run. I think this is a Django bug.
     party_ids = [p.pk for p in d.parties.all()]
     attorney_prefetch = Prefetch(
         "parties__attorneys",
         queryset=Attorney.objects.filter(
-            roles__docket_id=d_pk, parties__id__in=party_ids
+            roles__docket_id=d.pk, parties__id__in=party_ids
         )
         .distinct()
         .prefetch_related(
             Prefetch(
                 # Only roles for those attorneys in the docket.
                 "roles",
-                queryset=Role.objects.filter(docket_id=d_pk),
+                queryset=Role.objects.filter(docket_id=d.pk),
             )
         ),
     )
@@ -175,6 +181,22 @@ def generate_ia_json(
         ]
     )
 
+
+def generate_ia_json(
+    d_pk: int,
+    database: str = "default",
+) -> Tuple[Docket, str]:
+    """Generate JSON for upload to Internet Archive
+
+    :param d_pk: The PK of the docket to generate JSON for
+    :param database: The name of the database to use for the queries
+    :return: A tuple of the docket object requested and a string of json data
+    to upload.
+    """
+    ds = get_ia_docket_queryset(Docket.objects.filter(pk=d_pk)).using(database)
+    d = ds[0]
+    prefetch_ia_attorneys(d)
+
     renderer = JSONRenderer()
     json_str = renderer.render(
         IADocketSerializer(d).data,
@@ -183,6 +205,65 @@ def generate_ia_json(
     return d, json_str
 
 
+def get_ia_content_hash(data: Any) -> str:
+    """Hash serialized IA docket data, ignoring fields that change when it's
+    uploaded.
+
+    date_modified changes whenever an object is saved, and filepath_ia_json
+    is set by the upload itself, so either would make every docket look
+    changed after its first upload. IADocketSerializer leaves out
+    ia_json_sha256, where the hash is kept.
+
+    :param data: The data from IADocketSerializer
+    :return: A SHA256 of the data
+    """
+
+    def strip_dates(obj):
+        if isinstance(obj, dict):
+            return {
+                k: strip_dates(v)
+                for k, v in obj.items()
+                if k not in ["date_modified", "filepath_ia_json"]
+            }
+        if isinstance(obj, list):
+            return [strip_dates(v) for v in obj]
+        return obj
+
+    return sha256(
+        json.dumps(strip_dates(data), sort_keys=True, cls=JSONEncoder)
+    )
+
+
+def generate_ia_json_batch(
+    d_pks: List[int],
+    database: str = "default",
+) -> List[Tuple[Docket, str, str]]:
+    """Generate JSON for upload to Internet Archive for many dockets at once
+
+    The dockets and their entries, documents, claims and parties are loaded
+    together, so the number of queries for those doesn't grow with the number
+    of dockets. Attorneys are still loaded one docket at a time.
+
+    :param d_pks: The PKs of the dockets to generate JSON for
+    :param database: The name of the database to use for the queries
+    :return: A list of tuples of the docket, its JSON, and the hash of its
+    content from get_ia_content_hash, in PK order.
+    """
+    ds = get_ia_docket_queryset(
+        Docket.objects.filter(pk__in=d_pks).order_by("pk")
+    ).using(database)
+    renderer = JSONRenderer()
+    results = []
+    for d in ds:
+        prefetch_ia_attorneys(d)
+        data = IADocketSerializer(d).data
+        json_str = renderer.render(
+            data, accepted_media_type="application/json; indent=2"
+        ).decode()
+        results.append((d, json_str, get_ia_content_hash(data)))
+    return results
+
+
 @app.task(bind=True, ignore_result=True)
 def save_ia_docket_to_disk(self, d_pk: int, output_directory: str) -> None:
     """For each docket given, save it to disk.
@@ -211,12 +292,7 @@ def upload_recap_json(self, pk: int, database: str = "default") -> None:
         court_id=d.court_id,
         source_url="https://www.courtlistener.com%s" % d.get_absolute_url(),
         media_type="texts",
-        description="This item represents a case in PACER, the U.S. "
-        "Government's website for federal case data. This "
-        "information is uploaded quarterly. To see our most "
-        "recent version please use the source url parameter, "
-        "linked below. To see the canonical source for this data, "
-        "please consult PACER directly.",
+        description=RECAP_DOCKET_IA_DESCRIPTION,
     )
     if responses is None:
         increment_failure_count(d)
@@ -235,6 +311,148 @@ def upload_recap_json(self, pk: int, database: str = "default") -> None:
         increment_failure_count(d)
 
 
+def make_ia_s3_session(pool_size: int) -> ia.ArchiveSession:
+    """Make an IA session that keeps up to pool_size connections open, so
+    concurrent uploads can reuse them.
+    """
+    session = ia.get_session(
+        {"s3": {"access": access_key, "secret": secret_key}}
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size
+    )
+    # Metadata requests to archive.org keep the library's retrying adapter.
+    # This one is for uploads to s3.us.archive.org.
+    session.mount("https://s3.us.archive.org", adapter)
+    return session
+
+
+def upload_docket_json_to_ia(
+    session: ia.ArchiveSession,
+    d: Docket,
+    json_str: str,
+) -> bool:
+    """Upload a docket's IA JSON with a shared IA session.
+
+    This is safe to call from several threads with the same session.
+
+    :param session: A session from make_ia_s3_session
+    :param d: The docket
+    :param json_str: The docket's JSON, from generate_ia_json_batch
+    :return: Whether the upload worked
+    """
+    file_name = get_docket_filename(d.court_id, d.pacer_case_id, "json")
+    bucket_name = get_bucket_name(d.court_id, d.pacer_case_id)
+    try:
+        item = session.get_item(bucket_name)
+        item.upload_file(
+            BytesIO(json_str.encode()),
+            key=file_name,
+            metadata={
+                "title": best_case_name(d),
+                "collection": settings.IA_COLLECTIONS,
+                "contributor": '<a href="https://free.law">Free Law Project</a>',
+                "court": d.court_id,
+                "source_url": "https://www.courtlistener.com%s"
+                % d.get_absolute_url(),
+                "language": "eng",
+                "mediatype": "texts",
+                "description": RECAP_DOCKET_IA_DESCRIPTION,
+                "licenseurl": "https://www.usa.gov/government-works",
+            },
+            queue_derive=False,
+            verify=True,
+            request_kwargs={"timeout": 60},
+        )
+    except (ExpatError, RequestException) as e:
+        logger.warning("Unable to upload docket %s to IA: %s", d.pk, e)
+        return False
+    return True
+
+
+@app.task(bind=True, max_retries=5, ignore_result=True)
+def upload_recap_json_batch(
+    self,
+    pks: List[int],
+    database: str = "default",
+    concurrency: int = 8,
+) -> None:
+    """Make JSON objects for many RECAP dockets and upload them to IA
+
+    Unlike upload_recap_json, the JSON for the dockets is made together, and
+    dockets whose content hasn't changed since they were last uploaded are
+    skipped. The rest are uploaded concurrently, sharing a pool of
+    connections.
+
+    :param pks: The PKs of the dockets to upload
+    :param database: The name of the database to use for the queries
+    :param concurrency: The number of uploads to do at a time
+    """
+    items = generate_ia_json_batch(pks, database=database)
+    unchanged = []
+    changed = []
+    for item in items:
+        d, _, content_hash = item
+        if d.ia_json_sha256 == content_hash and d.filepath_ia_json:
+            unchanged.append(d.pk)
+        else:
+            changed.append(item)
+    if unchanged:
+        logger.info(
+            "Skipping %s dockets that haven't changed since they were last "
+            "uploaded to IA.",
+            len(unchanged),
+        )
+        Docket.objects.filter(pk__in=unchanged).update(
+            ia_upload_failure_count=None,
+            ia_date_first_change=None,
+            ia_needs_upload=False,
+        )
+
+    if not changed:
+        return
+
+    session = make_ia_s3_session(concurrency)
+    try:
+        # Every docket is a different item, but the limit is mostly for the
+        # account, so checking one of them is enough.
+        d = changed[0][0]
+        identifier = get_bucket_name(d.court_id, d.pacer_case_id)
+        if session.s3_is_overloaded(identifier, access_key):
+            raise OverloadedException("S3 is currently overloaded.")
+    except OverloadedException as exc:
+        session.close()
+        if self.request.retries == self.max_retries:
+            # Give up for now. It'll get done next time cron is run.
+            return
+        raise self.retry(exc=exc)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        successes = list(
+            executor.map(
+                lambda item: upload_docket_json_to_ia(
+                    session, item[0], item[1]
+                ),
+                changed,
+            )
+        )
+    session.close()
+
+    for (d, _, content_hash), success in zip(changed, successes):
+        if not success:
+            increment_failure_count(d)
+            continue
+        d.ia_upload_failure_count = None
+        d.ia_date_first_change = None
+        d.ia_needs_upload = False
+        d.filepath_ia_json = "https://archive.org/download/%s/%s" % (
+            get_bucket_name(d.court_id, d.pacer_case_id),
+            get_docket_filename(d.court_id, d.pacer_case_id, "json"),
+        )
+        d.ia_json_sha256 = content_hash
+        d.save()
+
+
 @app.task(bind=True, max_retries=5)
 def download_recap_item(
     self,
@@ -1,5 +1,7 @@
 import json
 import os
+import random
+import re
 import unittest
 from datetime import date, datetime
 from glob import iglob
@@ -8,9 +10,19 @@ from unittest import mock
 import pytest
 from django.conf import settings
 from django.test import TestCase
+from requests.exceptions import HTTPError
 
 from cl.citations.find_citations import get_citations
-from cl.corpus_importer.court_regexes import match_court_string
+from cl.corpus_importer.court_regexes import (
+    ca_pairs,
+    court_matchers,
+    fb_pairs,
+    fd_pairs,
+    international_pairs,
+    match_court_string,
+    state_ag_pairs,
+    state_pairs,
+)
 from cl.corpus_importer.import_columbia.parse_judges import find_judge_names
 from cl.corpus_importer.import_columbia.parse_opinions import (
     get_state_court_object,
@@ -20,7 +32,11 @@ from cl.corpus_importer.management.commands.harvard_opinions import (
     validate_dt,
 )
 from cl.corpus_importer.management.commands.import_tn import import_tn_corpus
-from cl.corpus_importer.tasks import generate_ia_json
+from cl.corpus_importer.tasks import (
+    generate_ia_json,
+    generate_ia_json_batch,
+    upload_recap_json_batch,
+)
 from cl.corpus_importer.utils import get_start_of_quarter
 from cl.lib.pacer import process_docket_data
 from cl.people_db.models import Attorney, AttorneyOrganization, Party
@@ -298,6 +314,52 @@ class CourtMatchingTest(unittest.TestCase):
             got = match_court_string(test["q"], federal_appeals=True)
             self.assertEqual(test["a"], got)
 
+    def test_matchers_agree_with_regex_tables(self):
+        """Do the court matchers find exactly what running every regex in
+        their tables does?
+        """
+        tables = {
+            "international": international_pairs,
+            "state": state_pairs,
+            "state_ag": state_ag_pairs,
+            "federal_appeals": ca_pairs,
+            "bankruptcy": fb_pairs,
+            "federal_district": fd_pairs,
+        }
+        self.assertEqual(list(court_matchers), list(tables))
+
+        # Make court strings from the words in the regexes, so lots of them
+        # match something, and some match more than one court.
+        words = sorted(
+            {
+                word
+                for pairs in tables.values()
+                for regex, value in pairs
+                for word in re.findall(r"[A-Za-z.']+", regex.pattern)
+            }
+        )
+        words.extend(["D.", "N.D.", "U.S.", "Ǩ", "ſ"])
+        rand = random.Random(0)
+        court_strs = []
+        for _ in range(5000):
+            court_str = " ".join(rand.sample(words, rand.randint(1, 6)))
+            court_strs.extend(
+                [court_str, court_str.lower(), court_str.upper()]
+            )
+
+        for court_str in court_strs:
+            for kind, pairs in tables.items():
+                expected = [v for r, v in pairs if re.search(r, court_str)]
+                matcher = court_matchers[kind]
+                self.assertEqual(
+                    matcher.match(court_str), expected, msg=court_str
+                )
+                self.assertEqual(
+                    matcher.first(court_str),
+                    expected[0] if expected else None,
+                    msg=court_str,
+                )
+
 
 @pytest.mark.django_db
 class PacerDocketParserTest(TestCase):
@@ -465,6 +527,77 @@ class IAUploaderTest(TestCase):
             generate_ia_json(3)
 
 
+class IABatchUploaderTest(TestCase):
+    """Tests for making IA JSON and uploading it in batches"""
+
+    fixtures = [
+        "test_objects_query_counts.json",
+        "attorney_party_dup_roles.json",
+    ]
+
+    def setUp(self) -> None:
+        Docket.objects.filter(pk__in=[1, 2, 3]).update(ia_needs_upload=True)
+
+        # Stand in for IA, recording the files uploaded to it.
+        self.uploads = []
+        self.session = mock.MagicMock()
+        self.session.s3_is_overloaded.return_value = False
+        self.session.get_item.return_value.upload_file.side_effect = (
+            lambda body, key, **kwargs: self.uploads.append((key, body.read()))
+        )
+        patcher = mock.patch(
+            "cl.corpus_importer.tasks.make_ia_s3_session",
+            return_value=self.session,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_batch_json_matches_single_json(self) -> None:
+        """Is the JSON made in a batch the same as when it's made alone?"""
+        for d, json_str, _ in generate_ia_json_batch([1, 2, 3]):
+            self.assertEqual(json_str, generate_ia_json(d.pk)[1])
+
+    def test_only_changed_dockets_are_uploaded(self) -> None:
+        """Do we upload every docket once, then skip the ones that haven't
+        changed?
+        """
+        upload_recap_json_batch([1, 2, 3], concurrency=2)
+        self.assertEqual(len(self.uploads), 3)
+        self.assertFalse(
+            Docket.objects.filter(
+                pk__in=[1, 2, 3], ia_needs_upload=True
+            ).exists()
+        )
+        key, body = self.uploads[0]
+        self.assertTrue(key.endswith(".json"))
+        self.assertIn("docket_entries", json.loads(body))
+        self.assertFalse(
+            Docket.objects.filter(pk__in=[1, 2, 3], ia_json_sha256="").exists()
+        )
+
+        # Saving changes date_modified, but nothing else.
+        Docket.objects.get(pk=1).save()
+        d = Docket.objects.get(pk=2)
+        d.case_name = "A new name"
+        d.save()
+        upload_recap_json_batch([1, 2, 3], concurrency=2)
+        self.assertEqual(len(self.uploads), 4)
+        self.assertIn("A new name", self.uploads[-1][1].decode())
+
+    def test_failed_uploads_are_retried_later(self) -> None:
+        """Are dockets that IA rejects left to be uploaded again?"""
+        self.session.get_item.return_value.upload_file.side_effect = HTTPError(
+            "error uploading"
+        )
+        upload_recap_json_batch([1, 2, 3], concurrency=2)
+        self.assertEqual(
+            Docket.objects.filter(
+                pk__in=[1, 2, 3], ia_needs_upload=True
+            ).count(),
+            3,
+        )
+
+
 class TNCorpusTests(TestCase):
     """Can we properly import the TN Corpus?"""
 
@@ -2,12 +2,15 @@ import json
 import logging
 import os
 import pickle
+from collections import defaultdict
 from datetime import datetime
 
 from django.apps import apps
 from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
 from django.core.files.base import ContentFile
 from django.db import transaction
+from django.utils import timezone
 from juriscraper.lasc.fetch import LASCSearch
 from juriscraper.lasc.http import LASCSession
 from requests import RequestException
@@ -172,12 +175,10 @@ def add_case(case_id, case_data, original_data):
             if x.__name__ not in ["Docket"]
         ]
 
-        while models:
-            mdl = models.pop()
-            while case_data[mdl.__name__]:
-                case_data_row = case_data[mdl.__name__].pop()
-                case_data_row["docket"] = docket
-                mdl.objects.create(**case_data_row).save()
+        for mdl in models:
+            mdl.objects.bulk_create(
+                [mdl(docket=docket, **row) for row in case_data[mdl.__name__]]
+            )
 
         save_json(original_data, docket)
 
@@ -241,18 +242,137 @@ def latest_sha(case_id):
     """Get the latest SHA1 for a case by case_id
 
     :param case_id: The semicolon-delimited lasc ID for the case
-    :return: The SHA1 for the case
+    :return: The SHA1 for the case, or None if we don't have its JSON.
     """
     docket = Docket.objects.get(case_id=case_id)
-    o_id = LASCJSON(content_object=docket).object_id
-    return LASCJSON.objects.filter(object_id=o_id).order_by("-pk")[0].sha1
+    return (
+        docket.json_document.order_by("-pk")
+        .values_list("sha1", flat=True)
+        .first()
+    )
+
+
+# The models that hold the rows of a docket, and aren't made by us. Documents
+# are merged separately, by their LASC IDs.
+ROW_MODEL_NAMES = [
+    "Action",
+    "CrossReference",
+    "DocumentFiled",
+    "Party",
+    "Proceeding",
+    "TentativeRuling",
+]
+
+# Fields that aren't compared when merging rows.
+UNCOMPARED_FIELDS = ["id", "docket", "date_created", "date_modified"]
+
+
+def get_compared_fields(mdl, exclude=()):
+    return [
+        f
+        for f in mdl._meta.concrete_fields
+        if f.name not in UNCOMPARED_FIELDS and f.name not in exclude
+    ]
+
+
+def normalize_value(field, value):
+    """Convert a value from the JSON into what it'll be once it's saved, so
+    it can be compared with what's in the DB.
+    """
+    value = field.to_python(value)
+    if (
+        isinstance(value, datetime)
+        and settings.USE_TZ
+        and timezone.is_naive(value)
+    ):
+        value = timezone.make_aware(value, timezone.get_default_timezone())
+    return value
+
+
+def get_row_key(fields, obj):
+    return tuple(normalize_value(f, f.value_from_object(obj)) for f in fields)
+
+
+def merge_rows(mdl, docket, rows):
+    """Make the rows of a model on a docket match the rows in the JSON.
+
+    These rows have no IDs from LASC, so they're matched by their values.
+    Rows that match are left alone, new rows are inserted, and rows that are
+    gone are deleted.
+
+    :param mdl: The model of the rows.
+    :param docket: The Docket that the rows are on.
+    :param rows: A list of dicts of field values from the JSON.
+    :return: A tuple of the number of rows inserted and deleted.
+    """
+    fields = get_compared_fields(mdl)
+    existing = defaultdict(list)
+    for obj in mdl.objects.filter(docket=docket):
+        existing[get_row_key(fields, obj)].append(obj.pk)
+
+    new_objs = []
+    for row in rows:
+        obj = mdl(docket=docket, **row)
+        pks = existing.get(get_row_key(fields, obj))
+        if pks:
+            pks.pop()
+        else:
+            new_objs.append(obj)
+
+    stale_pks = [pk for pks in existing.values() for pk in pks]
+    if stale_pks:
+        mdl.objects.filter(pk__in=stale_pks).delete()
+    mdl.objects.bulk_create(new_objs)
+    return len(new_objs), len(stale_pks)
+
+
+def merge_document_images(docket, rows):
+    """Make the documents on a docket match the documents in the JSON.
+
+    Documents are matched by their LASC IDs. Changed documents are updated,
+    keeping whether we've downloaded them, and new ones are inserted.
+    Documents that are gone from the JSON are kept, since we may have their
+    PDFs.
+
+    :param docket: The Docket that the documents are on.
+    :param rows: A list of dicts of field values from the JSON.
+    :return: A tuple of the number of documents inserted and updated.
+    """
+    fields = get_compared_fields(DocumentImage, exclude=["is_available"])
+    existing = {
+        di.doc_id: di
+        for di in DocumentImage.objects.filter(
+            doc_id__in=[row["doc_id"] for row in rows]
+        )
+    }
+    new_objs = []
+    updated_count = 0
+    for row in rows:
+        di = existing.get(row["doc_id"])
+        if di is None:
+            new_objs.append(DocumentImage(docket=docket, **row))
+            continue
+        changes = {}
+        for f in fields:
+            if f.name not in row:
+                continue
+            value = normalize_value(f, row[f.name])
+            if value != f.value_from_object(di):
+                changes[f.name] = value
+        if changes:
+            # update() doesn't set auto_now fields.
+            changes["date_modified"] = timezone.now()
+            DocumentImage.objects.filter(pk=di.pk).update(**changes)
+            updated_count += 1
+    DocumentImage.objects.bulk_create(new_objs)
+    return len(new_objs), updated_count
 
 
 def update_case(lasc, clean_data):
     """Update an existing case with new data
 
-    Method currently deletes and replaces the data on the system except for
-    lasc_docket and connections for older json and pdf files.
+    The rows of the case are compared with what's already in the DB, and
+    only what changed is written. Older JSON and PDF files are kept.
 
     :param lasc: A LASCSearch object
     :param clean_data: A normalized data dictionary
@@ -261,44 +381,41 @@ def update_case(lasc, clean_data):
     case_id = make_case_id(clean_data)
     with transaction.atomic():
         docket = Docket.objects.filter(case_id=case_id)[0]
-        docket.__dict__.update(clean_data["Docket"])
-        docket.save()
-
-        skipped_models = [
-            "Docket",
-            "QueuedPDF",
-            "QueuedCase",
-            "LASCPDF",
-            "LASCJSON",
-            "DocumentImage",
-        ]
-        models = [
-            x
-            for x in apps.get_app_config("lasc").get_models()
-            if x.__name__ not in skipped_models
-        ]
-
-        while models:
-            mdl = models.pop()
-
-            while clean_data[mdl.__name__]:
-                row = clean_data[mdl.__name__].pop()
-                row["docket"] = docket
-                mdl.objects.create(**row).save()
-
-        documents = clean_data["DocumentImage"]
-
-        for row in documents:
-            dis = DocumentImage.objects.filter(doc_id=row["doc_id"])
-            dis_count = dis.count()
-            if dis_count == 1:
-                di = dis[0]
-                row["is_available"] = di.is_available
-                di.__dict__.update(**row)
-            elif dis_count == 0:
-                row["docket"] = docket
-                di = DocumentImage(**row)
-            di.save()
+        docket_changed = False
+        for name, value in clean_data["Docket"].items():
+            try:
+                field = Docket._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            value = normalize_value(field, value)
+            if value != field.value_from_object(docket):
+                setattr(docket, name, value)
+                docket_changed = True
+        if docket_changed:
+            docket.save()
+
+        for name in ROW_MODEL_NAMES:
+            mdl = apps.get_model("lasc", name)
+            inserted, deleted = merge_rows(mdl, docket, clean_data[name])
+            if inserted or deleted:
+                logger.info(
+                    "Inserted %s and deleted %s %s rows on lasc case '%s'",
+                    inserted,
+                    deleted,
+                    name,
+                    case_id,
+                )
+
+        inserted, updated = merge_document_images(
+            docket, clean_data["DocumentImage"]
+        )
+        if inserted or updated:
+            logger.info(
+                "Inserted %s and updated %s documents on lasc case '%s'",
+                inserted,
+                updated,
+                case_id,
+            )
 
         logger.info("Finished updating lasc case '%s'", case_id)
         save_json(lasc.case_data, content_obj=docket)
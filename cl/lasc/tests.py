@@ -0,0 +1,95 @@
+from datetime import datetime
+
+from django.test import TestCase
+from django.utils.timezone import utc
+
+from cl.lasc.models import Action, Docket, DocumentImage, Party
+from cl.lasc.tasks import update_case
+
+
+class FakeLASCSearch(object):
+    case_data = '{"case": "data"}'
+
+
+class UpdateCaseTest(TestCase):
+    def setUp(self) -> None:
+        self.docket = Docket.objects.create(
+            docket_number="19STCV25157",
+            district="SS",
+            division_code="CV",
+            case_name="Foo v. Bar",
+        )
+
+    @staticmethod
+    def make_clean_data(actions, parties, documents):
+        return {
+            "Docket": {
+                "docket_number": "19STCV25157",
+                "district": "SS",
+                "division_code": "CV",
+                "case_name": "Foo v. Bar",
+            },
+            "Action": actions,
+            "CrossReference": [],
+            "DocumentFiled": [],
+            "Party": parties,
+            "Proceeding": [],
+            "TentativeRuling": [],
+            "DocumentImage": documents,
+        }
+
+    @staticmethod
+    def make_action(description):
+        return {
+            "date_of_action": datetime(2019, 6, 7, tzinfo=utc),
+            "description": description,
+            "additional_information": "",
+        }
+
+    @staticmethod
+    def make_document(doc_id, description):
+        return {
+            "doc_id": doc_id,
+            "description": description,
+            "is_downloadable": True,
+            "is_available": False,
+        }
+
+    def test_update_only_writes_changes(self) -> None:
+        """Are rows that didn't change kept, and are the rest inserted,
+        updated or deleted?
+        """
+        party = {"party_name": "Foo", "party_flag": "P"}
+        update_case(
+            FakeLASCSearch(),
+            self.make_clean_data(
+                [self.make_action("Answer"), self.make_action("Complaint")],
+                [party],
+                [self.make_document("1", "Answer")],
+            ),
+        )
+        answer = Action.objects.get(description="Answer")
+        party_pk = Party.objects.get().pk
+        DocumentImage.objects.update(is_available=True)
+
+        update_case(
+            FakeLASCSearch(),
+            self.make_clean_data(
+                [self.make_action("Answer"), self.make_action("Motion")],
+                [party],
+                [
+                    self.make_document("1", "Amended Answer"),
+                    self.make_document("2", "Motion"),
+                ],
+            ),
+        )
+        self.assertEqual(
+            set(Action.objects.values_list("description", flat=True)),
+            {"Answer", "Motion"},
+        )
+        self.assertTrue(Action.objects.filter(pk=answer.pk).exists())
+        self.assertEqual(Party.objects.get().pk, party_pk)
+        document = DocumentImage.objects.get(doc_id="1")
+        self.assertEqual(document.description, "Amended Answer")
+        self.assertTrue(document.is_available)
+        self.assertTrue(DocumentImage.objects.filter(doc_id="2").exists())
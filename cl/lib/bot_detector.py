@@ -1,44 +1,68 @@
-def base_bot_matcher(request, known_bots):
-    """Detect if a request's user agent is in a list of user agents
+import re
+from functools import lru_cache
+from typing import Callable, List
 
-    Matching is done by seeing if any of the items in the list of known_bots
-    is in the user agent for the request provided.
+KNOWN_BOTS = [
+    "baiduspider",
+    "bingbot",
+    "dotbot",
+    "googlebot",
+    "kaloogabot",
+    "ia_archiver",
+    "msnbot",
+    "slurp",
+    "speedy spider",
+    "teoma",
+    "twiceler",
+    "yandexbot",
+    "yodaobot",
+]
+
+# Bots that understand opengraph / twitter cards
+KNOWN_OG_BOTS = [
+    "facebookexternalhit",
+    "iframely",  # A service for getting open graph data?
+    "linkedinbot",
+    "skypeuripreview",
+    "slackbot-linkexpanding",
+    "twitterbot",
+]
+
+
+def make_user_agent_matcher(known_bots: List[str]) -> Callable[[str], bool]:
+    """Make a function that checks if a user agent contains any of the items
+    in a list of known_bots, ignoring case.
+
+    The items are compiled into one regex, so a user agent is scanned once
+    however long the list is, and the results for recent user agents are
+    kept, since most requests come from a few of them.
+    """
+    regex = re.compile("|".join(re.escape(bot.lower()) for bot in known_bots))
+
+    @lru_cache(maxsize=1024)
+    def matches(ua: str) -> bool:
+        return regex.search(ua.lower()) is not None
+
+    return matches
+
+
+user_agent_is_bot = make_user_agent_matcher(KNOWN_BOTS)
+user_agent_is_og_bot = make_user_agent_matcher(KNOWN_OG_BOTS)
+
+
+def base_bot_matcher(request, matches_user_agent):
+    """Detect if a request's user agent is a bot, according to a function
+    made by make_user_agent_matcher.
     """
     ua = request.META.get("HTTP_USER_AGENT", "Testing U-A")
-    for bot in known_bots:
-        if bot in ua.lower():
-            return True
-    return False
+    return matches_user_agent(ua)
 
 
 def is_bot(request):
     """Checks if the thing making a request is a crawler."""
-    known_bots = [
-        "baiduspider",
-        "bingbot",
-        "dotbot",
-        "googlebot",
-        "kaloogabot",
-        "ia_archiver",
-        "msnbot",
-        "slurp",
-        "speedy spider",
-        "teoma",
-        "twiceler",
-        "yandexbot",
-        "yodaobot",
-    ]
-    return base_bot_matcher(request, known_bots)
+    return base_bot_matcher(request, user_agent_is_bot)
 
 
 def is_og_bot(request):
     """Check if it's a bot that understands opengraph / twitter cards"""
-    known_bots = [
-        "facebookexternalhit",
-        "iframely",  # A service for getting open graph data?
-        "LinkedInBot",
-        "skypeuripreview",
-        "slackbot-linkexpanding",
-        "twitterbot",
-    ]
-    return base_bot_matcher(request, known_bots)
+    return base_bot_matcher(request, user_agent_is_og_bot)
@@ -0,0 +1,233 @@
+"""A cache backend that keeps recently used values in each process, in front of
+another cache.
+
+Values are read from a small LRU cache in the process first, then from the
+storage cache, which is any other configured cache, usually redis. Values are
+pickled by this backend, and compressed before they go to storage if they're
+large, so storage holds fewer bytes and the process can keep its copies
+without sharing mutable objects between callers.
+
+The local copies aren't told when another process changes or deletes a value,
+so they're only kept for LOCAL_TIMEOUT seconds.
+
+Options:
+
+ - STORAGE: The alias of the cache that holds the values.
+ - MAX_ENTRIES: The number of values each process keeps. 0 turns off the
+   local tier.
+ - LOCAL_TIMEOUT: How long each process keeps a value, in seconds.
+ - LOCAL_MAX_VALUE_SIZE: Values bigger than this, pickled, aren't kept by
+   processes.
+ - COMPRESS_MIN_LENGTH: Values at least this big, pickled, are compressed.
+"""
+import pickle
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Prefixes of the values in storage, saying how they're encoded.
+PICKLED = b"p"
+COMPRESSED = b"z"
+
+# The local tiers of the process, by cache name. Django makes a cache object
+# per thread, but the threads of a process share the local tier.
+_local_tiers = {}
+_local_tiers_lock = threading.Lock()
+
+
+class LocalTier(object):
+    """A thread-safe LRU cache of pickled values that expire.
+
+    :param max_entries: The most values to keep.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, pickled = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return pickled
+
+    def set(self, key: str, pickled: bytes, timeout: float) -> None:
+        if self.max_entries <= 0 or timeout <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + timeout, pickled)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, name: str, params: Dict[str, Any]) -> None:
+        super(TieredCache, self).__init__(params)
+        options = params.get("OPTIONS", {})
+        self.storage_alias = options["STORAGE"]
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 60)
+        self.local_max_value_size = options.get(
+            "LOCAL_MAX_VALUE_SIZE", 64 * 1024
+        )
+        self.compress_min_length = options.get("COMPRESS_MIN_LENGTH", 1024)
+        with _local_tiers_lock:
+            if name not in _local_tiers:
+                _local_tiers[name] = LocalTier(self._max_entries)
+            self.local = _local_tiers[name]
+
+    @property
+    def storage(self) -> BaseCache:
+        return caches[self.storage_alias]
+
+    def encode(self, value: Any) -> Tuple[bytes, bytes]:
+        """Pickle a value.
+
+        :return: A tuple of the pickled value, and the value to put in
+        storage.
+        """
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(pickled) >= self.compress_min_length:
+            return pickled, COMPRESSED + zlib.compress(pickled)
+        return pickled, PICKLED + pickled
+
+    @staticmethod
+    def decode(stored: bytes) -> bytes:
+        """Get the pickled value from a value in storage."""
+        if stored[:1] == COMPRESSED:
+            return zlib.decompress(stored[1:])
+        return stored[1:]
+
+    def get_timeout(self, timeout: Any) -> Optional[float]:
+        """Get a timeout in seconds, or None for no expiry."""
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def set_local(
+        self, key: str, pickled: bytes, timeout: Optional[float]
+    ) -> None:
+        if len(pickled) > self.local_max_value_size:
+            return
+        if timeout is None:
+            timeout = self.local_timeout
+        self.local.set(key, pickled, min(timeout, self.local_timeout))
+
+    def make_and_validate_key(self, key: str, version: Optional[int]) -> str:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def add(
+        self,
+        key: str,
+        value: Any,
+        timeout: Any = DEFAULT_TIMEOUT,
+        version: Optional[int] = None,
+    ) -> bool:
+        # Only storage can say whether another process has set the key, so
+        # add() always goes to it. That keeps it usable as a lock.
+        key = self.make_and_validate_key(key, version)
+        timeout = self.get_timeout(timeout)
+        pickled, stored = self.encode(value)
+        if not self.storage.add(key, stored, timeout):
+            return False
+        self.set_local(key, pickled, timeout)
+        return True
+
+    def get(
+        self, key: str, default: Any = None, version: Optional[int] = None
+    ) -> Any:
+        key = self.make_and_validate_key(key, version)
+        pickled = self.local.get(key)
+        if pickled is None:
+            stored = self.storage.get(key)
+            if stored is None:
+                return default
+            pickled = self.decode(stored)
+            self.set_local(key, pickled, None)
+        return pickle.loads(pickled)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        timeout: Any = DEFAULT_TIMEOUT,
+        version: Optional[int] = None,
+    ) -> None:
+        key = self.make_and_validate_key(key, version)
+        timeout = self.get_timeout(timeout)
+        pickled, stored = self.encode(value)
+        self.storage.set(key, stored, timeout)
+        self.set_local(key, pickled, timeout)
+
+    def delete(self, key: str, version: Optional[int] = None) -> None:
+        key = self.make_and_validate_key(key, version)
+        self.local.delete(key)
+        self.storage.delete(key)
+
+    def get_many(
+        self, keys: Iterable[str], version: Optional[int] = None
+    ) -> Dict[str, Any]:
+        found = {}
+        missing = {}
+        for key in keys:
+            made_key = self.make_and_validate_key(key, version)
+            pickled = self.local.get(made_key)
+            if pickled is None:
+                missing[made_key] = key
+            else:
+                found[key] = pickle.loads(pickled)
+        if missing:
+            for made_key, stored in self.storage.get_many(missing).items():
+                pickled = self.decode(stored)
+                self.set_local(made_key, pickled, None)
+                found[missing[made_key]] = pickle.loads(pickled)
+        return found
+
+    def set_many(
+        self,
+        data: Dict[str, Any],
+        timeout: Any = DEFAULT_TIMEOUT,
+        version: Optional[int] = None,
+    ) -> List:
+        timeout = self.get_timeout(timeout)
+        to_store = {}
+        for key, value in data.items():
+            key = self.make_and_validate_key(key, version)
+            pickled, to_store[key] = self.encode(value)
+            self.set_local(key, pickled, timeout)
+        self.storage.set_many(to_store, timeout)
+        return []
+
+    def delete_many(
+        self, keys: Iterable[str], version: Optional[int] = None
+    ) -> None:
+        made_keys = [self.make_and_validate_key(key, version) for key in keys]
+        for key in made_keys:
+            self.local.delete(key)
+        self.storage.delete_many(made_keys)
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.storage.clear()
@@ -1,11 +1,17 @@
+import logging
+import threading
 import time
-from collections import deque
-from typing import List
+import uuid
+from collections import defaultdict, deque
+from typing import Dict, List, Optional
 
-from django.utils.timezone import now
+from celery import current_task
+from celery.signals import before_task_publish, task_postrun
 
 from cl.lib.redis_utils import make_redis_interface
 
+logger = logging.getLogger(__name__)
+
 PRIORITY_SEP: str = "\x06\x16"
 DEFAULT_PRIORITY_STEPS: List[int] = [0, 3, 6, 9]
 
@@ -63,8 +69,108 @@ def get_queue_length(queue_name: str = "celery") -> int:
     return sum([r.llen(x) for x in priority_names])
 
 
+# The message header that marks a task as counted by a throttle. Its value
+# is the name of the queue.
+THROTTLE_HEADER = "cl_throttle_queue"
+
+# Tasks that haven't finished in this long are assumed to be lost, for example
+# to a worker that was killed, and stop counting against their queue.
+IN_FLIGHT_TIMEOUT = 60 * 60
+
+# Atomically forget lost tasks and, if the queue has room, reserve a place in
+# it. KEYS: the in-flight key. ARGV: now, IN_FLIGHT_TIMEOUT, the budget and
+# the name of the reservation.
+RESERVE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local timeout = tonumber(ARGV[2])
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", now - timeout)
+if redis.call("ZCARD", KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call("ZADD", KEYS[1], now, ARGV[4])
+    redis.call("EXPIRE", KEYS[1], timeout)
+    return 1
+end
+return 0
+"""
+
+# The reservations made by the throttles of this process that haven't been
+# used by a task yet, by queue name.
+_reservations: Dict[str, deque] = defaultdict(deque)
+_reservations_lock = threading.Lock()
+
+
+def make_in_flight_key(queue_name: str) -> str:
+    return "celery:in-flight:%s" % queue_name
+
+
+def make_completed_key(queue_name: str) -> str:
+    return "celery:completed:%s" % queue_name
+
+
+@before_task_publish.connect
+def count_throttled_task(
+    sender=None, headers=None, routing_key=None, **kwargs
+) -> None:
+    """Count a task that's being sent against its queue's budget.
+
+    The task takes the place reserved by the last call to maybe_wait in this
+    process. A task sent by a counted task, such as the next task of a chain,
+    takes the place of the task that sent it instead.
+    """
+    if not headers or "id" not in headers:
+        return
+    old_member = None
+    with _reservations_lock:
+        reservations = _reservations.get(routing_key)
+        if reservations:
+            old_member = reservations.popleft()
+    if old_member is None:
+        request = current_task.request if current_task else None
+        if request is None or (
+            getattr(request, THROTTLE_HEADER, None) != routing_key
+            or getattr(request, "throttle_handed_off", False)
+        ):
+            return
+        # The parent's place goes to its first child on the same queue.
+        request.throttle_handed_off = True
+        old_member = request.id
+
+    key = make_in_flight_key(routing_key)
+    r = make_redis_interface("CACHE")
+    pipe = r.pipeline()
+    pipe.zrem(key, old_member)
+    pipe.zadd(key, {headers["id"]: time.time()})
+    pipe.execute()
+    headers[THROTTLE_HEADER] = routing_key
+
+
+@task_postrun.connect
+def release_throttled_task(sender=None, task_id=None, task=None, **kwargs):
+    """Give a finished task's place in its queue back to the throttles."""
+    queue_name = getattr(task.request, THROTTLE_HEADER, None)
+    if queue_name is None or getattr(
+        task.request, "throttle_handed_off", False
+    ):
+        return
+    r = make_redis_interface("CACHE")
+    pipe = r.pipeline()
+    pipe.zrem(make_in_flight_key(queue_name), task_id)
+    pipe.incr(make_completed_key(queue_name))
+    pipe.execute()
+
+
 class CeleryThrottle(object):
-    """A class for throttling celery."""
+    """A class for throttling celery.
+
+    Each queue has a budget of tasks in flight: sent, but not yet finished.
+    It works like a token bucket that's shared by every throttle on the
+    queue, in any process. maybe_wait takes a token before each task is sent,
+    waiting for one if there are none, and workers give the token back when
+    the task finishes. Producers therefore send tasks as fast as the workers
+    finish them, without polling the length of the queue.
+
+    Only tasks sent to queue_name are counted. Tasks that are never sent give
+    their token back at the next call to maybe_wait.
+    """
 
     def __init__(
         self,
@@ -72,97 +178,116 @@ class CeleryThrottle(object):
         min_wait: int = 0,
         max_wait: int = 1,
         queue_name: str = "celery",
+        report_interval: int = 60,
     ) -> None:
         """Create a throttle to prevent celery run aways.
 
-        :param min_items: The minimum number of items that should be enqueued.
-        A maximum of 2× this number may be created. This minimum value is not
-        guaranteed and so a number slightly higher than your max concurrency
-        should be used. Note that this number includes all tasks unless you use
-        a specific queue for your processing.
+        :param min_items: Half the number of tasks that may be in flight in
+        the queue, counting tasks sent by every throttle using it. Use a
+        number slightly higher than your max concurrency, so tasks are
+        waiting whenever a worker is free.
         :param min_wait: The minimum amount of time that should be waited every
         time `maybe_wait()` is called.
-        :param max_wait: The maximum amount of time that can be slept between
-        loops. If min_wait is greater than max_wait, min_wait wins.
+        :param max_wait: The longest to wait before checking again whether the
+        queue has room. If min_wait is greater than max_wait, min_wait wins.
+        :param report_interval: How often to log the throughput of the queue,
+        in seconds.
         """
-        self.min = min_items
-        self.max = self.min * 2
+        self.budget = min_items * 2
         self.min_wait = min_wait
-        self.max_wait = max_wait
-
-        # Variables used to track the queue and wait-rate
-        self.last_processed_count = 0
-        self.count_to_do = self.max
-        self.last_measurement = None
-        self.first_run = True
-
-        # Use a fixed-length queue to hold last N rates
-        self.rates = deque(maxlen=15)
-        self.avg_rate = self._calculate_avg()
-
-        # For inspections
+        self.max_wait = max_wait or 1
         self.queue_name = queue_name
-
-    def _calculate_avg(self) -> float:
-        return float(sum(self.rates)) / (len(self.rates) or 1)
-
-    def _add_latest_rate(self) -> None:
-        """Calculate the rate that the queue is processing items."""
-        right_now = now()
-        elapsed_seconds = (right_now - self.last_measurement).total_seconds()
-        self.rates.append(self.last_processed_count / elapsed_seconds)
-        self.last_measurement = right_now
-        self.last_processed_count = 0
-        self.avg_rate = self._calculate_avg()
+        self.report_interval = report_interval
+
+        self.r = make_redis_interface("CACHE")
+        self.reserve = self.r.register_script(RESERVE_SCRIPT)
+        self.in_flight_key = make_in_flight_key(queue_name)
+        self.completed_key = make_completed_key(queue_name)
+        self.reservation: Optional[str] = None
+
+        # Variables used to report throughput
+        self.sent_count = 0
+        self.waited_seconds = 0.0
+        self.last_report = time.monotonic()
+        self.last_sent_count = 0
+        self.last_completed_count = self.get_completed_count()
+
+    def get_completed_count(self) -> int:
+        """Get the number of counted tasks that have finished in the queue."""
+        return int(self.r.get(self.completed_key) or 0)
+
+    def get_in_flight_count(self) -> int:
+        """Get the number of counted tasks in the queue or running."""
+        return self.r.zcard(self.in_flight_key)
+
+    def _release_unused_reservation(self) -> None:
+        """Give back the last reservation if no task has used it."""
+        if self.reservation is None:
+            return
+        with _reservations_lock:
+            reservations = _reservations[self.queue_name]
+            try:
+                reservations.remove(self.reservation)
+            except ValueError:
+                # It was used.
+                unused = False
+            else:
+                unused = True
+        if unused:
+            self.r.zrem(self.in_flight_key, self.reservation)
+        self.reservation = None
+
+    def _try_reserve(self) -> bool:
+        reservation = "reserved:%s" % uuid.uuid4().hex
+        reserved = self.reserve(
+            keys=[self.in_flight_key],
+            args=[time.time(), IN_FLIGHT_TIMEOUT, self.budget, reservation],
+        )
+        if not reserved:
+            return False
+        self.reservation = reservation
+        with _reservations_lock:
+            _reservations[self.queue_name].append(reservation)
+        return True
 
     def maybe_wait(self) -> None:
-        """Stall the calling function or let it proceed, depending on the queue
+        """Stall the calling function until the queue has room for another
+        task, then reserve a place for it.
 
-        The idea here is to check the length of the queue as infrequently as
-        possible while keeping the number of items in the queue as closely
-        between self.min and self.max as possible.
-
-        We do this by immediately enqueueing self.max items. After that, we
-        monitor the queue to determine how quickly it is processing items. Using
-        that rate we wait an appropriate amount of time or immediately press
-        on.
+        Call this right before sending each task to the queue.
         """
-        self.last_processed_count += 1
-        if self.count_to_do > 0:
-            # Do not wait. Allow process to continue.
-            if self.first_run:
-                self.first_run = False
-                self.last_measurement = now()
-            self.count_to_do -= 1
-            if self.min_wait:
-                time.sleep(self.min_wait)
-            return
-
-        self._add_latest_rate()
-        task_count = get_queue_length(self.queue_name)
-        if task_count > self.min:
-            # Estimate how long the surplus will take to complete and wait that
-            # long + 5% to ensure we're below self.min on next iteration.
-            surplus_task_count = task_count - self.min
-            wait_time = (surplus_task_count / self.avg_rate) * 1.05
-
-            if self.max_wait:
-                # Cap the wait time if max_wait is set.
-                wait_time = min(wait_time, self.max_wait)
-            if self.min_wait:
-                # But be sure to wait at least min_wait it is set (min_wait
-                # trumps max_wait this way).
-                wait_time = max(wait_time, self.min_wait)
-            time.sleep(wait_time)
-
-            # Assume we're below self.min due to waiting; max out the queue.
-            if task_count < self.max:
-                self.count_to_do = self.max - self.min
-            return
-
-        elif task_count <= self.min:
-            # Add more items.
-            self.count_to_do = self.max - task_count
-            if self.min_wait > 0:
-                time.sleep(self.min_wait)
+        self._release_unused_reservation()
+        delay = 0.05
+        while not self._try_reserve():
+            time.sleep(delay)
+            self.waited_seconds += delay
+            # Back off, so a full queue isn't checked too often.
+            delay = min(delay * 2, self.max_wait)
+        if self.min_wait:
+            time.sleep(self.min_wait)
+            self.waited_seconds += self.min_wait
+        self.sent_count += 1
+        self.maybe_report()
+
+    def maybe_report(self) -> None:
+        """Log the throughput of the queue every report_interval seconds."""
+        right_now = time.monotonic()
+        elapsed_seconds = right_now - self.last_report
+        if elapsed_seconds <= 0 or elapsed_seconds < self.report_interval:
             return
+        completed_count = self.get_completed_count()
+        logger.info(
+            "Queue %s: sent %.1f tasks/s, all workers finished %.1f tasks/s, "
+            "%s of %s in flight. Sent %s tasks in total, after waiting %.0f "
+            "seconds.",
+            self.queue_name,
+            (self.sent_count - self.last_sent_count) / elapsed_seconds,
+            (completed_count - self.last_completed_count) / elapsed_seconds,
+            self.get_in_flight_count(),
+            self.budget,
+            self.sent_count,
+            self.waited_seconds,
+        )
+        self.last_report = right_now
+        self.last_sent_count = self.sent_count
+        self.last_completed_count = completed_count
@@ -1,9 +1,12 @@
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from datetime import date, datetime
+
 from dateutil.relativedelta import relativedelta
 from django.db.models import Min, Q
 
 from cl.corpus_importer.import_columbia.parse_judges import find_judge_names
-from cl.lib.utils import previous_and_next
-from cl.people_db.models import Person
+from cl.people_db.models import Person, Position
 from cl.search.models import Court, Opinion
 
 
@@ -43,11 +46,11 @@ def find_person(
     # the previous ones to progressively narrow the filter. If we get to zero
     # results, raise. If we do all filtering and still have more than 1 result,
     # raise.
-    for prev, filters, nxt in previous_and_next(filter_sets):
-        if prev is not None:
-            # Each time, add the current filters to those that came before.
-            prev.extend(filters)
-        candidates = Person.objects.filter(*filters)
+    applied_filters = []
+    for filters in filter_sets:
+        # Each time, add the current filters to those that came before.
+        applied_filters.extend(filters)
+        candidates = Person.objects.filter(*applied_filters)
         if len(candidates) == 0:
             msg = "Unable to find judge with lname %s in court %s" % (
                 name_last,
@@ -93,6 +96,195 @@ def get_candidate_judges(judge_str, court_id, event_date):
     return [c for c in candidates if c is not None]
 
 
+# The position ID is there to break ties between positions that start on the
+# same date so that sorting never has to compare the remaining fields.
+IndexedPosition = namedtuple(
+    "IndexedPosition",
+    ["sort_key", "position_id", "person_id", "date_termination"],
+)
+
+
+class JudgeResolver(object):
+    """An in-memory replacement for find_person and get_candidate_judges.
+
+    find_person runs up to three queries joining people to their positions
+    for every name it is given, which is slow when assigning authors to
+    thousands of clusters at once. This class loads every person that has a
+    position in a court in a couple of queries and indexes the positions by
+    lower-cased last name, then by court, with the positions for each court
+    sorted by start date. Lookups then happen without touching the DB.
+
+    The narrowing done here mirrors the filters in find_person, including
+    the fact that a person with several matching positions in a court counts
+    once per position, so the two return the same people.
+
+    The index is a snapshot. Build a new one if judges are added or changed
+    while it is in use.
+    """
+
+    def __init__(self):
+        # {name_last: {court_id: [IndexedPosition, ...]}}
+        self.index = defaultdict(lambda: defaultdict(list))
+        self.people = {}
+
+    @classmethod
+    def from_db(cls):
+        """Build a resolver from every judicial position in the DB."""
+        resolver = cls()
+        positions = Position.objects.filter(
+            court__isnull=False, person__isnull=False
+        ).values_list(
+            "pk", "person_id", "court_id", "date_start", "date_termination"
+        )
+        people = Person.objects.filter(positions__court__isnull=False)
+        resolver.people = {p.pk: p for p in people.distinct()}
+        for pk, person_id, court_id, start, termination in positions:
+            person = resolver.people[person_id]
+            resolver.add_position(pk, person, court_id, start, termination)
+        resolver.sort()
+        return resolver
+
+    def add_position(
+        self, position_id, person, court_id, date_start, date_termination
+    ):
+        """Add a single position to the index.
+
+        Call sort() once you're done adding positions.
+        """
+        self.people[person.pk] = person
+        self.index[person.name_last.lower()][court_id].append(
+            IndexedPosition(
+                date_start or date.min,
+                position_id,
+                person.pk,
+                date_termination,
+            )
+        )
+
+    def sort(self):
+        for courts in self.index.values():
+            for positions in courts.values():
+                positions.sort()
+
+    def find_person(
+        self,
+        name_last,
+        court_id,
+        name_first=None,
+        case_date=None,
+        raise_mult=False,
+        raise_zero=False,
+    ):
+        """Identify a judge by name and metadata, like find_person does.
+
+        :param name_last: The last name of the judge.
+        :param court_id: A CL Court ID where the case occurred.
+        :param name_first: The first name of the judge, if known.
+        :param case_date: The date of the case, if known.
+        :param raise_mult: Raise an exception if the judge can't be narrowed
+        down to one person.
+        :param raise_zero: Raise an exception if no judge is found.
+        :return: A Person object or None.
+        """
+        positions = self.index.get(name_last.lower(), {}).get(court_id, [])
+        narrowing_steps = []
+        if case_date is not None:
+            narrowing_steps.append(
+                lambda p: self._filter_by_date(p, case_date)
+            )
+        if name_first is not None:
+            narrowing_steps.append(
+                lambda p: self._filter_by_first_name(p, name_first)
+            )
+
+        candidates = positions
+        for narrow in [lambda p: p] + narrowing_steps:
+            candidates = narrow(candidates)
+            if len(candidates) == 0:
+                msg = "Unable to find judge with lname %s in court %s" % (
+                    name_last,
+                    court_id,
+                )
+                if raise_zero:
+                    raise Exception(msg)
+                else:
+                    return None
+
+            if len(candidates) == 1:
+                return self.people[candidates[0].person_id]
+
+        if raise_mult:
+            raise Exception(
+                "Multiple judges: Last name '%s', court '%s', options: %s."
+                % (
+                    name_last,
+                    court_id,
+                    str(
+                        [
+                            self.people[c.person_id].name_first
+                            for c in candidates
+                        ]
+                    ),
+                )
+            )
+
+    @staticmethod
+    def _filter_by_date(positions, case_date):
+        if isinstance(case_date, datetime):
+            case_date = case_date.date()
+        latest_start = case_date + relativedelta(years=1)
+        earliest_termination = case_date - relativedelta(years=1)
+        # Positions are sorted by start date, with unknown starts first, so
+        # anything at or past this index started too late.
+        end = bisect_left(positions, (latest_start,))
+        return [
+            p
+            for p in positions[:end]
+            if p.date_termination is None
+            or p.date_termination > earliest_termination
+        ]
+
+    def _filter_by_first_name(self, positions, name_first):
+        name_first = name_first.lower()
+        return [
+            p
+            for p in positions
+            if self.people[p.person_id].name_first.lower() == name_first
+        ]
+
+    def get_candidate_judges(self, judge_str, court_id, event_date):
+        """Figure out who a judge is from a string and some metadata.
+
+        Works like get_candidate_judges, but uses the in-memory index.
+        """
+        if not judge_str:
+            return None
+
+        judges = find_judge_names(judge_str)
+
+        if len(judges) == 0:
+            return []
+
+        candidates = []
+        for judge in judges:
+            candidates.append(
+                self.find_person(judge, court_id, case_date=event_date)
+            )
+        return [c for c in candidates if c is not None]
+
+    def bulk_get_candidate_judges(self, items):
+        """Resolve many judge strings at once.
+
+        :param items: An iterable of (judge_str, court_id, event_date) tuples.
+        :return: A list with the result of get_candidate_judges for each item,
+        in the same order as the items.
+        """
+        return [
+            self.get_candidate_judges(judge_str, court_id, event_date)
+            for judge_str, court_id, event_date in items
+        ]
+
+
 def get_scotus_judges(d):
     """Get the panel of scotus judges at a given date."""
     return Person.objects.filter(  # Find all the judges...
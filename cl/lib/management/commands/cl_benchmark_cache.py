@@ -0,0 +1,86 @@
+import time
+from statistics import median
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+
+from cl.lib.cache_backends import TieredCache
+from cl.lib.command_utils import VerboseCommand, logger
+
+
+def time_hits(cache, keys, rounds):
+    """Time getting keys that are in a cache.
+
+    :return: A list of the times of each get, in microseconds.
+    """
+    times = []
+    for _ in range(rounds):
+        for key in keys:
+            t1 = time.perf_counter()
+            cache.get(key)
+            times.append((time.perf_counter() - t1) * 1e6)
+    return times
+
+
+class Command(VerboseCommand):
+    help = (
+        "Compare the hit latency of the db_cache tiers with the "
+        "DatabaseCache it replaced. Needs the django_cache table."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keys",
+            type=int,
+            default=100,
+            help="The number of values to cache.",
+        )
+        parser.add_argument(
+            "--size",
+            type=int,
+            default=20,
+            help="The number of search results in each value. The citing "
+            "panels have up to 20.",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=10,
+            help="The number of times to get each value.",
+        )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        params = settings.CACHES["db_cache"]
+        storage_only_params = dict(
+            params, OPTIONS=dict(params["OPTIONS"], MAX_ENTRIES=0)
+        )
+        backends = [
+            ("Local tier", caches["db_cache"]),
+            ("Storage tier", TieredCache("benchmark", storage_only_params)),
+            ("DatabaseCache", DatabaseCache("django_cache", {})),
+        ]
+
+        value = (
+            [
+                {
+                    "absolute_url": "/opinion/%s/some-case-name-v-other/" % i,
+                    "caseName": "Some Case Name v. Other",
+                    "citation_count": i,
+                }
+                for i in range(options["size"])
+            ],
+            options["size"],
+        )
+        keys = ["benchmark:%s" % i for i in range(options["keys"])]
+        for name, cache in backends:
+            cache.set_many({key: value for key in keys}, 60 * 10)
+            times = time_hits(cache, keys, options["rounds"])
+            cache.delete_many(keys)
+            logger.info(
+                "%s: median %.0f µs, mean %.0f µs per hit.",
+                name,
+                median(times),
+                sum(times) / len(times),
+            )
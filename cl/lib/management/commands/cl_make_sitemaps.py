@@ -0,0 +1,25 @@
+import time
+
+from django.conf import settings
+
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.sitemap import write_sitemaps
+from cl.urls import sitemaps
+
+
+class Command(VerboseCommand):
+    help = (
+        "Write the sitemaps to SITEMAPS_DIR, so crawlers get them without "
+        "querying the DB. Only pages whose items have changed are written "
+        "again. Run this nightly."
+    )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        t1 = time.time()
+        write_sitemaps(sitemaps)
+        logger.info(
+            "Wrote the sitemaps to %s in %.1f seconds.",
+            settings.SITEMAPS_DIR,
+            time.time() - t1,
+        )
@@ -0,0 +1,28 @@
+import time
+
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.lib.view_utils import flush_view_counts
+
+
+class Command(VerboseCommand):
+    help = (
+        "Write the view counts tallied in redis to the DB. Run this every few "
+        "minutes from cron, or leave it running with --every."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every",
+            type=int,
+            default=None,
+            help="Keep running, flushing every this many seconds.",
+        )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        while True:
+            count = flush_view_counts()
+            logger.info("Flushed view counts for %s items.", count)
+            if options["every"] is None:
+                break
+            time.sleep(options["every"])
@@ -99,32 +99,72 @@ def verify_ip_address(ip_address):
     return False
 
 
+WHITELIST_CACHE_PREFIX = "rl:whitelist"
+# The values of IPs that aren't approved crawlers, or are being checked.
+# Approved crawlers have their IP as the value.
+WHITELIST_DENIED = "denied"
+WHITELIST_PENDING = "pending"
+
+WHITELIST_APPROVED_TIMEOUT = 60 * 60 * 24 * 7
+WHITELIST_DENIED_TIMEOUT = 60 * 60 * 24
+# How long to wait for a check before trying another one.
+WHITELIST_PENDING_TIMEOUT = 60 * 5
+
+
+def get_whitelist_cache():
+    cache_name = getattr(settings, "RATELIMIT_USE_CACHE", "default")
+    return caches[cache_name]
+
+
+def make_whitelist_key(ip_address):
+    return "%s:%s" % (WHITELIST_CACHE_PREFIX, ip_address)
+
+
+def verify_and_cache_ip_address(ip_address):
+    """Verify an IP address and cache the result for is_whitelisted.
+
+    Approved crawlers are kept for a week, and other IPs for a day.
+
+    Returns True if the IP address belongs to an approved crawler, else
+    False.
+    """
+    try:
+        approved_crawler = verify_ip_address(ip_address)
+    except (socket.error, UnicodeError):
+        approved_crawler = False
+
+    cache = get_whitelist_cache()
+    key = make_whitelist_key(ip_address)
+    if approved_crawler:
+        cache.set(key, ip_address, WHITELIST_APPROVED_TIMEOUT)
+    else:
+        cache.set(key, WHITELIST_DENIED, WHITELIST_DENIED_TIMEOUT)
+    return approved_crawler
+
+
 def is_whitelisted(request):
     """Checks if the IP address is whitelisted due to belonging to an approved
     crawler.
 
+    The DNS lookups that verify a crawler are slow, so they're done by a
+    celery task. Until it finishes, the IP address isn't whitelisted.
+
     Returns True if so, else False.
     """
-    cache_name = getattr(settings, "RATELIMIT_USE_CACHE", "default")
-    cache = caches[cache_name]
-    whitelist_cache_prefix = "rl:whitelist"
+    from cl.lib.tasks import verify_crawler_ip_address
+
     ip_address = request.META.get("REMOTE_ADDR")
     if ip_address is None:
         return False
 
-    whitelist_key = "%s:%s" % (whitelist_cache_prefix, ip_address)
-
-    # Check if the ip address is in our whitelist.
-    if cache.get(whitelist_key):
-        return True
-
-    # If not whitelisted, verify the IP address and add it to the cache for
-    # future requests.
-    approved_crawler = verify_ip_address(ip_address)
-
-    if approved_crawler:
-        # Add the IP to our cache with a one week expiration date
-        a_week = 60 * 60 * 24 * 7
-        cache.set(whitelist_key, ip_address, a_week)
-
-    return approved_crawler
+    cache = get_whitelist_cache()
+    whitelist_key = make_whitelist_key(ip_address)
+    value = cache.get(whitelist_key)
+    if value is None:
+        # Only the first request from an IP sends it to be checked.
+        if cache.add(
+            whitelist_key, WHITELIST_PENDING, WHITELIST_PENDING_TIMEOUT
+        ):
+            verify_crawler_ip_address.delay(ip_address)
+        return False
+    return value not in (WHITELIST_DENIED, WHITELIST_PENDING)
@@ -1,6 +1,42 @@
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.paginator import PageNotAnInteger, Paginator
 from scorched import SolrInterface
 from scorched.exc import SolrError
-from scorched.search import Options, SolrSearch
+from scorched.search import Options, SolrSearch, params_from_dict
+
+from cl.lib.redis_utils import make_redis_interface
+
+SOLR_INDEX_VERSION_KEY = "solr-index-version:%s"
+
+
+def get_solr_index_version_key(url: str) -> str:
+    return SOLR_INDEX_VERSION_KEY % url.rstrip("/")
+
+
+def get_solr_index_version(url: str) -> str:
+    """Get the version stamp of a Solr core. It changes whenever we change
+    the core, so it can be used in cache keys for its results.
+
+    :param url: The URL of the core.
+    """
+    r = make_redis_interface("CACHE")
+    return r.get(get_solr_index_version_key(url)) or "0"
+
+
+def bump_solr_index_version(url: str) -> None:
+    """Note that a Solr core changed, so results cached from it aren't used.
+
+    Changes don't show up in results until Solr commits them, so results
+    can still be cached from before a change for a little while after this is
+    called. That's why search results are only cached for a few minutes.
+
+    :param url: The URL of the core.
+    """
+    r = make_redis_interface("CACHE")
+    r.incr(get_solr_index_version_key(url))
 
 
 class ExtraSolrInterface(SolrInterface):
@@ -70,6 +106,14 @@ class ExtraSolrSearch(SolrSearch):
         "extra",
     )
 
+    # How long to cache responses, or None not to cache them.
+    cache_timeout = None
+
+    def __init__(self, interface, original=None):
+        super(ExtraSolrSearch, self).__init__(interface, original)
+        if original is not None:
+            self.cache_timeout = original.cache_timeout
+
     def _init_common_modules(self):
         super(ExtraSolrSearch, self)._init_common_modules()
         self.extra = ExtraOptions()
@@ -79,7 +123,65 @@ class ExtraSolrSearch(SolrSearch):
         newself.extra.update(kwargs)
         return newself
 
+    def cache(self, timeout):
+        """Cache the responses to this search, including its counts and
+        pages.
+
+        Responses are cached by the core's version and the exact parameters
+        sent to Solr, so changes to the core or the query get new responses.
+        If the same query is already being run by another process, this
+        waits for its response instead of running it again.
+
+        :param timeout: How long to cache the responses, in seconds.
+        """
+        newself = self.clone()
+        newself.cache_timeout = timeout
+        return newself
+
+    def get_cache_key(self):
+        url = self.interface.conn.url
+        params = sorted(params_from_dict(**self.options()))
+        digest = hashlib.sha256(
+            json.dumps(
+                [type(self).__name__, url, params], default=str
+            ).encode()
+        ).hexdigest()
+        return "solr-response:%s:%s" % (get_solr_index_version(url), digest)
+
+    def execute(self, constructor=None):
+        if self.cache_timeout is None:
+            return self.execute_uncached(constructor)
+
+        # Avoid circular import
+        from cl.lib.search_utils import get_or_set_with_lock
+
+        response = get_or_set_with_lock(
+            cache,
+            self.get_cache_key(),
+            lambda: self.execute_uncached(constructor),
+            self.cache_timeout,
+            default=None,
+        )
+        if response is None:
+            # Another process took too long. Don't wait any longer.
+            response = self.execute_uncached(constructor)
+        return response
+
+    def execute_uncached(self, constructor=None):
+        return super(ExtraSolrSearch, self).execute(constructor)
+
     _count = None
+    # The last page gotten by slicing, as a (start, rows, response) tuple.
+    _page = None
+
+    @staticmethod
+    def get_total(response):
+        """Get the number of results, or of groups if the results are
+        grouped, from a response.
+        """
+        if response.groups:
+            return getattr(response.groups, response.group_field)["ngroups"]
+        return response.result.numFound
 
     def count(self):
         if self._count is None:
@@ -87,15 +189,55 @@ class ExtraSolrSearch(SolrSearch):
             # query or else we'll set rows=0 for remainder.
             newself = self.clone()
             r = newself.add_extra(rows=0).execute()
-            if r.groups:
-                total = getattr(r.groups, r.group_field)["ngroups"]
-            else:
-                total = r.result.numFound
 
             # Set the cache
-            self._count = total
+            self._count = self.get_total(r)
         return self._count
 
+    def __getitem__(self, key):
+        """Get a page of results, noting the count from the same response so
+        that count() doesn't have to query for it.
+        """
+        if isinstance(key, int):
+            start, rows = key, 1
+        elif isinstance(key, slice):
+            start, rows = key.start, key.stop - key.start
+        else:
+            raise TypeError("Subscript must be int or slice")
+
+        if self._page is not None:
+            page_start, page_rows, response = self._page
+            if start == page_start and rows <= page_rows:
+                # Fewer rows are only asked for at the end of the results,
+                # where the response already has all there are.
+                return response
+
+        response = self.paginate(start, rows).execute()
+        self._count = self.get_total(response)
+        self._page = (start, rows, response)
+        return response
+
+
+class SolrPaginator(Paginator):
+    """A paginator for ExtraSolrSearch objects that gets the page and the
+    total count in one query.
+
+    Django's paginator counts the results before it gets the page, which
+    takes two queries. This gets the page first, and the count comes with it.
+    """
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number >= 1 and "count" not in self.__dict__:
+            # Get the page, setting the count. If the page turns out to be out
+            # of range, Django will raise and this won't be used.
+            bottom = (number - 1) * self.per_page
+            self.object_list[bottom : bottom + self.per_page]
+        return super(SolrPaginator, self).page(number)
+
 
 class ExtraOptions(Options):
     def __init__(self, original=None):
@@ -121,7 +263,7 @@ class MoreLikeThisHighlightsSolrSearch(ExtraSolrSearch):
     # Limit length of text field
     text_max_length = 500
 
-    def execute(self, constructor=None):
+    def execute_uncached(self, constructor=None):
         """
         Execute MLT-query and add highlighting to MLT search results.
         """
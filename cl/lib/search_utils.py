@@ -1,10 +1,12 @@
 import re
+import time
 from datetime import date, timedelta
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import parse_qs, urlencode
 
 from django.conf import settings
 from django.core.cache import cache, caches
+from django.db import connection
 from django.http import HttpRequest, QueryDict
 from scorched.response import SolrResponse
 
@@ -12,6 +14,7 @@ from cl.citations.find_citations import get_citations
 from cl.citations.match_citations import match_citation
 from cl.citations.models import Citation
 from cl.citations.utils import get_citation_depth_between_clusters
+from cl.custom_filters.templatetags.text_filters import best_case_name
 from cl.lib.bot_detector import is_bot
 from cl.lib.scorched_utils import ExtraSolrInterface
 from cl.search.constants import (
@@ -20,6 +23,7 @@ from cl.search.constants import (
     SOLR_PEOPLE_HL_FIELDS,
     SOLR_RECAP_HL_FIELDS,
 )
+from cl.search.court_registry import copy_courts
 from cl.search.forms import SearchForm
 from cl.search.models import (
     DOCUMENT_STATUSES,
@@ -67,6 +71,19 @@ BOOSTS = {
     },
 }
 
+# How long search results are cached, by search type. Results change fastest
+# in RECAP, where new filings come in all day.
+SEARCH_RESULT_CACHE_TIMEOUTS = {
+    SEARCH_TYPES.OPINION: 60 * 10,
+    SEARCH_TYPES.RECAP: 60 * 2,
+    SEARCH_TYPES.DOCKETS: 60 * 2,
+    SEARCH_TYPES.ORAL_ARGUMENT: 60 * 10,
+    SEARCH_TYPES.PEOPLE: 60 * 30,
+}
+
+# Where make_coverage_counts results are cached.
+COVERAGE_COUNTS_CACHE_KEY = "coverage-counts"
+
 
 def get_solr_interface(cd: Dict[str, Any]) -> ExtraSolrInterface:
     """Get the correct solr interface for the query"""
@@ -208,31 +225,30 @@ def merge_form_with_courts(courts, search_form):
     requires manual adjustment here.
     """
     # Are any of the checkboxes checked?
-    checked_statuses = [
-        field.value()
+    checked_statuses = {
+        field.html_name: field.value()
         for field in search_form
         if field.html_name.startswith("court_")
-    ]
-    no_facets_selected = not any(checked_statuses)
-    all_facets_selected = all(checked_statuses)
+    }
+    no_facets_selected = not any(checked_statuses.values())
+    all_facets_selected = all(checked_statuses.values())
     court_count = len(
-        [status for status in checked_statuses if status is True]
+        [status for status in checked_statuses.values() if status is True]
     )
     court_count_human = court_count
     if all_facets_selected:
         court_count_human = "All"
 
-    for field in search_form:
+    # The courts may come from the court registry, so set the checkboxes on
+    # copies of them.
+    courts = copy_courts(courts)
+    for court in courts:
         if no_facets_selected:
-            for court in courts:
-                court.checked = True
+            court.checked = True
         else:
-            for court in courts:
-                # We're merging two lists, so we have to do a nested loop
-                # to find the right value.
-                if "court_%s" % court.pk == field.html_name:
-                    court.checked = field.value()
-                    break
+            html_name = "court_%s" % court.pk
+            if html_name in checked_statuses:
+                court.checked = checked_statuses[html_name]
 
     # Build the dict with jurisdiction keys and arrange courts into tabs
     court_tabs = {
@@ -956,6 +972,64 @@ def build_court_count_query(group: bool = False) -> Dict[str, str]:
     return params
 
 
+def get_annual_counts(
+    si: ExtraSolrInterface, court: str
+) -> Tuple[Optional[int], List[int]]:
+    """Count the opinions in a court, by year.
+
+    :param si: A Solr interface for opinions.
+    :param court: The ID of the court, or "all".
+    :return: A tuple of the first year with any opinions, and a list of the
+    counts from that year through the last year with any. If there are no
+    opinions, the year is None and the list is empty.
+    """
+    facet_field = "dateFiled"
+    response = (
+        si.query()
+        .add_extra(**build_coverage_query(court, None, facet_field))
+        .execute()
+    )
+    counts = response.facet_counts.facet_ranges[facet_field]["counts"]
+    non_zero = [i for i, (_, count) in enumerate(counts) if count]
+    if not non_zero:
+        return None, []
+    start, end = non_zero[0], non_zero[-1]
+    return (
+        int(counts[start][0][:4]),
+        [count for _, count in counts[start : end + 1]],
+    )
+
+
+def make_coverage_counts() -> Dict[str, Any]:
+    """Count the opinions in every court, in total and by year.
+
+    This runs one query for the totals, and one per court that has any
+    opinions, so it's done ahead of time by cl_make_coverage_counts, and the
+    coverage API and court pages use what it cached.
+
+    :return: A dict with "totals", a dict of court IDs to their number of
+    opinions, and "annual_counts", a dict of court IDs and "all" to the
+    tuples that get_annual_counts returns.
+    """
+    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    response = si.query().add_extra(**build_court_count_query()).execute()
+    court_count_tuples = response.facet_counts.facet_fields["court_exact"]
+    totals = {court: count for court, count in court_count_tuples}
+    annual_counts = {"all": get_annual_counts(si, "all")}
+    for court, count in totals.items():
+        if count:
+            annual_counts[court] = get_annual_counts(si, court)
+    si.conn.http_connection.close()
+    return {"totals": totals, "annual_counts": annual_counts}
+
+
+def get_coverage_counts() -> Optional[Dict[str, Any]]:
+    """Get the counts made by make_coverage_counts, or None if they haven't
+    been made.
+    """
+    return cache.get(COVERAGE_COUNTS_CACHE_KEY)
+
+
 def add_depth_counts(
     search_data: Dict[str, Any],
     search_results: SolrResponse,
@@ -989,151 +1063,273 @@ def add_depth_counts(
         return None
 
 
+def get_or_set_with_lock(
+    cache,
+    cache_key: str,
+    make_value: Callable[[], Any],
+    timeout: int,
+    default: Any,
+    wait: float = 0.3,
+) -> Any:
+    """Get a value from the cache, or make it if it's missing, making sure
+    that only one process makes it at a time.
+
+    When a popular item falls out of the cache, every request for it misses
+    at once, and they all run the same expensive query. To avoid that, the
+    first miss takes a short-lived lock and makes the value. Other misses
+    wait a few hundred milliseconds for the value to show up, then give up
+    and return the default rather than piling on or tying up a worker.
+
+    :param cache: The cache holding the value.
+    :param cache_key: The key of the value.
+    :param make_value: A function that makes the value on a miss.
+    :param timeout: How long to cache the value, in seconds.
+    :param default: What to return if another process is making the value
+    and it doesn't show up in time.
+    :param wait: How long to wait for another process, in seconds.
+    :return: The value
+    """
+    value = cache.get(cache_key)
+    if value is not None:
+        return value
+
+    lock_key = "lock:%s" % cache_key
+    # add() only sets the key if it's missing, so only one process gets it.
+    if cache.add(lock_key, True, 60):
+        try:
+            value = make_value()
+            cache.set(cache_key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    give_up = time.time() + wait
+    while time.time() < give_up:
+        time.sleep(0.05)
+        value = cache.get(cache_key)
+        if value is not None:
+            return value
+    return default
+
+
+def make_citing_clusters(
+    cluster_pks: List[int],
+) -> Dict[int, Tuple[List[Dict[str, Any]], int]]:
+    """Get the opinions citing each of many clusters from the DB.
+
+    This gives the same data as the "cites:" Solr query used on the opinion
+    page, in a fixed number of queries, so it can be done in bulk.
+
+    :param cluster_pks: The clusters to get citing opinions for.
+    :return: A dict mapping each cluster pk to a tuple of its top five
+    citing opinions and the total number of citing opinions. Each citing
+    opinion is a dict with the same fields as the Solr results.
+    """
+    with connection.cursor() as cursor:
+        # Rank the citing opinions of each cluster by the citation count of
+        # their own cluster, keeping only the top five, and count them all.
+        # An opinion citing several opinions in a cluster only counts once.
+        cursor.execute(
+            """
+            WITH citing AS (
+                SELECT DISTINCT
+                    cited.cluster_id AS cited_cluster_id,
+                    citing.id AS citing_opinion_id,
+                    citing.cluster_id AS citing_cluster_id,
+                    citing_cluster.citation_count
+                FROM search_opinionscited oc
+                JOIN search_opinion cited ON oc.cited_opinion_id = cited.id
+                JOIN search_opinion citing ON oc.citing_opinion_id = citing.id
+                JOIN search_opinioncluster citing_cluster
+                    ON citing.cluster_id = citing_cluster.id
+                WHERE cited.cluster_id IN %s
+            )
+            SELECT cited_cluster_id, citing_cluster_id, total
+            FROM (
+                SELECT
+                    cited_cluster_id,
+                    citing_cluster_id,
+                    row_number() OVER (
+                        PARTITION BY cited_cluster_id
+                        ORDER BY citation_count DESC
+                    ) AS rank,
+                    count(*) OVER (PARTITION BY cited_cluster_id) AS total
+                FROM citing
+            ) ranked
+            WHERE rank <= 5
+            ORDER BY cited_cluster_id, rank
+            """,
+            [tuple(cluster_pks) or (None,)],
+        )
+        rows = cursor.fetchall()
+
+    citing_clusters = OpinionCluster.objects.in_bulk(
+        {citing_cluster_id for _, citing_cluster_id, _ in rows}
+    )
+    results = {pk: ([], 0) for pk in cluster_pks}
+    for cited_cluster_id, citing_cluster_id, total in rows:
+        citing_cluster = citing_clusters[citing_cluster_id]
+        results[cited_cluster_id][0].append(
+            {
+                "absolute_url": citing_cluster.get_absolute_url(),
+                "caseName": best_case_name(citing_cluster),
+                "dateFiled": citing_cluster.date_filed,
+            }
+        )
+        results[cited_cluster_id] = (results[cited_cluster_id][0], total)
+    return results
+
+
 def get_citing_clusters_with_cache(
     cluster: OpinionCluster,
 ) -> Tuple[list, int]:
-    """Use Solr to get clusters citing the one we're looking at
+    """Get clusters citing the one we're looking at
+
+    These are normally precomputed by the cl_make_opinion_panels command.
+    On a miss, they're pulled from the DB, with a lock so that concurrent
+    misses don't all run the query.
 
     :param cluster: The cluster we're targeting
     :type cluster: OpinionCluster
     :return: A tuple of the list of solr results and the number of results
     """
-    cache_key = "citing:%s" % cluster.pk
-    cache = caches["db_cache"]
-    cached_results = cache.get(cache_key)
-    if cached_results is not None:
-        return cached_results
-
-    # Cache miss. Get the citing results from Solr
-    sub_opinion_pks = cluster.sub_opinions.values_list("pk", flat=True)
-    ids_str = " OR ".join([str(pk) for pk in sub_opinion_pks])
-    q = {
-        "q": "cites:(%s)" % ids_str,
-        "rows": 5,
-        "start": 0,
-        "sort": "citeCount desc",
-        "caller": "view_opinion",
-        "fl": "absolute_url,caseName,dateFiled",
-    }
-    conn = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
-    results = conn.query().add_extra(**q).execute()
-    conn.conn.http_connection.close()
-    citing_clusters = list(results)
-    citing_cluster_count = results.result.numFound
     a_week = 60 * 60 * 24 * 7
-    cache.set(cache_key, (citing_clusters, citing_cluster_count), a_week)
-
-    return citing_clusters, citing_cluster_count
+    return get_or_set_with_lock(
+        caches["db_cache"],
+        "citing:%s" % cluster.pk,
+        lambda: make_citing_clusters([cluster.pk])[cluster.pk],
+        a_week,
+        default=([], 0),
+    )
 
 
-def get_related_clusters_with_cache(
-    cluster: OpinionCluster,
-    request: HttpRequest,
-) -> Tuple[List[OpinionCluster], List[int], Dict[str, str]]:
-    """Use Solr to get related opinions with Solr-MoreLikeThis query
+def get_related_search_params() -> Dict[str, str]:
+    """Get the URL parameters for the full list of related opinions.
 
-    :param cluster: The cluster we're targeting
-    :param request: Request object for checking if user is permitted
-    :return: A list of related clusters, a list of sub-opinion IDs, and a dict
-    of URL parameters
+    :return: A dict of status parameters matching the related opinions query
     """
-
+    if settings.RELATED_FILTER_BY_STATUS:
+        return {"stat_" + settings.RELATED_FILTER_BY_STATUS: "on"}
     # By default all statuses are included
     available_statuses = dict(DOCUMENT_STATUSES).values()
-    url_search_params = {"stat_" + v: "on" for v in available_statuses}
+    return {"stat_" + v: "on" for v in available_statuses}
 
-    # Opinions that belong to the targeted cluster
-    sub_opinion_ids = cluster.sub_opinions.values_list("pk", flat=True)
 
-    if is_bot(request) or not sub_opinion_ids:
-        # If it is a bot or lacks sub-opinion IDs, return empty results
-        return [], [], url_search_params
+def make_related_clusters(
+    si: ExtraSolrInterface,
+    sub_opinion_ids: List[int],
+) -> List[Dict[str, Any]]:
+    """Use Solr-MoreLikeThis to get the opinions related to a cluster
 
-    si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+    :param si: A Solr interface to query with
+    :param sub_opinion_ids: The IDs of the cluster's opinions
+    :return: A list of related opinions from Solr
+    """
+    # Turn list of opinion IDs into list of Q objects
+    sub_opinion_queries = [si.Q(id=sub_id) for sub_id in sub_opinion_ids]
+
+    # Take one Q object from the list
+    sub_opinion_query = sub_opinion_queries.pop()
+
+    # OR the Q object with the ones remaining in the list
+    for item in sub_opinion_queries:
+        sub_opinion_query |= item
+
+    # Set MoreLikeThis parameters
+    # (see https://lucene.apache.org/solr/guide/6_6/other-parsers.html#OtherParsers-MoreLikeThisQueryParser)
+    mlt_params = {
+        "fields": "text",
+        "count": settings.RELATED_COUNT,
+        "maxqt": settings.RELATED_MLT_MAXQT,
+        "mintf": settings.RELATED_MLT_MINTF,
+        "minwl": settings.RELATED_MLT_MINWL,
+        "maxwl": settings.RELATED_MLT_MAXWL,
+        "maxdf": settings.RELATED_MLT_MAXDF,
+    }
 
-    # Use cache if enabled
-    mlt_cache_key = "mlt-cluster:%s" % cluster.pk
-    related_clusters = (
-        caches["db_cache"].get(mlt_cache_key)
-        if settings.RELATED_USE_CACHE
-        else None
+    mlt_query = (
+        si.query(sub_opinion_query)
+        .mlt(**mlt_params)
+        .field_limit(fields=["id", "caseName", "absolute_url"])
     )
 
-    if related_clusters is None:
-        # Cache is empty
-
-        # Turn list of opinion IDs into list of Q objects
-        sub_opinion_queries = [si.Q(id=sub_id) for sub_id in sub_opinion_ids]
-
-        # Take one Q object from the list
-        sub_opinion_query = sub_opinion_queries.pop()
-
-        # OR the Q object with the ones remaining in the list
-        for item in sub_opinion_queries:
-            sub_opinion_query |= item
-
-        # Set MoreLikeThis parameters
-        # (see https://lucene.apache.org/solr/guide/6_6/other-parsers.html#OtherParsers-MoreLikeThisQueryParser)
-        mlt_params = {
-            "fields": "text",
-            "count": settings.RELATED_COUNT,
-            "maxqt": settings.RELATED_MLT_MAXQT,
-            "mintf": settings.RELATED_MLT_MINTF,
-            "minwl": settings.RELATED_MLT_MINWL,
-            "maxwl": settings.RELATED_MLT_MAXWL,
-            "maxdf": settings.RELATED_MLT_MAXDF,
-        }
-
-        mlt_query = (
-            si.query(sub_opinion_query)
-            .mlt(**mlt_params)
-            .field_limit(fields=["id", "caseName", "absolute_url"])
+    if settings.RELATED_FILTER_BY_STATUS:
+        # Filter results by status (e.g., Precedential)
+        mlt_query = mlt_query.filter(
+            status_exact=settings.RELATED_FILTER_BY_STATUS
         )
 
-        if settings.RELATED_FILTER_BY_STATUS:
-            # Filter results by status (e.g., Precedential)
-            mlt_query = mlt_query.filter(
-                status_exact=settings.RELATED_FILTER_BY_STATUS
-            )
+    mlt_res = mlt_query.execute()
 
-            # Update URL parameters accordingly
-            url_search_params = {
-                "stat_" + settings.RELATED_FILTER_BY_STATUS: "on"
-            }
+    if hasattr(mlt_res, "more_like_this"):
+        # Only a single sub opinion
+        related_clusters = mlt_res.more_like_this.docs
+    elif hasattr(mlt_res, "more_like_these"):
+        # Multiple sub opinions
 
-        mlt_res = mlt_query.execute()
+        # Get result list for each sub opinion
+        sub_docs = [
+            sub_res.docs for sub_id, sub_res in mlt_res.more_like_these.items()
+        ]
 
-        if hasattr(mlt_res, "more_like_this"):
-            # Only a single sub opinion
-            related_clusters = mlt_res.more_like_this.docs
-        elif hasattr(mlt_res, "more_like_these"):
-            # Multiple sub opinions
+        # Merge sub results by interleaving
+        # - exclude items that are sub opinions
+        related_clusters = [
+            item
+            for pair in zip(*sub_docs)
+            for item in pair
+            if item["id"] not in sub_opinion_ids
+        ]
 
-            # Get result list for each sub opinion
-            sub_docs = [
-                sub_res.docs
-                for sub_id, sub_res in mlt_res.more_like_these.items()
-            ]
+        # Limit number of results
+        related_clusters = related_clusters[: settings.RELATED_COUNT]
+    else:
+        # No MLT results are available (this should not happen)
+        related_clusters = []
+    return related_clusters
 
-            # Merge sub results by interleaving
-            # - exclude items that are sub opinions
-            related_clusters = [
-                item
-                for pair in zip(*sub_docs)
-                for item in pair
-                if item["id"] not in sub_opinion_ids
-            ]
 
-            # Limit number of results
-            related_clusters = related_clusters[: settings.RELATED_COUNT]
-        else:
-            # No MLT results are available (this should not happen)
-            related_clusters = []
+def get_related_clusters_with_cache(
+    cluster: OpinionCluster,
+    request: HttpRequest,
+) -> Tuple[List[OpinionCluster], List[int], Dict[str, str]]:
+    """Use Solr to get related opinions with Solr-MoreLikeThis query
+
+    Recently changed clusters are precomputed by the cl_make_opinion_panels
+    command. On a miss, Solr is queried, with a lock so that concurrent misses don't
+    all run the same query.
+
+    :param cluster: The cluster we're targeting
+    :param request: Request object for checking if user is permitted
+    :return: A list of related clusters, a list of sub-opinion IDs, and a dict
+    of URL parameters
+    """
+    url_search_params = get_related_search_params()
+
+    # Opinions that belong to the targeted cluster
+    sub_opinion_ids = list(cluster.sub_opinions.values_list("pk", flat=True))
 
-        cache.set(
-            mlt_cache_key, related_clusters, settings.RELATED_CACHE_TIMEOUT
+    if is_bot(request) or not sub_opinion_ids:
+        # If it is a bot or lacks sub-opinion IDs, return empty results
+        return [], [], url_search_params
+
+    def make_value():
+        si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+        try:
+            return make_related_clusters(si, sub_opinion_ids)
+        finally:
+            si.conn.http_connection.close()
+
+    if settings.RELATED_USE_CACHE:
+        related_clusters = get_or_set_with_lock(
+            caches["db_cache"],
+            "mlt-cluster:%s" % cluster.pk,
+            make_value,
+            settings.RELATED_CACHE_TIMEOUT,
+            default=[],
         )
-    si.conn.http_connection.close()
+    else:
+        related_clusters = make_value()
     return related_clusters, sub_opinion_ids, url_search_params
 
 
@@ -47,6 +47,27 @@ def gen_diff_ratio(left, right):
     return diff
 
 
+def get_diff_ratios(items, s):
+    """Generate the difference between a string and many strings.
+
+    This gives the same numbers as calling gen_diff_ratio(item, s) once per
+    item, but only cleans up s once, and reuses one SequenceMatcher for all
+    of the items. SequenceMatcher indexes its second string when it's set,
+    so that work is done once instead of once per item.
+
+    :param items: The list of strings to compare against
+    :param s: The string to compare
+    :return: A list of ratios in the same order as items
+    """
+    matcher = difflib.SequenceMatcher(None)
+    matcher.set_seq2(remove_words(s).strip())
+    diff_ratios = []
+    for item in items:
+        matcher.set_seq1(remove_words(item).strip())
+        diff_ratios.append(matcher.ratio())
+    return diff_ratios
+
+
 def find_best_match(items, s, case_sensitive=True):
     """Find the string in the list that is the closest match to the string
 
@@ -56,16 +77,12 @@ def find_best_match(items, s, case_sensitive=True):
     :return dict with the index of the best matching value, its value, and its
     match ratio.
     """
-    diff_ratios = []
     if not case_sensitive:
         s = s.lower()
-
-    for item in items:
-        # Calculate its diff_ratio, and add it to an array
-        if not case_sensitive:
-            item = item.lower()
-        diff = gen_diff_ratio(item, s)
-        diff_ratios.append(diff)
+        items_to_compare = [item.lower() for item in items]
+    else:
+        items_to_compare = items
+    diff_ratios = get_diff_ratios(items_to_compare, s)
 
     # Find the max ratio, and grab the corresponding result
     max_ratio = max(diff_ratios)
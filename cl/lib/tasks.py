@@ -0,0 +1,10 @@
+from cl.celery_init import app
+from cl.lib.ratelimiter import verify_and_cache_ip_address
+
+
+@app.task(ignore_result=True)
+def verify_crawler_ip_address(ip_address: str) -> None:
+    """Check whether an IP address belongs to an approved crawler, so it can
+    be whitelisted from rate limits.
+    """
+    verify_and_cache_ip_address(ip_address)
@@ -7,6 +7,7 @@ from django.test import TestCase
 from django.test.utils import override_settings
 from lxml import etree
 
+from cl.lib.scorched_utils import bump_solr_index_version
 from cl.search.models import Court
 
 
@@ -54,6 +55,7 @@ class EmptySolrTestCase(TestCase):
         for si in self.all_sis:
             si.delete_all()
             si.commit()
+            bump_solr_index_version(si.conn.url)
             si.conn.http_connection.close()
 
 
@@ -2,17 +2,38 @@
 
 
 import datetime
+import gzip
 import os
 import re
 import tempfile
+import time
+from unittest import mock
 
+from celery import Celery, chain
+from celery.contrib.testing.worker import start_worker
+from django.core.cache import caches
 from django.core.files.base import ContentFile
-from django.test import SimpleTestCase, TestCase, override_settings
+from django.db import DatabaseError
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
 from django.urls import reverse
 from rest_framework.status import HTTP_200_OK, HTTP_503_SERVICE_UNAVAILABLE
 
+from cl.lib.bot_detector import is_bot, is_og_bot
+from cl.lib.cache_backends import COMPRESSED, PICKLED, TieredCache
+from cl.lib.celery_utils import (
+    CeleryThrottle,
+    make_completed_key,
+    make_in_flight_key,
+)
 from cl.lib.db_tools import queryset_generator
 from cl.lib.filesizes import convert_size_to_bytes
+from cl.lib.import_lib import JudgeResolver, find_person
 from cl.lib.mime_types import lookup_mime_type
 from cl.lib.model_helpers import make_docket_number_core, make_upload_path
 from cl.lib.pacer import (
@@ -22,12 +43,27 @@ from cl.lib.pacer import (
     normalize_attorney_role,
     normalize_us_state,
 )
-from cl.lib.search_utils import make_fq
+from cl.lib.ratelimiter import is_whitelisted
+from cl.lib.redis_utils import make_redis_interface
+from cl.lib.search_utils import (
+    get_or_set_with_lock,
+    make_citing_clusters,
+    make_fq,
+)
 from cl.lib.storage import UUIDFileSystemStorage
+from cl.lib.string_diff import gen_diff_ratio, get_diff_ratios
 from cl.lib.string_utils import anonymize, trunc
-from cl.people_db.models import Role
+from cl.lib.tasks import verify_crawler_ip_address
+from cl.lib.view_utils import (
+    FLUSH_LOCK_KEY,
+    flush_view_counts,
+    increment_view_count,
+)
+from cl.people_db.models import Person, Position, Role
 from cl.scrapers.models import UrlHash
 from cl.search.models import Court, Docket, Opinion, OpinionCluster
+from cl.simple_pages.sitemap import SimpleSitemap
+from cl.sitemap import plan_pages, write_sitemaps
 
 
 class TestPacerUtils(TestCase):
@@ -116,7 +152,86 @@ class TestDBTools(TestCase):
         print("✓")
 
 
+class TestJudgeResolver(TestCase):
+    fixtures = ["court_data.json"]
+
+    def setUp(self) -> None:
+        def make_judge(name_first, name_last, court_id, start, end=None):
+            person = Person.objects.create(
+                name_first=name_first, name_last=name_last
+            )
+            Position.objects.create(
+                person=person,
+                court_id=court_id,
+                position_type=Position.JUDGE,
+                date_start=start,
+                date_granularity_start="%Y-%m-%d",
+                date_termination=end,
+                date_granularity_termination="%Y-%m-%d" if end else "",
+            )
+            return person
+
+        d = datetime.date
+        self.lone = make_judge("Ann", "Lone", "ca1", d(1990, 1, 1))
+        self.early = make_judge(
+            "Bob", "Twin", "ca1", d(1950, 1, 1), d(1960, 1, 1)
+        )
+        self.late = make_judge("Carl", "Twin", "ca1", d(2000, 1, 1))
+        self.first = make_judge("Dan", "Triple", "ca2", d(2000, 1, 1))
+        self.second = make_judge("Ed", "Triple", "ca2", d(2001, 1, 1))
+        make_judge("Fay", "Triple", "ca2", d(2002, 1, 1))
+
+    def test_resolver_matches_find_person(self) -> None:
+        """Does the in-memory resolver give the same answers as the DB?"""
+        resolver = JudgeResolver.from_db()
+        d = datetime.date
+        q = [
+            ("lone", "ca1", {}, self.lone),
+            ("Lone", "ca2", {}, None),
+            ("Twin", "ca1", {}, None),
+            ("Twin", "ca1", {"case_date": d(1955, 6, 1)}, self.early),
+            ("Twin", "ca1", {"case_date": d(2015, 6, 1)}, self.late),
+            ("Twin", "ca1", {"case_date": d(1980, 6, 1)}, None),
+            ("Triple", "ca2", {"case_date": d(2005, 1, 1)}, None),
+            (
+                "Triple",
+                "ca2",
+                {"case_date": d(2005, 1, 1), "name_first": "dan"},
+                self.first,
+            ),
+            ("Triple", "ca2", {"name_first": "Ed"}, self.second),
+            ("Nobody", "ca2", {}, None),
+        ]
+        with self.assertNumQueries(0):
+            resolved = [
+                resolver.find_person(name, court, **kwargs)
+                for name, court, kwargs, _ in q
+            ]
+        for (name, court, kwargs, expected), result in zip(q, resolved):
+            self.assertEqual(result, expected)
+            self.assertEqual(find_person(name, court, **kwargs), expected)
+
+    def test_bulk_candidate_judges(self) -> None:
+        resolver = JudgeResolver.from_db()
+        results = resolver.bulk_get_candidate_judges(
+            [
+                ("Lone", "ca1", datetime.date(1995, 1, 1)),
+                ("", "ca1", None),
+                ("Twin", "ca1", datetime.datetime(2010, 1, 1)),
+            ]
+        )
+        self.assertEqual(results, [[self.lone], None, [self.late]])
+
+
 class TestStringUtils(TestCase):
+    def test_diff_ratios(self) -> None:
+        """Do the batched diff ratios match the one-off version?"""
+        s = "smith v. jones"
+        items = ["smith v. jones", "jones v. smith co", "acme v. doe", ""]
+        ratios = get_diff_ratios(items, s)
+        for item, ratio in zip(items, ratios):
+            self.assertAlmostEqual(ratio, gen_diff_ratio(item, s))
+
     def test_trunc(self) -> None:
         """Does trunc give us the results we expect?"""
         s = "Henry wants apple."
@@ -208,6 +323,397 @@ class TestMakeFQ(TestCase):
             )
 
 
+class TestOpinionPanels(TestCase):
+    fixtures = ["test_objects_search.json", "judge_judy.json"]
+
+    def test_make_citing_clusters(self) -> None:
+        """Do we count each citing opinion once and sort by citations?"""
+        results = make_citing_clusters([1, 3])
+        cites_three, count = results[3]
+        self.assertEqual(count, 2)
+        self.assertEqual(
+            [c["absolute_url"] for c in cites_three],
+            [
+                c.get_absolute_url()
+                for c in OpinionCluster.objects.filter(pk__in=[1, 2]).order_by(
+                    "-citation_count"
+                )
+            ],
+        )
+
+    def test_get_or_set_with_lock(self) -> None:
+        """Do we make missing values once, and wait on others making them?"""
+        cache = caches["db_cache"]
+        value = get_or_set_with_lock(cache, "k", lambda: "made", 60, None)
+        self.assertEqual(value, "made")
+        value = get_or_set_with_lock(cache, "k", lambda: "again", 60, None)
+        self.assertEqual(value, "made")
+
+        # Somebody else is making it and never finishes.
+        cache.add("lock:other", True, 60)
+        start = time.time()
+        value = get_or_set_with_lock(
+            cache, "other", lambda: "made", 60, "default"
+        )
+        self.assertEqual(value, "default")
+        # Waiting blocks a request, so it must stay short.
+        self.assertLess(time.time() - start, 1)
+        cache.delete("lock:other")
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache"
+        },
+        "storage": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "tiered-cache-test-storage",
+        },
+    }
+)
+class TestTieredCache(SimpleTestCase):
+    def setUp(self) -> None:
+        self.storage = caches["storage"]
+        self.storage.clear()
+        self.cache = TieredCache(
+            "tiered-cache-test",
+            {
+                "OPTIONS": {
+                    "STORAGE": "storage",
+                    "MAX_ENTRIES": 2,
+                    "COMPRESS_MIN_LENGTH": 100,
+                }
+            },
+        )
+        self.cache.local.clear()
+
+    def test_values_go_to_storage(self) -> None:
+        """Are values kept in storage, compressed if they're large?"""
+        small, large = ["a"], ["a"] * 1000
+        self.cache.set("small", small)
+        self.cache.set("large", large)
+        self.cache.local.clear()
+
+        self.assertEqual(self.cache.get("small"), small)
+        self.assertEqual(self.cache.get("large"), large)
+        self.assertEqual(self.cache.get("missing", "default"), "default")
+        self.assertTrue(
+            self.storage.get(self.cache.make_key("small")).startswith(PICKLED)
+        )
+        stored = self.storage.get(self.cache.make_key("large"))
+        self.assertTrue(stored.startswith(COMPRESSED))
+        self.assertLess(len(stored), 100)
+
+    def test_local_tier(self) -> None:
+        """Are recently used values kept by the process, as copies, and are
+        the least recently used ones dropped?
+        """
+        self.cache.set_many({"a": [1], "b": [2]})
+        self.storage.clear()
+        value = self.cache.get("a")
+        value.append(3)
+        self.assertEqual(self.cache.get("a"), [1])
+
+        # b is the least recently used, so it's dropped.
+        self.cache.set("c", [3])
+        self.storage.clear()
+        self.assertEqual(
+            self.cache.get_many(["a", "b", "c"]), {"a": [1], "c": [3]}
+        )
+
+    def test_add_and_delete_go_to_storage(self) -> None:
+        """Does add() respect values set by other processes, so it can be
+        used as a lock?
+        """
+        self.storage.set(self.cache.make_key("lock"), PICKLED + b"x")
+        self.assertFalse(self.cache.add("lock", True))
+        self.cache.delete("lock")
+        self.assertIsNone(self.storage.get(self.cache.make_key("lock")))
+        self.assertTrue(self.cache.add("lock", True))
+        self.assertTrue(self.cache.get("lock"))
+
+
+class TestSitemapFiles(TestCase):
+    def test_plan_pages(self) -> None:
+        """Do pages keep their boundaries between runs, so that changes to a
+        page don't change the pages after it?
+        """
+        modified = datetime.datetime(2020, 1, 1)
+        pages = plan_pages(((pk, modified) for pk in range(1, 8)), 3, [])
+        self.assertEqual(
+            [(p["first_pk"], p["last_pk"], p["count"]) for p in pages],
+            [(1, 3, 3), (4, 6, 3), (7, 7, 1)],
+        )
+
+        # Deleting a row shrinks its page, and new rows fill the last page.
+        new_pages = plan_pages(
+            ((pk, modified) for pk in [1, 3, 4, 5, 6, 7, 8, 9]), 3, pages
+        )
+        self.assertEqual(
+            [(p["first_pk"], p["last_pk"], p["count"]) for p in new_pages],
+            [(1, 3, 2), (4, 6, 3), (7, 9, 3)],
+        )
+        self.assertEqual(new_pages[1], pages[1])
+
+        # A page that gets too many rows is split, and the rest are redone.
+        old_pages = [{"last_pk": 5}, {"last_pk": 8}, {"last_pk": 9}]
+        new_pages = plan_pages(
+            ((pk, modified) for pk in range(1, 10)), 3, old_pages
+        )
+        self.assertEqual(
+            [(p["first_pk"], p["last_pk"]) for p in new_pages],
+            [(1, 3), (4, 6), (7, 9)],
+        )
+
+    def test_plan_pages_with_attributes(self) -> None:
+        """Does a change to an attribute like priority, which doesn't change
+        date_modified, change the page the item is on?
+        """
+        modified = datetime.datetime(2020, 1, 1)
+        pages = plan_pages(
+            ((pk, modified, "0.3") for pk in range(1, 8)), 3, []
+        )
+        new_pages = plan_pages(
+            (
+                (pk, modified, "0.4" if pk == 5 else "0.3")
+                for pk in range(1, 8)
+            ),
+            3,
+            pages,
+        )
+        self.assertEqual(
+            [old == new for old, new in zip(pages, new_pages)],
+            [True, False, True],
+        )
+
+    def test_sitemap_files_are_served(self) -> None:
+        """Are the written sitemaps served by the sitemap views?"""
+        with tempfile.TemporaryDirectory() as sitemaps_dir:
+            with override_settings(SITEMAPS_DIR=sitemaps_dir):
+                write_sitemaps({"simple": SimpleSitemap})
+                r = self.client.get(
+                    reverse("sitemaps", kwargs={"section": "simple"}),
+                    HTTP_ACCEPT_ENCODING="gzip",
+                )
+                self.assertEqual(r["Content-Encoding"], "gzip")
+                content = gzip.decompress(b"".join(r.streaming_content))
+                r.close()
+                self.assertEqual(
+                    content.count(b"<url>"), len(SimpleSitemap().items())
+                )
+
+                r = self.client.get("/sitemap.xml")
+                self.assertIn(b"/sitemap-simple.xml</loc>", r.content)
+                self.assertNotIn(b"sitemap-o.xml", r.content)
+
+
+class TestBotDetector(SimpleTestCase):
+    def test_is_bot(self) -> None:
+        """Are bots found in user agents, whatever their case?"""
+        factory = RequestFactory()
+        for ua, bot, og_bot in (
+            ("Mozilla/5.0 (compatible; Googlebot/2.1)", True, False),
+            ("LinkedInBot/1.0 (compatible; Mozilla/5.0)", False, True),
+            ("Mozilla/5.0 (X11; Linux x86_64) Firefox/80.0", False, False),
+        ):
+            request = factory.get("/", HTTP_USER_AGENT=ua)
+            self.assertEqual(is_bot(request), bot, msg=ua)
+            self.assertEqual(is_og_bot(request), og_bot, msg=ua)
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "whitelist-test",
+        }
+    }
+)
+class TestCrawlerWhitelist(SimpleTestCase):
+    def setUp(self) -> None:
+        caches["default"].clear()
+        self.request = RequestFactory().get("/", REMOTE_ADDR="66.249.66.1")
+
+    @mock.patch("cl.lib.tasks.verify_crawler_ip_address.delay")
+    @mock.patch(
+        "cl.lib.ratelimiter.get_host_from_IP",
+        return_value="crawl-66-249-66-1.googlebot.com",
+    )
+    @mock.patch(
+        "cl.lib.ratelimiter.get_ip_from_host", return_value="66.249.66.1"
+    )
+    def test_crawlers_are_verified_in_the_background(
+        self, mock_forward, mock_reverse, mock_delay
+    ) -> None:
+        """Are crawlers whitelisted once a task verifies them, without DNS
+        lookups during requests?
+        """
+        mock_delay.side_effect = verify_crawler_ip_address
+        self.assertFalse(is_whitelisted(self.request))
+        self.assertEqual(mock_delay.call_count, 1)
+        self.assertTrue(is_whitelisted(self.request))
+        self.assertEqual(mock_reverse.call_count, 1)
+        self.assertEqual(mock_forward.call_count, 1)
+
+    @mock.patch("cl.lib.tasks.verify_crawler_ip_address.delay")
+    @mock.patch(
+        "cl.lib.ratelimiter.get_host_from_IP", return_value="example.com"
+    )
+    def test_other_ips_are_denied(self, mock_reverse, mock_delay) -> None:
+        """Are IPs that aren't crawlers sent to be checked once, and then
+        denied?
+        """
+        self.assertFalse(is_whitelisted(self.request))
+        self.assertFalse(is_whitelisted(self.request))
+        self.assertEqual(mock_delay.call_count, 1)
+        self.assertEqual(mock_reverse.call_count, 0)
+
+        verify_crawler_ip_address(mock_delay.call_args[0][0])
+        self.assertFalse(is_whitelisted(self.request))
+        self.assertEqual(mock_delay.call_count, 1)
+
+
+class TestCeleryThrottle(SimpleTestCase):
+    """Test the throttle against a celery app with an in-process broker."""
+
+    queue = "throttle-test"
+
+    def setUp(self) -> None:
+        r = make_redis_interface("CACHE")
+        r.delete(
+            make_in_flight_key(self.queue), make_completed_key(self.queue)
+        )
+
+        self.app = Celery(
+            "throttle-test", broker="memory://", backend="cache+memory://"
+        )
+        self.app.conf.task_default_queue = self.queue
+
+        @self.app.task
+        def add(x, y):
+            return x + y
+
+        self.add = add
+
+    def test_tasks_count_until_they_finish(self) -> None:
+        """Do tasks use the queue's budget until a worker finishes them, and
+        is the budget shared between throttles?
+        """
+        throttle = CeleryThrottle(min_items=1, queue_name=self.queue)
+        # A place that isn't used by a task is given back.
+        throttle.maybe_wait()
+        throttle.maybe_wait()
+        self.assertEqual(throttle.get_in_flight_count(), 1)
+
+        r1 = self.add.apply_async((1, 2), queue=self.queue)
+        throttle.maybe_wait()
+        # The next task of a chain keeps the place of the first.
+        r2 = chain(self.add.s(1, 2), self.add.s(3)).apply_async(
+            queue=self.queue
+        )
+        self.assertEqual(throttle.get_in_flight_count(), 2)
+        other_throttle = CeleryThrottle(min_items=1, queue_name=self.queue)
+        self.assertFalse(other_throttle._try_reserve())
+
+        with start_worker(self.app, perform_ping_check=False):
+            self.assertEqual(r1.get(timeout=10), 3)
+            self.assertEqual(r2.get(timeout=10), 6)
+            # Places are given back just after the results are saved.
+            for _ in range(50):
+                if throttle.get_in_flight_count() == 0:
+                    break
+                time.sleep(0.1)
+        self.assertEqual(throttle.get_in_flight_count(), 0)
+        self.assertEqual(throttle.get_completed_count(), 2)
+        self.assertTrue(other_throttle._try_reserve())
+
+
+class TestViewCounts(TransactionTestCase):
+    """Flushed tallies are only dropped from redis when the DB commits, so
+    these tests need real transactions.
+    """
+
+    fixtures = ["test_objects_search.json", "judge_judy.json"]
+
+    def setUp(self) -> None:
+        # Write out any views left over from other tests.
+        flush_view_counts()
+
+    def test_views_are_buffered_then_flushed(self) -> None:
+        """Do page views stay out of the DB until they're flushed, and leave
+        date_modified alone when they are?
+        """
+        request = RequestFactory().get("/")
+        d = Docket.objects.get(pk=1)
+        start_count = d.view_count
+        date_modified = d.date_modified
+        for _ in range(3):
+            d = Docket.objects.get(pk=1)
+            increment_view_count(d, request)
+        self.assertEqual(d.view_count, start_count + 3)
+        increment_view_count(Docket.objects.get(pk=2), request)
+
+        d.refresh_from_db()
+        self.assertEqual(d.view_count, start_count)
+
+        self.assertEqual(flush_view_counts(), 2)
+        d.refresh_from_db()
+        self.assertEqual(d.view_count, start_count + 3)
+        self.assertEqual(d.date_modified, date_modified)
+        self.assertEqual(flush_view_counts(), 0)
+
+    def test_failed_flushes_keep_the_tallies(self) -> None:
+        """If the DB update fails, are the views kept for the next flush?"""
+        request = RequestFactory().get("/")
+        d = Docket.objects.get(pk=1)
+        start_count = d.view_count
+        increment_view_count(d, request)
+
+        with mock.patch(
+            "cl.lib.view_utils.update_view_counts",
+            side_effect=DatabaseError,
+        ):
+            with self.assertRaises(DatabaseError):
+                flush_view_counts()
+        d.refresh_from_db()
+        self.assertEqual(d.view_count, start_count)
+
+        self.assertEqual(flush_view_counts(), 1)
+        d.refresh_from_db()
+        self.assertEqual(d.view_count, start_count + 1)
+        self.assertEqual(flush_view_counts(), 0)
+
+    def test_flushes_do_not_overlap(self) -> None:
+        """While one flush is running, do others leave the tallies alone, so
+        that views aren't counted twice?
+        """
+        request = RequestFactory().get("/")
+        d = Docket.objects.get(pk=1)
+        start_count = d.view_count
+        increment_view_count(d, request)
+
+        r = make_redis_interface("STATS")
+        lock = r.lock(FLUSH_LOCK_KEY, timeout=60)
+        self.assertTrue(lock.acquire(blocking=False))
+        try:
+            self.assertEqual(flush_view_counts(), 0)
+        finally:
+            lock.release()
+        d.refresh_from_db()
+        self.assertEqual(d.view_count, start_count)
+
+        self.assertEqual(flush_view_counts(), 1)
+        d.refresh_from_db()
+        self.assertEqual(d.view_count, start_count + 1)
+
+    def test_bots_are_not_counted(self) -> None:
+        request = RequestFactory().get("/", HTTP_USER_AGENT="Googlebot")
+        d = Docket.objects.get(pk=1)
+        increment_view_count(d, request)
+        self.assertEqual(flush_view_counts(), 0)
+
+
 class TestModelHelpers(TestCase):
     """Test the model_utils helper functions"""
 
@@ -1,30 +1,133 @@
-from django.db.models import F
+from django.apps import apps
+from django.db import connection, transaction
+from redis import ResponseError
 
 from cl.lib.bot_detector import is_bot
-from cl.lib.model_helpers import suppress_autotime
+from cl.lib.redis_utils import make_redis_interface
+
+VIEW_COUNT_KEY = "view-counts:%s"
+# Held while view counts are flushed, so that overlapping flushes don't both
+# write the same tallies. It expires in case a flush dies without letting go.
+FLUSH_LOCK_KEY = "flush-view-counts-lock"
+FLUSH_LOCK_TIMEOUT = 60 * 30
+
+
+def get_view_count_key(model):
+    return VIEW_COUNT_KEY % model._meta.label_lower
 
 
 def increment_view_count(obj, request):
-    """Increment the view count of an object in the DB
+    """Increment the view count of an object
 
     Three tricks in this simple function:
 
       1. If it's a robot viewing the page, don't increment.
-      2. Make sure not to update the "date_modified" fields.
-      3. Do this using an atomic DB query for performance and don't reload from
-         the database after the increment (which would take another query).
+      2. Don't write to the DB. Views are tallied in redis, and written to the
+         DB in batches by flush_view_counts. That keeps hot rows from being
+         locked by every page view, and keeps the write off the request path.
+      3. Give the object the value it will have once it's flushed, so the page
+         shows the right number without another query.
 
     :param obj: A django object containing a view_count parameter
     :param request: A django request so we can detect if it's a bot
     :return: Nothing. The obj is passed by reference
     """
     if not is_bot(request):
-        cached_value = obj.view_count
+        r = make_redis_interface("STATS")
+        pending = r.hincrby(get_view_count_key(obj), obj.pk, 1)
+        obj.view_count += pending
+
+
+def update_view_counts(model, increments, batch_size=1000):
+    """Add to the view counts of many objects, in a few queries.
+
+    This uses raw UPDATE queries, so, like suppress_autotime, it doesn't
+    change the date_modified fields of the objects.
+
+    :param model: The model of the objects.
+    :param increments: A dict of object PKs to the number of views to add.
+    :param batch_size: The number of objects to update per query.
+    """
+    items = list(increments.items())
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk_column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        for i in range(0, len(items), batch_size):
+            batch = items[i : i + batch_size]
+            values = ", ".join(["(%s, %s)"] * len(batch))
+            cursor.execute(
+                "UPDATE {table} AS t "
+                "SET view_count = t.view_count + v.views "
+                "FROM (VALUES {values}) AS v(id, views) "
+                "WHERE t.{pk_column} = v.id".format(
+                    table=table, values=values, pk_column=pk_column
+                ),
+                [value for pk_and_views in batch for value in pk_and_views],
+            )
+
+
+def flush_view_count_key(r, model, key):
+    """Write the tallies in a redis key to the DB, then delete the key.
+
+    The key is only deleted once the DB transaction commits, so if the
+    update is rolled back, the tallies are kept for the next flush.
+
+    :return: The number of objects updated.
+    """
+    increments = {
+        model._meta.pk.to_python(pk): int(views)
+        for pk, views in r.hgetall(key).items()
+    }
+    with transaction.atomic():
+        if increments:
+            update_view_counts(model, increments)
+        transaction.on_commit(lambda: r.delete(key))
+    return len(increments)
+
+
+def flush_view_counts():
+    """Write the view counts tallied in redis to the DB.
+
+    Each model's tallies are renamed to a flushing key before they're read,
+    so views that come in during the flush are kept for the next one. If a
+    flush dies part way through, the next one finishes the flushing key before
+    starting on the new tallies.
+
+    Run this outside of a transaction. Inside one, the flushing keys aren't
+    deleted until it commits, and the new tallies wait for a later flush.
+
+    Only one flush runs at a time. If another one is running, this returns
+    right away and leaves the tallies to it and to later flushes.
+
+    :return: The number of objects updated.
+    """
+    r = make_redis_interface("STATS")
+    lock = r.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return 0
+    try:
+        return flush_view_counts_locked(r)
+    finally:
+        lock.release()
 
-        with suppress_autotime(obj, ["date_modified"]):
-            obj.view_count = F("view_count") + 1
-            obj.save()
 
-        # To get the new value, you either need to get the item from the DB a
-        # second time, or just manipulate it manually....
-        obj.view_count = cached_value + 1
+def flush_view_counts_locked(r):
+    """Do the work of flush_view_counts, once its lock is held."""
+    labels = {
+        key.split(":")[1] for key in r.scan_iter(match=VIEW_COUNT_KEY % "*")
+    }
+    count = 0
+    for label in labels:
+        model = apps.get_model(label)
+        key = VIEW_COUNT_KEY % label
+        flushing_key = "%s:flushing" % key
+        count += flush_view_count_key(r, model, flushing_key)
+        try:
+            # Don't clobber a flushing key that's waiting on a commit.
+            if not r.renamenx(key, flushing_key):
+                continue
+        except ResponseError:
+            # No new tallies since the leftovers were written.
+            continue
+        count += flush_view_count_key(r, model, flushing_key)
+    return count
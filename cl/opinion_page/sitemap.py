@@ -23,6 +23,9 @@ class OpinionSitemap(sitemaps.Sitemap):
 class DocketSitemap(sitemaps.Sitemap):
     changefreq = "weekly"
     limit = 50_000
+    # View counts are updated without touching date_modified, so the
+    # sitemap files have to check them for priority changes.
+    rendered_fields = ["view_count"]
 
     def items(self) -> QuerySet:
         return (
@@ -432,6 +432,7 @@ def view_opinion(request: HttpRequest, pk: int, _: str) -> HttpResponse:
     citing_clusters, citing_cluster_count = get_citing_clusters_with_cache(
         cluster
     )
+    authorities_with_data = cluster.authorities_with_data
 
     (
         related_clusters,
@@ -451,8 +452,8 @@ def view_opinion(request: HttpRequest, pk: int, _: str) -> HttpResponse:
             "private": cluster.blocked,
             "citing_clusters": citing_clusters,
             "citing_cluster_count": citing_cluster_count,
-            "top_authorities": cluster.authorities_with_data[:5],
-            "authorities_count": len(cluster.authorities_with_data),
+            "top_authorities": authorities_with_data[:5],
+            "authorities_count": len(authorities_with_data),
             "sub_opinion_ids": sub_opinion_ids,
             "related_algorithm": "mlt",
             "related_clusters": related_clusters,
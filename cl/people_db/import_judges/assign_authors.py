@@ -8,7 +8,7 @@ Created on Fri Mar 18 18:27:09 2016
 from unidecode import unidecode
 
 from cl.audio.models import Audio
-from cl.lib.import_lib import get_candidate_judges
+from cl.lib.import_lib import JudgeResolver
 from cl.search.models import OpinionCluster
 
 
@@ -24,6 +24,7 @@ def assign_authors_to_opinions(jurisdictions=None, testing=False):
         )
     total = clusters.count()
     i = 0
+    resolver = JudgeResolver.from_db()
 
     for cluster in clusters:
         i += 1
@@ -48,7 +49,7 @@ def assign_authors_to_opinions(jurisdictions=None, testing=False):
                 opinion.save(index=False)
             continue
 
-        candidates = get_candidate_judges(
+        candidates = resolver.get_candidate_judges(
             judge_str, cluster.docket.court_id, cluster.date_filed
         )
         if len(candidates) < 1:
@@ -77,11 +78,12 @@ def assign_authors_to_oral_arguments(testing=False):
         .select_related("docket__court__id", "docket__date_argued")
         .only("docket__date_argued", "judges", "docket__court_id")
     )
+    resolver = JudgeResolver.from_db()
     for af in afs:
         judge_str = unidecode(af.judges)
         print("  Judge string: %s" % judge_str)
 
-        candidates = get_candidate_judges(
+        candidates = resolver.get_candidate_judges(
             judge_str, af.docket.court_id, af.docket.date_argued
         )
         for candidate in candidates:
@@ -1,11 +1,15 @@
 import io
 import re
 import sys
+import time
 from datetime import date
-from typing import Dict
+from itertools import islice
+from typing import Dict, List, Tuple
 
+import pandas as pd
 from dateutil import parser
 from django.core.management import CommandError
+from django.db import connection, transaction
 from django.utils.timezone import now
 
 from cl.lib.command_utils import CommandUtils, VerboseCommand, logger
@@ -59,6 +63,125 @@ def create_or_update_row(values: Dict[str, str]) -> FjcIntegratedDatabase:
     return fjc_row
 
 
+def merge_staged_rows(columns: List[str]) -> Tuple[int, int, int]:
+    """Merge the rows in the idb_staging table into the IDB table.
+
+    This applies the same matching rules as create_or_update_row, but for a
+    whole chunk of rows at a time. Rows are matched on district, docket
+    number, origin and date filed. If that matches more than one row, the
+    defendant is used to narrow it down. Rows with one match are updated,
+    rows with no match are inserted, and rows that are still ambiguous are
+    skipped.
+
+    There's no unique constraint on the matching fields, so this can't use
+    INSERT ... ON CONFLICT. Instead, the matches are recorded on the staging
+    table, then applied with one UPDATE and one INSERT.
+
+    Rows in the same chunk that would be merged into the same row are
+    collapsed first, keeping the last one, since that's the one the row by
+    row import would leave behind.
+
+    :param columns: The columns in the staging table to copy over.
+    :return: A tuple of the number of rows that were updated, inserted, and
+    skipped.
+    """
+    table = FjcIntegratedDatabase._meta.db_table
+    key_fields = ["district_id", "docket_number", "origin", "date_filed"]
+    key_conditions = " AND ".join(
+        # The district and docket number are indexed and always present, so
+        # use = for them so the index gets used.
+        "t.%s = s.%s" % (c, c)
+        if c in ["district_id", "docket_number"]
+        else "t.%s IS NOT DISTINCT FROM s.%s" % (c, c)
+        for c in key_fields
+        if c in columns
+    )
+    staged_key_conditions = " AND ".join(
+        "s.%s IS NOT DISTINCT FROM later.%s" % (c, c)
+        for c in key_fields
+        if c in columns
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            WITH key_matches AS (
+                SELECT
+                    s.staging_id,
+                    array_agg(t.id) AS ids,
+                    array_agg(t.id) FILTER (
+                        WHERE t.defendant IS NOT DISTINCT FROM s.defendant
+                    ) AS defendant_ids
+                FROM idb_staging s
+                JOIN {table} t ON {key_conditions}
+                GROUP BY s.staging_id
+            )
+            UPDATE idb_staging s
+            SET
+                match_id = CASE
+                    WHEN cardinality(m.ids) = 1 THEN m.ids[1]
+                    WHEN cardinality(m.defendant_ids) = 1
+                        THEN m.defendant_ids[1]
+                END,
+                match_count = CASE
+                    WHEN cardinality(m.ids) = 1 THEN 1
+                    ELSE coalesce(cardinality(m.defendant_ids), 0)
+                END
+            FROM key_matches m
+            WHERE m.staging_id = s.staging_id
+            """.format(
+                table=table, key_conditions=key_conditions
+            )
+        )
+        # Drop staged rows that a later staged row would overwrite: rows
+        # matching the same row in the table, and unmatched rows with the same
+        # key, which the row by row import would insert and then update.
+        cursor.execute(
+            """
+            DELETE FROM idb_staging s
+            USING idb_staging later
+            WHERE later.staging_id > s.staging_id
+              AND (
+                s.match_id = later.match_id
+                OR (
+                    coalesce(s.match_count, 0) = 0
+                    AND coalesce(later.match_count, 0) = 0
+                    AND {staged_key_conditions}
+                )
+              )
+            """.format(
+                staged_key_conditions=staged_key_conditions
+            )
+        )
+        cursor.execute(
+            """
+            UPDATE {table} t
+            SET {assignments}, date_modified = now()
+            FROM idb_staging s
+            WHERE t.id = s.match_id
+            """.format(
+                table=table,
+                assignments=", ".join("%s = s.%s" % (c, c) for c in columns),
+            )
+        )
+        updated = cursor.rowcount
+        cursor.execute(
+            """
+            INSERT INTO {table} ({columns}, date_created, date_modified)
+            SELECT {columns}, now(), now()
+            FROM idb_staging
+            WHERE coalesce(match_count, 0) = 0
+            """.format(
+                table=table, columns=", ".join(columns)
+            )
+        )
+        inserted = cursor.rowcount
+        cursor.execute(
+            "SELECT count(*) FROM idb_staging WHERE match_count > 1"
+        )
+        skipped = cursor.fetchone()[0]
+    return updated, inserted, skipped
+
+
 class Command(VerboseCommand, CommandUtils):
     help = (
         "Import a tab-separated file as produced by FJC for their IDB. "
@@ -85,6 +208,22 @@ class Command(VerboseCommand, CommandUtils):
             default=-1,
             type=int,
         )
+        parser.add_argument(
+            "--fast-load",
+            action="store_true",
+            default=False,
+            help="Load the file in chunks using COPY and merge each chunk "
+            "into the IDB table with a few set-based queries. Much faster for "
+            "big files than the default, which does one lookup and one write "
+            "per row.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            help="The number of rows to load at a time when using "
+            "--fast-load.",
+            default=50000,
+            type=int,
+        )
 
     def __init__(self, *args, **kwargs):
         super(Command, self).__init__(*args, **kwargs)
@@ -95,6 +234,7 @@ class Command(VerboseCommand, CommandUtils):
         self.date_fields = []
         self.court_fields = []
         self.nullable_fields = None
+        self.court_lookups = {}
 
     @staticmethod
     def ensure_filetype_ok(filetype: int) -> None:
@@ -181,6 +321,15 @@ class Command(VerboseCommand, CommandUtils):
 
         self.ensure_file_ok(options["input_file"])
         self.ensure_filetype_ok(options["filetype"])
+        if options["fast_load"] and options["filetype"] not in [
+            CV_2017,
+            CV_2020,
+            CR_2017,
+        ]:
+            raise CommandError(
+                "--fast-load only supports these filetypes: %s"
+                % [CV_2017, CV_2020, CR_2017]
+            )
         self.filetype = options["filetype"]
         self.build_field_data()
 
@@ -188,7 +337,12 @@ class Command(VerboseCommand, CommandUtils):
         f = io.open(
             options["input_file"], mode="r", encoding="cp1252", newline="\r\n"
         )
-        col_headers = f.next().strip().split("\t")
+        col_headers = next(f).strip().split("\t")
+        if options["fast_load"]:
+            self.fast_load(f, col_headers, options)
+            f.close()
+            return
+
         for i, line in enumerate(f):
             sys.stdout.write("\rDoing line: %s" % i)
             sys.stdout.flush()
@@ -214,6 +368,170 @@ class Command(VerboseCommand, CommandUtils):
 
         f.close()
 
+    def fast_load(self, f, col_headers, options):
+        """Load the IDB file in chunks using COPY and set-based merges.
+
+        Each chunk is parsed line by line, normalized a column at a time with
+        pandas, copied into a temporary staging table, and merged into the
+        IDB table by merge_staged_rows.
+
+        :param f: The open IDB file, positioned after the header line.
+        :param col_headers: The column names from the header line.
+        :param options: The options passed to the command.
+        """
+        self.build_court_lookups()
+        # Map the IDB columns to the DB columns, in file order.
+        columns = {
+            k: FjcIntegratedDatabase._meta.get_field(v).column
+            for k, v in self.field_mappings.items()
+            if k in col_headers
+        }
+        db_columns = list(columns.values()) + ["dataset_source"]
+
+        start = time.time()
+        totals = {"rows": 0, "updated": 0, "inserted": 0, "skipped": 0}
+        lines = enumerate(f)
+        while True:
+            chunk = list(islice(lines, options["chunk_size"]))
+            if not chunk:
+                break
+            rows = [
+                self.make_csv_row_dict(line, col_headers)
+                for i, line in chunk
+                if i >= options["start_line"]
+            ]
+            if not rows:
+                continue
+            df = pd.DataFrame(rows, columns=col_headers, dtype=object)
+            if self.filetype == CR_2017:
+                df = df[df["SOURCE"] == "CMECF"]
+            df = self.normalize_dataframe(df[list(columns.keys())])
+            df = df.rename(columns=columns)
+            df["dataset_source"] = self.filetype
+
+            with transaction.atomic():
+                self.copy_to_staging_table(df, db_columns)
+                updated, inserted, skipped = merge_staged_rows(db_columns)
+
+            totals["rows"] += len(df)
+            totals["updated"] += updated
+            totals["inserted"] += inserted
+            totals["skipped"] += skipped
+            elapsed = time.time() - start
+            logger.info(
+                "Through line %s. Updated %s, inserted %s, and skipped %s "
+                "ambiguous rows so far at %.0f rows/sec.",
+                chunk[-1][0],
+                totals["updated"],
+                totals["inserted"],
+                totals["skipped"],
+                totals["rows"] / elapsed,
+            )
+
+    @staticmethod
+    def copy_to_staging_table(df, db_columns):
+        """Copy a normalized dataframe into a temporary staging table.
+
+        The table is dropped when the transaction commits.
+
+        :param df: The dataframe to copy, with one column per DB column.
+        :param db_columns: The DB columns in the dataframe.
+        """
+        columns = ", ".join(db_columns)
+        buf = io.StringIO()
+        df[db_columns].to_csv(buf, index=False, header=False, na_rep="\\N")
+        buf.seek(0)
+        with connection.cursor() as cursor:
+            # Normally dropped at the end of the last chunk, but not if that
+            # ran inside an outer transaction.
+            cursor.execute("DROP TABLE IF EXISTS idb_staging")
+            cursor.execute(
+                "CREATE TEMPORARY TABLE idb_staging ON COMMIT DROP AS "
+                "SELECT {columns} FROM {table} WITH NO DATA".format(
+                    columns=columns,
+                    table=FjcIntegratedDatabase._meta.db_table,
+                )
+            )
+            cursor.copy_expert(
+                "COPY idb_staging ({columns}) FROM STDIN "
+                "WITH (FORMAT csv, NULL '\\N')".format(columns=columns),
+                buf,
+            )
+            cursor.execute(
+                "ALTER TABLE idb_staging "
+                "ADD COLUMN staging_id serial, "
+                "ADD COLUMN match_id integer, "
+                "ADD COLUMN match_count integer"
+            )
+            cursor.execute("ANALYZE idb_staging")
+
+    def build_court_lookups(self):
+        """Build dicts mapping FJC court IDs to CL court IDs.
+
+        This does the same matching as normalize_court_fields, but up front,
+        so that the court columns can be converted in one pass.
+        """
+        if self.filetype == BANKR_2017:
+            district_courts = Court.federal_courts.bankruptcy_courts()
+        else:
+            district_courts = Court.federal_courts.district_courts()
+        self.court_lookups = {}
+        for col, courts in [
+            ("CIRCUIT", Court.federal_courts.appellate_courts()),
+            ("DISTRICT", district_courts),
+        ]:
+            lookup = {}
+            for pk, fjc_court_id in courts.values_list("pk", "fjc_court_id"):
+                # Leave ambiguous IDs out so they raise like they would in
+                # normalize_court_fields.
+                if fjc_court_id in lookup:
+                    lookup[fjc_court_id] = None
+                else:
+                    lookup[fjc_court_id] = pk
+            self.court_lookups[col] = lookup
+
+    def normalize_dataframe(self, df):
+        """Normalize a chunk of rows a column at a time.
+
+        This is the vectorized equivalent of the normalize_* methods below.
+
+        :param df: A dataframe of raw IDB values, with IDB column names.
+        :return: The normalized dataframe. Null values are None or NaN.
+        """
+        df = df.copy()
+        for col in df.columns:
+            nulls = df[col].isin(["-8", "", "01/01/1900"])
+            if col in self.nullable_fields or col in self.court_fields:
+                df.loc[nulls, col] = None
+            else:
+                df.loc[nulls, col] = ""
+
+        for col in self.court_fields:
+            if col not in df.columns:
+                continue
+            values = df[col]
+            if col == "CIRCUIT":
+                values = values.str.replace(r"^0(\d)$", r"\1", regex=True)
+            court_ids = values.map(self.court_lookups[col])
+            unmatched = values.notnull() & court_ids.isnull()
+            if unmatched.any():
+                raise Exception(
+                    "Unable to match %s column value %s to Court object"
+                    % (col, values[unmatched].iloc[0])
+                )
+            df[col] = court_ids
+
+        for col in self.bool_fields:
+            if col in df.columns:
+                df[col] = df[col].where(df[col].isnull(), df[col] == "1")
+        for col in self.date_fields:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col]).dt.date
+        for col in self.int_fields:
+            if col in df.columns:
+                df[col] = pd.to_numeric(df[col]).astype("Int64")
+        return df
+
     def normalize_nulls(self, row):
         """The IDB uses the value -8 to indicate a null value. Fix this
         and normalize to either a blank entry ('') or None.
@@ -90,7 +90,7 @@ class Command(VerboseCommand, CommandUtils):
         logger.info("%s items will be merged or created.", idb_rows.count())
         q = options["queue"]
         throttle = CeleryThrottle(queue_name=q)
-        chunk_size = 25
+        chunk_size = 250
         for i, idb_chunk in enumerate(chunks(idb_rows.iterator(), chunk_size)):
             # Iterate over all items in the IDB and find them in the Docket
             # table. If they're not there, create a new item.
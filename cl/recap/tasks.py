@@ -1,5 +1,6 @@
 import logging
 import os
+from collections import defaultdict
 from zipfile import ZipFile
 
 import requests
@@ -920,7 +921,7 @@ def create_new_docket_from_idb(idb_row):
         d.save()
 
     logger.info("Created docket %s for IDB row: %s", d.pk, idb_row)
-    return d.pk
+    return d
 
 
 @app.task
@@ -991,33 +992,76 @@ def do_heuristic_match(idb_row, ds):
     return d
 
 
+def is_idb_merge_candidate(d):
+    """Check whether a docket can be merged with an IDB row.
+
+    Criminal, sealed, suppressed, and search warrant dockets share docket
+    numbers with civil cases, but aren't in the civil IDB data.
+
+    :param d: The Docket to check.
+    :return: True if the docket might match an IDB row, else False.
+    """
+    if "cr" in (d.docket_number or "").lower():
+        return False
+    case_name = d.case_name.lower()
+    return not any(
+        s in case_name for s in ["sealed", "suppressed", "search warrant"]
+    )
+
+
+def get_idb_candidate_dockets(idb_rows):
+    """Get the dockets that might match a group of IDB rows in one query.
+
+    :param idb_rows: A list of FjcIntegratedDatabase objects
+    :return: A dict mapping (court_id, docket_number_core) tuples to the list
+    of mergeable dockets with those values.
+    """
+    candidates = defaultdict(list)
+    ds = Docket.objects.filter(
+        court_id__in={idb_row.district_id for idb_row in idb_rows},
+        docket_number_core__in={idb_row.docket_number for idb_row in idb_rows},
+    ).order_by("pk")
+    for d in ds:
+        if is_idb_merge_candidate(d):
+            candidates[(d.court_id, d.docket_number_core)].append(d)
+    return candidates
+
+
+def add_new_idb_candidate(ds, d):
+    """Make a newly created docket available to later rows in an IDB chunk.
+
+    :param ds: The list of candidate dockets the new docket belongs in.
+    :param d: The newly created Docket.
+    :return: None
+    """
+    if is_idb_merge_candidate(d):
+        ds.append(d)
+
+
 @app.task
 def create_or_merge_from_idb_chunk(idb_chunk):
     """Take a chunk of IDB rows and either merge them into the Docket table or
     create new items for them in the docket table.
 
+    The IDB rows and every docket that might match them are loaded up front
+    in two queries, so this works best with big chunks.
+
     :param idb_chunk: A list of FjcIntegratedDatabase PKs
     :type idb_chunk: list
     :return: None
     :rtype: None
     """
+    idb_rows = FjcIntegratedDatabase.objects.in_bulk(idb_chunk)
+    candidates = get_idb_candidate_dockets(list(idb_rows.values()))
     for idb_pk in idb_chunk:
-        idb_row = FjcIntegratedDatabase.objects.get(pk=idb_pk)
-        ds = (
-            Docket.objects.filter(
-                docket_number_core=idb_row.docket_number,
-                court=idb_row.district,
-            )
-            .exclude(docket_number__icontains="cr")
-            .exclude(case_name__icontains="sealed")
-            .exclude(case_name__icontains="suppressed")
-            .exclude(case_name__icontains="search warrant")
-        )
-        count = ds.count()
+        idb_row = idb_rows[idb_pk]
+        key = (idb_row.district_id, idb_row.docket_number)
+        ds = candidates[key]
+        count = len(ds)
         if count == 0:
             msg = "Creating new docket for IDB row: %s"
             logger.info(msg, idb_row)
-            create_new_docket_from_idb(idb_row)
+            add_new_idb_candidate(ds, create_new_docket_from_idb(idb_row))
             continue
         elif count == 1:
             d = ds[0]
@@ -1033,7 +1077,7 @@ def create_or_merge_from_idb_chunk(idb_chunk):
         if d is not None:
             merge_docket_with_idb(d, idb_row)
         else:
-            create_new_docket_from_idb(idb_row)
+            add_new_idb_candidate(ds, create_new_docket_from_idb(idb_row))
 
 
 @app.task
@@ -1,5 +1,6 @@
 import json
 import os
+import tempfile
 from datetime import date
 from unittest import mock
 
@@ -7,6 +8,7 @@ from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from juriscraper.pacer import PacerRssFeed
@@ -27,6 +29,7 @@ from cl.people_db.models import (
     PartyType,
     Role,
 )
+from cl.recap.constants import CV_2017, IDB_FIELD_DATA
 from cl.recap.management.commands.import_idb import Command
 from cl.recap.mergers import (
     add_attorney,
@@ -41,10 +44,12 @@ from cl.recap.models import (
     PROCESSING_STATUS,
     REQUEST_TYPE,
     UPLOAD_TYPE,
+    FjcIntegratedDatabase,
     PacerFetchQueue,
     ProcessingQueue,
 )
 from cl.recap.tasks import (
+    do_heuristic_match,
     do_pacer_fetch,
     process_recap_appellate_docket,
     process_recap_attachment,
@@ -1601,3 +1606,118 @@ class IdbImportTest(TestCase):
             self.assertEqual(
                 self.cmd.make_csv_row_dict(qa[0], ["1", "2", "3"]), qa[1]
             )
+
+
+class IdbHeuristicMatchTest(TestCase):
+    """Do IDB rows only match dockets with nearly the same case names?"""
+
+    def make_dockets(self, *case_names):
+        return [Docket(case_name=case_name) for case_name in case_names]
+
+    def test_near_miss_is_not_a_match(self):
+        """Case names that share the boilerplate but not the parties are not
+        a match.
+        """
+        idb_row = FjcIntegratedDatabase(
+            plaintiff="UNITED STATES", defendant="JOHN DOE"
+        )
+        ds = self.make_dockets("United States v. John Smith")
+        self.assertIsNone(do_heuristic_match(idb_row, ds))
+
+    def test_best_match_is_chosen(self):
+        idb_row = FjcIntegratedDatabase(
+            plaintiff="UNITED STATES", defendant="JOHN DOE"
+        )
+        ds = self.make_dockets(
+            "United States v. John Smith", "United States v. John Doe"
+        )
+        self.assertEqual(do_heuristic_match(idb_row, ds), ds[1])
+
+
+class IdbFastLoadTest(TestCase):
+    """Does --fast-load import IDB files the same way as the row by row
+    import?
+    """
+
+    def setUp(self) -> None:
+        self.headers = [
+            k for k, v in IDB_FIELD_DATA.items() if CV_2017 in v["sources"]
+        ]
+        self.fields = [IDB_FIELD_DATA[k]["field"] for k in self.headers]
+        rows = [
+            # Matches the existing row. Null values are blanked.
+            {"DOCKET": "1700001", "FILEDATE": "01/03/2017", "DEF": "NEW"},
+            # A new row, with values to convert.
+            {
+                "DOCKET": "1700002",
+                "FILEDATE": "01/04/2017",
+                "TERMDATE": "02/01/2017",
+                "CLASSACT": "1",
+                "DEMANDED": "5000",
+                "PLT": "ALPHA",
+                "DEF": "BETA",
+            },
+            # Two rows for the same new case. The second one wins.
+            {"DOCKET": "1700003", "FILEDATE": "01/05/2017", "DEF": "X"},
+            {
+                "DOCKET": "1700003",
+                "FILEDATE": "01/05/2017",
+                "DEF": "Y",
+                "DEMANDED": "10",
+            },
+        ]
+        lines = ["\t".join(self.headers)]
+        for row in rows:
+            row = dict(
+                {"CIRCUIT": "00", "DISTRICT": "90", "ORIGIN": "1"}, **row
+            )
+            lines.append("\t".join(row.get(h, "-8") for h in self.headers))
+        self.f = tempfile.NamedTemporaryFile(suffix=".txt")
+        self.f.write("\r\n".join(lines).encode("cp1252") + b"\r\n")
+        self.f.flush()
+
+    def tearDown(self) -> None:
+        self.f.close()
+
+    def import_file(self, *args):
+        FjcIntegratedDatabase.objects.all().delete()
+        FjcIntegratedDatabase.objects.create(
+            dataset_source=CV_2017,
+            circuit_id="cadc",
+            district_id="dcd",
+            docket_number="1700001",
+            origin=1,
+            date_filed=date(2017, 1, 3),
+            defendant="OLD",
+            monetary_demand=99,
+        )
+        call_command(
+            "import_idb",
+            "--input-file",
+            self.f.name,
+            "--filetype",
+            str(CV_2017),
+            *args
+        )
+        return list(
+            FjcIntegratedDatabase.objects.order_by(
+                "docket_number", "pk"
+            ).values(*self.fields)
+        )
+
+    def test_fast_load_matches_row_by_row(self) -> None:
+        rows = self.import_file("--fast-load", "--chunk-size", "100")
+        self.assertEqual(
+            [(r["docket_number"], r["defendant"]) for r in rows],
+            [("1700001", "NEW"), ("1700002", "BETA"), ("1700003", "Y")],
+        )
+        updated, inserted, duplicate = rows
+        self.assertIsNone(updated["monetary_demand"])
+        self.assertIsNone(updated["date_terminated"])
+        self.assertEqual(updated["plaintiff"], "")
+        self.assertEqual(inserted["date_terminated"], date(2017, 2, 1))
+        self.assertIs(inserted["class_action"], True)
+        self.assertEqual(inserted["monetary_demand"], 5000)
+        self.assertEqual(duplicate["monetary_demand"], 10)
+
+        self.assertEqual(rows, self.import_file())
@@ -0,0 +1,106 @@
+from datetime import datetime, time, timedelta
+
+from django.utils.timezone import make_aware
+
+from cl.lib.argparse_types import valid_date
+from cl.lib.celery_utils import CeleryThrottle
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.recap_rss.models import RssFeedData
+from cl.recap_rss.tasks import replay_rss_feed_data
+
+
+class Command(VerboseCommand):
+    help = (
+        "Merge stored PACER RSS feeds into CourtListener again, for example "
+        "after a parser fix. Feeds are replayed in parallel by celery, "
+        "without sending alerts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--courts",
+            type=str,
+            default=["all"],
+            nargs="*",
+            help="The courts whose feeds you wish to replay.",
+        )
+        parser.add_argument(
+            "--date-start",
+            type=valid_date,
+            required=True,
+            help="The first day of stored feeds to replay, inclusive.",
+        )
+        parser.add_argument(
+            "--date-end",
+            type=valid_date,
+            required=True,
+            help="The last day of stored feeds to replay, inclusive.",
+        )
+        parser.add_argument(
+            "--feeds-per-task",
+            type=int,
+            default=300,
+            help="The number of feeds from a court to replay in one task. "
+            "Items are deduplicated within a task, so larger numbers mean "
+            "less duplicated work, but more memory per task.",
+        )
+        parser.add_argument(
+            "--metadata-only",
+            default=False,
+            action="store_true",
+            help="Only merge docket metadata, not docket entries.",
+        )
+        parser.add_argument(
+            "--no-index",
+            default=False,
+            action="store_true",
+            help="Don't add the new RECAP documents to Solr.",
+        )
+        parser.add_argument(
+            "--queue",
+            type=str,
+            default="batch1",
+            help="The celery queue where the tasks should be processed.",
+        )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+
+        start = make_aware(datetime.combine(options["date_start"], time()))
+        end = make_aware(
+            datetime.combine(options["date_end"] + timedelta(days=1), time())
+        )
+        feeds = RssFeedData.objects.filter(
+            date_created__gte=start, date_created__lt=end
+        )
+        if options["courts"] != ["all"]:
+            feeds = feeds.filter(court_id__in=options["courts"])
+        court_ids = feeds.values_list("court_id", flat=True).distinct()
+
+        q = options["queue"]
+        throttle = CeleryThrottle(queue_name=q)
+        task_count = 0
+        for court_id in court_ids.order_by("court_id"):
+            feed_data_pks = list(
+                feeds.filter(court_id=court_id)
+                .order_by("date_created")
+                .values_list("pk", flat=True)
+            )
+            chunk_size = options["feeds_per_task"]
+            for i in range(0, len(feed_data_pks), chunk_size):
+                throttle.maybe_wait()
+                replay_rss_feed_data.apply_async(
+                    args=(feed_data_pks[i : i + chunk_size], court_id),
+                    kwargs={
+                        "metadata_only": options["metadata_only"],
+                        "index": not options["no_index"],
+                    },
+                    queue=q,
+                )
+                task_count += 1
+            logger.info(
+                "%s: Sent %s feeds to celery for replay.",
+                court_id,
+                len(feed_data_pks),
+            )
+        logger.info("Done. Sent %s tasks to celery.", task_count)
@@ -15,6 +15,11 @@ from cl.recap_rss.tasks import (
     merge_rss_feed_contents,
     trim_rss_data,
 )
+from cl.recap_rss.utils import (
+    RSS_DEFAULT_CADENCE,
+    get_feed_cadences,
+    get_next_visit,
+)
 from cl.search.models import Court
 from cl.search.tasks import add_items_to_solr
 
@@ -22,10 +27,11 @@ from cl.search.tasks import add_items_to_solr
 class Command(VerboseCommand):
     help = "Scrape PACER RSS feeds"
 
-    RSS_MAX_VISIT_FREQUENCY = 5 * 60
     RSS_MAX_PROCESSING_DURATION = 10 * 60
     DELAY_BETWEEN_ITERATIONS = 1 * 60
+    MIN_DELAY_BETWEEN_ITERATIONS = 10
     DELAY_BETWEEN_CACHE_TRIMS = 60 * 60
+    DELAY_BETWEEN_CADENCE_UPDATES = 60 * 60
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -82,12 +88,32 @@ class Command(VerboseCommand):
         if options["courts"] != ["all"]:
             courts = courts.filter(pk__in=options["courts"])
 
+        # If it's all courts and it's not a sweep, visit each court when its
+        # feed is expected to have changed, according to how often it has
+        # changed lately.
+        scheduled = options["courts"] == ["all"] and options["sweep"] is False
+
         iterations_completed = 0
         last_trim_date = None
+        last_cadence_date = None
+        cadences = {}
         while (
             options["iterations"] == 0
             or iterations_completed < options["iterations"]
         ):
+            cadence_cutoff_date = now() - timedelta(
+                seconds=self.DELAY_BETWEEN_CADENCE_UPDATES
+            )
+            if scheduled and (
+                last_cadence_date is None
+                or cadence_cutoff_date > last_cadence_date
+            ):
+                cadences = get_feed_cadences([court.pk for court in courts])
+                last_cadence_date = now()
+
+            next_visit_date = now() + timedelta(
+                seconds=self.DELAY_BETWEEN_ITERATIONS
+            )
             for court in courts:
                 # Check the last time we successfully got the feed
                 try:
@@ -110,14 +136,17 @@ class Command(VerboseCommand):
                         date_last_build=lincolns_birthday,
                         is_sweep=options["sweep"],
                     )
-                if options["courts"] == ["all"] and options["sweep"] is False:
-                    # If it's all courts and it's not a sweep, check if we did
-                    # it recently.
-                    max_visit_ago = now() - timedelta(
-                        seconds=self.RSS_MAX_VISIT_FREQUENCY
+                if scheduled:
+                    court_next_visit_date = get_next_visit(
+                        feed_status.date_created,
+                        feed_status.date_last_build,
+                        cadences.get(court.pk, RSS_DEFAULT_CADENCE),
                     )
-                    if feed_status.date_created > max_visit_ago:
-                        # Processed too recently. Try next court.
+                    if court_next_visit_date > now():
+                        # Not expected to have changed yet. Try next court.
+                        next_visit_date = min(
+                            next_visit_date, court_next_visit_date
+                        )
                         continue
 
                 # Don't crawl a court if it says it's been in progress just a
@@ -167,8 +196,10 @@ class Command(VerboseCommand):
                 trim_rss_data.delay()
                 last_trim_date = now()
 
-            # Wait, then attempt the courts again if iterations not exceeded.
+            # Wait until the next court is due, then attempt the courts again
+            # if iterations not exceeded.
             iterations_completed += 1
             remaining_iterations = options["iterations"] - iterations_completed
             if remaining_iterations > 0:
-                time.sleep(self.DELAY_BETWEEN_ITERATIONS)
+                delay = (next_visit_date - now()).total_seconds()
+                time.sleep(max(delay, self.MIN_DELAY_BETWEEN_ITERATIONS))
@@ -1,11 +1,9 @@
 import bz2
 
 from django.db import models
-from juriscraper.pacer import PacerRssFeed
 
 from cl.lib.model_helpers import make_path
 from cl.lib.models import AbstractDateTimeModel
-from cl.lib.pacer import map_cl_to_pacer_id
 from cl.lib.storage import UUIDFileSystemStorage
 from cl.search.models import Court
 
@@ -108,13 +106,14 @@ class RssFeedData(AbstractDateTimeModel):
         :param index: Whether to save to Solr (note that none will be sent
         when doing medata only since no entries are modified).
         """
-        from cl.recap_rss.tasks import merge_rss_feed_contents
+        from cl.recap_rss.tasks import (
+            merge_rss_feed_contents,
+            parse_rss_feed_data,
+        )
         from cl.search.tasks import add_items_to_solr
 
-        rss_feed = PacerRssFeed(map_cl_to_pacer_id(self.court_id))
-        rss_feed._parse_text(self.file_contents)
         response = merge_rss_feed_contents(
-            rss_feed.data, self.court_id, metadata_only
+            parse_rss_feed_data(self), self.court_id, metadata_only
         )
         if index:
             add_items_to_solr(
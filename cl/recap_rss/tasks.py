@@ -29,6 +29,7 @@ from cl.recap.mergers import (
 from cl.recap_rss.models import RssFeedData, RssFeedStatus, RssItemCache
 from cl.recap_rss.utils import emails
 from cl.search.models import Court
+from cl.search.tasks import add_items_to_solr
 
 logger = logging.getLogger(__name__)
 
@@ -155,8 +156,9 @@ def check_if_feed_changed(self, court_pk, feed_status_pk, date_last_built):
     If we were being very careful and really optimizing when we crawled these
     feeds, this would cause us trouble because we'd detect a change in this
     field when the actual data hadn't changed. But because we only crawl the
-    feeds at most once every five minutes, and because the gaps we've observed
-    in this field tend to only be about one minute, we can get away with this.
+    feeds at most once every two minutes (see RSS_MIN_VISIT_INTERVAL), and
+    because the gaps we've observed in this field tend to only be about one
+    minute, we can get away with this.
 
     Other solutions/thoughts we can consider later:
 
@@ -283,7 +285,9 @@ def cache_hash(item_hash):
 
 
 @app.task(bind=True, max_retries=1)
-def merge_rss_feed_contents(self, feed_data, court_pk, metadata_only=False):
+def merge_rss_feed_contents(
+    self, feed_data, court_pk, metadata_only=False, enqueue_alerts=True
+):
     """Merge the rss feed contents into CourtListener
 
     :param self: The Celery task
@@ -291,6 +295,8 @@ def merge_rss_feed_contents(self, feed_data, court_pk, metadata_only=False):
     already queried the feed and been parsed.
     :param court_pk: The CourtListener court ID.
     :param metadata_only: Whether to only do metadata and skip docket entries.
+    :param enqueue_alerts: Whether to enqueue alerts for dockets that got new
+    content. If False, d_pks_to_alert will be empty.
     :returns Dict containing keys:
       d_pks_to_alert: A list of (docket, alert_time) tuples for sending alerts
       rds_for_solr: A list of RECAPDocument PKs for updating in Solr
@@ -333,7 +339,7 @@ def merge_rss_feed_contents(self, feed_data, court_pk, metadata_only=False):
                 d, docket["docket_entries"]
             )
 
-        if content_updated:
+        if content_updated and enqueue_alerts:
             newly_enqueued = enqueue_docket_alert(d.pk)
             if newly_enqueued:
                 d_pks_to_alert.append((d.pk, start_time))
@@ -350,6 +356,83 @@ def merge_rss_feed_contents(self, feed_data, court_pk, metadata_only=False):
     return {"d_pks_to_alert": d_pks_to_alert, "rds_for_solr": all_rds_created}
 
 
+def parse_rss_feed_data(feed_data):
+    """Parse a stored RSS feed.
+
+    :param feed_data: An RssFeedData object.
+    :return: The data parameter of a parsed PacerRssFeed object.
+    """
+    rss_feed = PacerRssFeed(map_cl_to_pacer_id(feed_data.court_id))
+    rss_feed._parse_text(feed_data.file_contents)
+    return rss_feed.data
+
+
+@app.task(ignore_result=True)
+def replay_rss_feed_data(
+    feed_data_pks, court_pk, metadata_only=False, index=True, batch_size=1000
+):
+    """Merge stored RSS feeds from one court into CourtListener again.
+
+    Feeds overlap a lot, so the items in the feeds are deduplicated before
+    they're merged. No alerts are sent, and the new RECAP documents are sent
+    to Solr in batches.
+
+    Items are merged one at a time, so an item whose docket is created by
+    another process while it's merged is tried again on its own, without
+    losing the rest of the feeds.
+
+    :param feed_data_pks: The PKs of RssFeedData objects from the court.
+    :param court_pk: The CourtListener court ID.
+    :param metadata_only: Whether to only do metadata and skip docket entries.
+    :param index: Whether to add the new RECAP documents to Solr.
+    :param batch_size: The number of RECAP documents to send to Solr at once.
+    """
+    items = {}
+    for feed_data in RssFeedData.objects.filter(pk__in=feed_data_pks).order_by(
+        "date_created"
+    ):
+        try:
+            feed_items = parse_rss_feed_data(feed_data)
+        except OSError as e:
+            logger.warning("Unable to read %s: %s", feed_data.filepath, e)
+            continue
+        for item in feed_items:
+            items.setdefault(hash_item(item), item)
+
+    logger.info(
+        "%s: Replaying %s distinct items from %s feeds.",
+        court_pk,
+        len(items),
+        len(feed_data_pks),
+    )
+    rd_pks = []
+    for item in items.values():
+        for attempt in range(2):
+            try:
+                response = merge_rss_feed_contents(
+                    [item], court_pk, metadata_only, enqueue_alerts=False
+                )
+            except IntegrityError as e:
+                # The docket was created while we looked it up. The next
+                # attempt should find it.
+                error = e
+                continue
+            rd_pks.extend(response["rds_for_solr"])
+            break
+        else:
+            logger.warning(
+                "%s: Unable to merge item %s: %s",
+                court_pk,
+                item["docket_number"],
+                error,
+            )
+    if index:
+        for i in range(0, len(rd_pks), batch_size):
+            add_items_to_solr(
+                rd_pks[i : i + batch_size], "search.RECAPDocument"
+            )
+
+
 @app.task
 def mark_status_successful(feed_status_pk):
     feed_status = RssFeedStatus.objects.get(pk=feed_status_pk)
@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from unittest import TestCase, mock
+
+from django.db import IntegrityError
+from django.test import TestCase as DjangoTestCase
+from django.utils.timezone import utc
+
+from cl.recap_rss.models import RssFeedData
+from cl.recap_rss.tasks import replay_rss_feed_data
+from cl.recap_rss.utils import (
+    RSS_DEFAULT_CADENCE,
+    RSS_MAX_VISIT_INTERVAL,
+    RSS_MIN_VISIT_INTERVAL,
+    estimate_cadence,
+    get_next_visit,
+)
+
+
+class FeedSchedulingTest(TestCase):
+    start = datetime(2020, 6, 1, 9, 0, tzinfo=utc)
+
+    def builds_every(self, minutes, count):
+        return [
+            self.start + timedelta(minutes=minutes * i) for i in range(count)
+        ]
+
+    def test_estimate_cadence(self) -> None:
+        """Do we learn how often feeds are rebuilt?"""
+        self.assertEqual(
+            estimate_cadence(self.builds_every(10, 20)),
+            timedelta(minutes=10),
+        )
+        # Too little history to tell.
+        self.assertEqual(
+            estimate_cadence(self.builds_every(10, 2)), RSS_DEFAULT_CADENCE
+        )
+        # Busy and quiet feeds are kept within the visit intervals.
+        self.assertEqual(
+            estimate_cadence(self.builds_every(2.5, 20)),
+            timedelta(minutes=2.5),
+        )
+        self.assertEqual(
+            estimate_cadence(self.builds_every(240, 20)),
+            RSS_MAX_VISIT_INTERVAL,
+        )
+
+    def test_estimate_cadence_ignores_jitter_and_overnight_gaps(self) -> None:
+        """Are wobbles in lastBuildDate and overnight gaps left out?"""
+        builds = self.builds_every(10, 20)
+        builds += [b + timedelta(seconds=50) for b in builds]
+        builds += [b + timedelta(days=1) for b in self.builds_every(10, 20)]
+        self.assertEqual(estimate_cadence(builds), timedelta(minutes=10))
+
+    def test_get_next_visit(self) -> None:
+        """Are feeds visited before their next build, and backed off when
+        they're quiet?
+        """
+        cadence = timedelta(minutes=20)
+        # Just saw a new build. Come back before the next one.
+        self.assertEqual(
+            get_next_visit(self.start, self.start, cadence),
+            self.start + timedelta(minutes=15),
+        )
+        # Overdue. Check back soon.
+        last_visit = self.start + timedelta(minutes=21)
+        self.assertEqual(
+            get_next_visit(last_visit, self.start, cadence),
+            last_visit + timedelta(minutes=5.25),
+        )
+        # Quiet for hours. Check back rarely.
+        last_visit = self.start + timedelta(hours=10)
+        self.assertEqual(
+            get_next_visit(last_visit, self.start, cadence),
+            last_visit + RSS_MAX_VISIT_INTERVAL,
+        )
+        # Never visited more often than the minimum.
+        self.assertEqual(
+            get_next_visit(self.start, self.start, timedelta(minutes=1)),
+            self.start + RSS_MIN_VISIT_INTERVAL,
+        )
+
+
+class ReplayRssFeedDataTest(DjangoTestCase):
+    fixtures = ["canb_court.json"]
+
+    def make_item(self, pacer_case_id):
+        return {
+            "pacer_case_id": pacer_case_id,
+            "docket_number": "18-%s" % pacer_case_id,
+            "docket_entries": [],
+        }
+
+    @mock.patch("cl.recap_rss.tasks.add_items_to_solr")
+    @mock.patch("cl.recap_rss.tasks.merge_rss_feed_contents")
+    @mock.patch("cl.recap_rss.tasks.parse_rss_feed_data")
+    def test_replay_dedupes_and_batches(
+        self, parse_mock, merge_mock, solr_mock
+    ) -> None:
+        """Are items in overlapping feeds merged once, without alerts, and
+        sent to Solr in batches?
+        """
+        feed_data_pks = [
+            RssFeedData.objects.create(court_id="canb", filepath="rss.xml").pk
+            for _ in range(2)
+        ]
+        a, b, c = self.make_item("1"), self.make_item("2"), self.make_item("3")
+        parse_mock.side_effect = [[a, b], [b, c]]
+        # b's docket is created by another process, so it's merged again.
+        merge_mock.side_effect = [
+            {"d_pks_to_alert": [], "rds_for_solr": [1]},
+            IntegrityError(),
+            {"d_pks_to_alert": [], "rds_for_solr": [2]},
+            {"d_pks_to_alert": [], "rds_for_solr": [3]},
+        ]
+
+        replay_rss_feed_data(feed_data_pks, "canb", batch_size=2)
+
+        self.assertEqual(
+            merge_mock.call_args_list,
+            [
+                mock.call([item], "canb", False, enqueue_alerts=False)
+                for item in [a, b, b, c]
+            ],
+        )
+        self.assertEqual(
+            solr_mock.call_args_list,
+            [
+                mock.call([1, 2], "search.RECAPDocument"),
+                mock.call([3], "search.RECAPDocument"),
+            ],
+        )
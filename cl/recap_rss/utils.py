@@ -1,4 +1,10 @@
+from collections import defaultdict
+from datetime import timedelta
+
 from django.conf import settings
+from django.utils.timezone import now
+
+from cl.recap_rss.models import RssFeedStatus
 
 emails = {
     "changed_rss_feed": {
@@ -22,3 +28,91 @@ emails = {
         "to": [a[1] for a in settings.MANAGERS],
     },
 }
+
+
+# Feeds are never visited more often than this...
+RSS_MIN_VISIT_INTERVAL = timedelta(minutes=2)
+# ...or less often than this, so stale feeds are still noticed.
+RSS_MAX_VISIT_INTERVAL = timedelta(minutes=30)
+# The cadence for courts that we don't have enough history for.
+RSS_DEFAULT_CADENCE = timedelta(minutes=5)
+# The lastBuildDate of a feed wobbles by about a minute around the time it's
+# built. Build dates closer together than this are the same build.
+RSS_BUILD_DATE_JITTER = timedelta(minutes=2)
+# How much history to use when learning the cadences of feeds.
+RSS_CADENCE_HISTORY = timedelta(days=3)
+
+
+def estimate_cadence(build_dates):
+    """Estimate how often a feed is rebuilt from the build dates we've seen.
+
+    The median gap between builds is used, so the overnight and weekend gaps
+    of courts that only publish during the day don't skew it.
+
+    :param build_dates: An iterable of the lastBuildDate values of a feed.
+    :return: A timedelta between RSS_MIN_VISIT_INTERVAL and
+    RSS_MAX_VISIT_INTERVAL, or RSS_DEFAULT_CADENCE if there are too few
+    builds to tell.
+    """
+    builds = []
+    for build_date in sorted(build_dates):
+        if not builds or build_date - builds[-1] >= RSS_BUILD_DATE_JITTER:
+            builds.append(build_date)
+    gaps = sorted(b - a for a, b in zip(builds, builds[1:]))
+    if len(gaps) < 2:
+        return RSS_DEFAULT_CADENCE
+    cadence = gaps[len(gaps) // 2]
+    return min(max(cadence, RSS_MIN_VISIT_INTERVAL), RSS_MAX_VISIT_INTERVAL)
+
+
+def get_feed_cadences(court_ids):
+    """Learn the cadence of each court's feed from its recent visits.
+
+    :param court_ids: The IDs of the courts to get cadences for.
+    :return: A dict of court IDs to timedeltas. Courts with too little
+    history get RSS_DEFAULT_CADENCE.
+    """
+    build_dates = defaultdict(set)
+    for court_id, build_date in (
+        RssFeedStatus.objects.filter(
+            court_id__in=court_ids,
+            is_sweep=False,
+            date_created__gte=now() - RSS_CADENCE_HISTORY,
+            date_last_build__isnull=False,
+        )
+        .values_list("court_id", "date_last_build")
+        .distinct()
+    ):
+        build_dates[court_id].add(build_date)
+    return {
+        court_id: estimate_cadence(build_dates[court_id])
+        for court_id in court_ids
+    }
+
+
+def get_next_visit(last_visit, last_build, cadence):
+    """Predict when a feed should be visited next.
+
+    Feeds are first visited a little before they're expected to be rebuilt.
+    If they were visited right on time, we'd never see gaps shorter than the
+    cadence we already have, and we'd never notice a feed speeding up. Feeds
+    that are overdue are checked again at an interval that grows with how
+    long they've been quiet, so busy feeds are rechecked soon and quiet ones,
+    like feeds overnight, are left alone.
+
+    :param last_visit: When the feed was last visited.
+    :param last_build: The lastBuildDate of the feed at that visit, or None if
+    it's unknown.
+    :param cadence: The cadence of the feed, from estimate_cadence.
+    :return: A datetime of the next visit.
+    """
+    if last_build is None:
+        interval = cadence
+    elif last_build + cadence * 3 / 4 > last_visit:
+        interval = last_build + cadence * 3 / 4 - last_visit
+    else:
+        interval = max(cadence, last_visit - last_build) / 4
+    interval = min(
+        max(interval, RSS_MIN_VISIT_INTERVAL), RSS_MAX_VISIT_INTERVAL
+    )
+    return last_visit + interval
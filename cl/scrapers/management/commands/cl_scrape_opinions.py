@@ -2,7 +2,7 @@ import signal
 import sys
 import time
 from datetime import date
-from typing import Any, Dict, List, Tuple, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 from django.core.files.base import ContentFile
 from django.core.management.base import CommandError
@@ -16,7 +16,7 @@ from cl.alerts.models import RealTimeQueue
 from cl.citations.find_citations import get_citations
 from cl.lib.command_utils import VerboseCommand, logger
 from cl.lib.crypto import sha1
-from cl.lib.import_lib import get_candidate_judges
+from cl.lib.import_lib import JudgeResolver, get_candidate_judges
 from cl.lib.string_utils import trunc
 from cl.scrapers.DupChecker import DupChecker
 from cl.scrapers.models import ErrorLog
@@ -128,8 +128,13 @@ def save_everything(
     items: Dict[str, Any],
     index: bool = False,
     backscrape: bool = False,
+    resolver: Optional[JudgeResolver] = None,
 ) -> None:
-    """Saves all the sub items and associates them as appropriate."""
+    """Saves all the sub items and associates them as appropriate.
+
+    :param resolver: A JudgeResolver to find the judges with. Scrapers save
+    many items, so they pass one in instead of querying for every item.
+    """
     docket, cluster = items["docket"], items["cluster"]
     opinion, citations = items["opinion"], items["citations"]
     docket.save()
@@ -141,9 +146,14 @@ def save_everything(
         citation.save()
 
     if cluster.judges:
-        candidate_judges = get_candidate_judges(
-            cluster.judges, docket.court.pk, cluster.date_filed
-        )
+        if resolver is None:
+            candidate_judges = get_candidate_judges(
+                cluster.judges, docket.court.pk, cluster.date_filed
+            )
+        else:
+            candidate_judges = resolver.get_candidate_judges(
+                cluster.judges, docket.court.pk, cluster.date_filed
+            )
         if len(candidate_judges) == 1:
             opinion.author = candidate_judges[0]
 
@@ -164,6 +174,15 @@ class Command(VerboseCommand):
 
     def __init__(self, stdout=None, stderr=None, no_color=False):
         super(Command, self).__init__(stdout=None, stderr=None, no_color=False)
+        self.judge_resolver = None
+
+    def get_judge_resolver(self) -> JudgeResolver:
+        """Get the JudgeResolver for this run, building it the first time
+        it's needed.
+        """
+        if self.judge_resolver is None:
+            self.judge_resolver = JudgeResolver.from_db()
+        return self.judge_resolver
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -286,6 +305,7 @@ class Command(VerboseCommand):
                     "citations": citations,
                 },
                 index=False,
+                resolver=self.get_judge_resolver(),
             )
             extract_doc_content.delay(
                 opinion.pk, ocr_available=True, citation_jitter=True
@@ -349,6 +369,8 @@ class Command(VerboseCommand):
                         "the beginning because daemon mode is enabled."
                     )
                     i = 0
+                    # Pick up judges added since the last loop.
+                    self.judge_resolver = None
             else:
                 i += 1
             time.sleep(wait)
@@ -1,6 +1,6 @@
 import random
 from datetime import date
-from typing import Any, Dict, Tuple, Union
+from typing import Any, Dict, Optional, Tuple, Union
 
 from django.core.files.base import ContentFile
 from django.db import transaction
@@ -11,7 +11,11 @@ from cl.alerts.models import RealTimeQueue
 from cl.audio.models import Audio
 from cl.lib.command_utils import logger
 from cl.lib.crypto import sha1
-from cl.lib.import_lib import get_candidate_judges, get_scotus_judges
+from cl.lib.import_lib import (
+    JudgeResolver,
+    get_candidate_judges,
+    get_scotus_judges,
+)
 from cl.lib.string_utils import trunc
 from cl.scrapers.DupChecker import DupChecker
 from cl.scrapers.management.commands import cl_scrape_opinions
@@ -28,6 +32,7 @@ def save_everything(
     items: Dict[str, Union[Docket, Audio]],
     index: bool = False,
     backscrape: bool = False,
+    resolver: Optional[JudgeResolver] = None,
 ) -> None:
     docket, af = items["docket"], items["audio_file"]
     docket.save()
@@ -35,10 +40,14 @@ def save_everything(
     af.save(index=index)
     candidate_judges = []
     if af.docket.court_id != "scotus":
-        if af.judges:
+        if af.judges and resolver is None:
             candidate_judges = get_candidate_judges(
                 af.judges, docket.court.pk, af.docket.date_argued
             )
+        elif af.judges:
+            candidate_judges = resolver.get_candidate_judges(
+                af.judges, docket.court.pk, af.docket.date_argued
+            )
     else:
         candidate_judges = get_scotus_judges(af.docket.date_argued)
 
@@ -167,6 +176,7 @@ class Command(cl_scrape_opinions.Command):
                         items={"docket": docket, "audio_file": audio_file},
                         index=False,
                         backscrape=backscrape,
+                        resolver=self.get_judge_resolver(),
                     )
                     process_audio_file.apply_async(
                         (audio_file.pk,), countdown=random.randint(0, 3600)
@@ -1,11 +1,13 @@
 import os
 from datetime import timedelta
+from unittest import mock
 
 from django.conf import settings
 from django.test import TestCase
 from django.utils.timezone import now
 
 from cl.audio.models import Audio
+from cl.lib.import_lib import JudgeResolver
 from cl.lib.test_helpers import IndexedSolrTestCase
 from cl.scrapers.DupChecker import DupChecker
 from cl.scrapers.management.commands import (
@@ -53,6 +55,22 @@ class ScraperIngestionTest(TestCase):
         audio_files = Audio.objects.all()
         self.assertEqual(2, audio_files.count())
 
+    def test_judges_are_loaded_once_per_run(self):
+        """Do scrapers share one JudgeResolver instead of querying for the
+        judges of every item?
+        """
+        site = test_opinion_scraper.Site()
+        site.method = "LOCAL"
+        parsed_site = site.parse()
+        with mock.patch.object(
+            JudgeResolver, "from_db", wraps=JudgeResolver.from_db
+        ) as from_db:
+            cl_scrape_opinions.Command().scrape_court(
+                parsed_site, full_crawl=True
+            )
+        self.assertEqual(Opinion.objects.count(), 6)
+        self.assertEqual(from_db.call_count, 1)
+
     def test_parsing_xml_opinion_site_to_site_object(self):
         """Does a basic parse of a site reveal the right number of items?"""
         site = test_opinion_scraper.Site().parse()
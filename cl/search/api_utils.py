@@ -3,7 +3,10 @@ from rest_framework.exceptions import ParseError
 
 from cl.lib import search_utils
 from cl.lib.scorched_utils import ExtraSolrInterface
-from cl.lib.search_utils import map_to_docket_entry_sorting
+from cl.lib.search_utils import (
+    SEARCH_RESULT_CACHE_TIMEOUTS,
+    map_to_docket_entry_sorting,
+)
 from cl.search.models import SEARCH_TYPES
 
 
@@ -53,13 +56,12 @@ class SolrList(object):
         elif self.type == SEARCH_TYPES.PEOPLE:
             self.conn = ExtraSolrInterface(settings.SOLR_PEOPLE_URL, mode="r")
         self._length = length
+        self._page_fetched = False
 
     def __len__(self):
         if self._length is None:
-            mq = self.main_query.copy()  # local copy for manipulation
-            mq["caller"] = "api_search_count"
-            count = self.conn.query().add_extra(**mq).count()
-            self._length = count
+            # The count comes with the page.
+            self.get_page()
         return self._length
 
     def __iter__(self):
@@ -69,10 +71,20 @@ class SolrList(object):
             except IndexError:
                 yield self.__getitem__(item)
 
-    def __getitem__(self, item):
+    def get_page(self):
+        """Get the page of results at the offset, and the total count."""
+        if self._page_fetched:
+            return
         self.main_query["start"] = self.offset
-        r = self.conn.query().add_extra(**self.main_query).execute()
+        search = (
+            self.conn.query()
+            .add_extra(**self.main_query)
+            .cache(SEARCH_RESULT_CACHE_TIMEOUTS[self.type])
+        )
+        r = search.execute()
         self.conn.conn.http_connection.close()
+        self._page_fetched = True
+        self._length = search.get_total(r)
         if r.group_field is None:
             # Pull the text snippet up a level
             for result in r.result.docs:
@@ -89,6 +101,8 @@ class SolrList(object):
                     )
                     self._item_cache.append(SolrObject(initial=doc))
 
+    def __getitem__(self, item):
+        self.get_page()
         # Now, assuming our _item_cache is all set, we just get the item.
         if isinstance(item, slice):
             s = slice(
@@ -0,0 +1,131 @@
+"""A process-wide, read-only copy of the court table.
+
+Courts are needed on every search and for every item that's indexed, but they
+hardly ever change. Instead of querying for them each time, each process loads
+them once into a CourtRegistry and keeps it until a court is saved or deleted.
+
+Saving or deleting a court bumps a version number in redis. Processes check
+that number at most every COURT_REGISTRY_CHECK_INTERVAL seconds, and reload
+their registry when it changes.
+"""
+import time
+from collections import defaultdict
+from copy import copy
+from types import MappingProxyType
+from typing import Iterable, List
+
+from django.apps import (  # Must use apps.get_model() to avoid circular import issue
+    apps,
+)
+
+from cl.lib.redis_utils import make_redis_interface
+
+COURT_REGISTRY_VERSION_KEY = "court-registry:version"
+
+# How long a process uses its registry before checking that it's current.
+COURT_REGISTRY_CHECK_INTERVAL = 10
+
+_registry = None
+_last_checked = 0.0
+
+
+class CourtRegistry(object):
+    """Every court, in position order, with the usual lookups made ahead of
+    time.
+
+    The courts in a registry are shared by everything in the process, so
+    they must not be changed. Use copy_courts to get courts that can be.
+
+    :param courts: An iterable of Court objects.
+    :param version: The version of the court table the courts came from.
+    """
+
+    def __init__(self, courts: Iterable, version: str) -> None:
+        self.version = version
+        self.courts = tuple(courts)
+        self.by_id = MappingProxyType({c.pk: c for c in self.courts})
+        by_jurisdiction = defaultdict(list)
+        for court in self.courts:
+            by_jurisdiction[court.jurisdiction].append(court)
+        self.by_jurisdiction = MappingProxyType(
+            {j: tuple(courts) for j, courts in by_jurisdiction.items()}
+        )
+        self.in_use = tuple(c for c in self.courts if c.in_use)
+        self.citation_strings = tuple(
+            (c.citation_string, c.pk) for c in self.courts
+        )
+
+    def __len__(self) -> int:
+        return len(self.courts)
+
+    def get(self, pk: str):
+        """Get a court by its ID, or None if there isn't one."""
+        return self.by_id.get(pk)
+
+
+def get_court_registry_version() -> str:
+    r = make_redis_interface("CACHE")
+    return r.get(COURT_REGISTRY_VERSION_KEY) or "0"
+
+
+def get_court_registry() -> CourtRegistry:
+    """Get this process's court registry, reloading it if a court has changed
+    since it was loaded.
+    """
+    global _registry, _last_checked
+    now = time.monotonic()
+    if (
+        _registry is not None
+        and now - _last_checked < COURT_REGISTRY_CHECK_INTERVAL
+    ):
+        return _registry
+
+    # Get the version first, so that a court saved while we load is reloaded
+    # next time.
+    version = get_court_registry_version()
+    if _registry is None or _registry.version != version:
+        Court = apps.get_model("search.Court")
+        _registry = CourtRegistry(Court.objects.all(), version)
+    _last_checked = now
+    return _registry
+
+
+def clear_court_registry() -> None:
+    """Drop this process's registry, so the next use reloads it."""
+    global _registry
+    _registry = None
+
+
+def invalidate_court_registry() -> None:
+    """Make every process reload its court registry."""
+    r = make_redis_interface("CACHE")
+    r.incr(COURT_REGISTRY_VERSION_KEY)
+    clear_court_registry()
+
+
+def get_court(pk: str):
+    """Get a court from the registry.
+
+    Courts that were made since the registry was loaded are picked up by
+    reloading it.
+
+    :param pk: The ID of the court.
+    :return: The Court object. Don't change it.
+    """
+    court = get_court_registry().get(pk)
+    if court is None:
+        clear_court_registry()
+        court = get_court_registry().get(pk)
+    if court is None:
+        Court = apps.get_model("search.Court")
+        raise Court.DoesNotExist("No court with ID '%s'." % pk)
+    return court
+
+
+def copy_courts(courts: Iterable) -> List:
+    """Copy courts from the registry so that attributes can be set on them.
+
+    :param courts: An iterable of Court objects from the registry.
+    :return: A list of copies of the Court objects.
+    """
+    return [copy(court) for court in courts]
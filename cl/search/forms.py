@@ -9,12 +9,13 @@ from localflavor.us.us_states import STATE_CHOICES
 
 from cl.lib.model_helpers import flatten_choices
 from cl.people_db.models import PoliticalAffiliation, Position
+from cl.search.court_registry import get_court_registry
 from cl.search.fields import (
     CeilingDateField,
     FloorDateField,
     RandomChoiceField,
 )
-from cl.search.models import DOCUMENT_STATUSES, SEARCH_TYPES, Court
+from cl.search.models import DOCUMENT_STATUSES, SEARCH_TYPES
 
 OPINION_ORDER_BY_CHOICES = (
     ("score desc", "Relevance"),
@@ -469,8 +470,7 @@ class SearchForm(forms.Form):
         names coming from the database, we need to interact directly with the
         fields dict.
         """
-        courts = Court.objects.filter(in_use=True)
-        for court in courts:
+        for court in get_court_registry().in_use:
             self.fields["court_" + court.pk] = forms.BooleanField(
                 label=court.short_name,
                 required=False,
@@ -1,32 +1,176 @@
 import os
+import resource
+import time
+from itertools import islice
 
-import igraph
+import numpy as np
 from django.conf import settings
 
-from cl.lib.command_utils import VerboseCommand
+from cl.lib.command_utils import VerboseCommand, logger
 from cl.lib.solr_core_admin import get_data_dir
 from cl.search.models import Opinion, OpinionsCited
 
 
-def make_and_populate_nx_graph():
-    """Create a new igraph object and populate it.
+def get_citation_edges(min_id=0, chunk_size=1000000):
+    """Stream inter-opinion citations into numpy arrays.
 
-    This pulls all of the inter-opinion citations into memory then passes all of
-    them to igraph as a directed graph.
+    The citations are pulled through a server-side cursor in chunks, so at no
+    point is there more than one chunk of Python objects in memory. Each edge
+    takes 16 bytes in the final arrays.
+
+    :param min_id: Only get citations with IDs above this value.
+    :param chunk_size: The number of edges to pull from the DB at a time.
+    :return: A tuple of arrays of citation IDs (int64), and the citing and
+    cited opinion IDs (int32), where the edge at index i goes from citing[i]
+    to cited[i].
     """
-    g = igraph.Graph(
-        directed=True,
-        edges=list(
-            OpinionsCited.objects.values_list(
-                "citing_opinion", "cited_opinion"
-            )
-        ),
+    qs = OpinionsCited.objects.filter(pk__gt=min_id)
+    count = qs.count()
+    ids = np.empty(count, dtype=np.int64)
+    citing = np.empty(count, dtype=np.int32)
+    cited = np.empty(count, dtype=np.int32)
+    edges = qs.values_list(
+        "pk", "citing_opinion_id", "cited_opinion_id"
+    ).iterator()
+    i = 0
+    while True:
+        chunk = np.array(list(islice(edges, chunk_size)), dtype=np.int64)
+        if len(chunk) == 0:
+            break
+        # The table can grow while we read it. Make room if so.
+        if i + len(chunk) > len(citing):
+            ids = np.resize(ids, i + len(chunk))
+            citing = np.resize(citing, i + len(chunk))
+            cited = np.resize(cited, i + len(chunk))
+        ids[i : i + len(chunk)] = chunk[:, 0]
+        citing[i : i + len(chunk)] = chunk[:, 1]
+        cited[i : i + len(chunk)] = chunk[:, 2]
+        i += len(chunk)
+    return ids[:i], citing[:i], cited[:i]
+
+
+def get_checkpoint_path(result_file_path):
+    return result_file_path + ".checkpoint.npz"
+
+
+def save_checkpoint(path, ids, citing, cited, pr_results):
+    """Save the edges and scores of a pagerank run for incremental updates.
+
+    The file is written to a temporary location then moved into place, so a
+    crash never leaves a partial checkpoint behind.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, ids=ids, citing=citing, cited=cited, scores=pr_results)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """Load a checkpoint saved by save_checkpoint.
+
+    :return: A tuple of the ids, citing, cited and scores arrays.
+    """
+    with np.load(path) as data:
+        return data["ids"], data["citing"], data["cited"], data["scores"]
+
+
+def update_citation_edges(ids, citing, cited):
+    """Bring the edges from a checkpoint up to date with the DB.
+
+    New citations are pulled by ID, so only rows added since the checkpoint
+    are read. Re-running the citation finder deletes an opinion's citations
+    and adds new ones, so if any of the old citations are gone, their IDs
+    are pulled to find out which ones. That's a single indexed column, so
+    it's much cheaper than reading every edge.
+
+    :return: A tuple of the updated ids, citing and cited arrays.
+    """
+    max_id = ids.max() if len(ids) else 0
+    remaining = OpinionsCited.objects.filter(pk__lte=max_id).count()
+    if remaining < len(ids):
+        logger.info(
+            "%s citations were deleted since the checkpoint. Pruning them.",
+            len(ids) - remaining,
+        )
+        existing_ids = np.fromiter(
+            OpinionsCited.objects.filter(pk__lte=max_id)
+            .values_list("pk", flat=True)
+            .iterator(),
+            dtype=np.int64,
+        )
+        keep = np.isin(ids, existing_ids)
+        ids, citing, cited = ids[keep], citing[keep], cited[keep]
+
+    new_ids, new_citing, new_cited = get_citation_edges(min_id=max_id)
+    logger.info("Found %s new citations since the checkpoint.", len(new_ids))
+    return (
+        np.concatenate([ids, new_ids]),
+        np.concatenate([citing, new_citing]),
+        np.concatenate([cited, new_cited]),
     )
-    return g
+
+
+def pagerank(citing, cited, damping=0.85, tol=1e-6, max_iter=200, pr=None):
+    """Compute pagerank for a citation graph using power iteration.
+
+    Every ID between zero and the largest ID in the graph is a node, and the
+    score of nodes that cite nothing is spread evenly across all nodes. This
+    matches what igraph does, so the results are the same as calling
+    igraph.Graph(edges=...).pagerank() on the same edges.
+
+    Each iteration is a single vectorized pass over the edge arrays, so
+    memory use stays at a handful of arrays the size of the graph.
+
+    :param citing: An int32 array of the citing side of each edge.
+    :param cited: An int32 array of the cited side of each edge.
+    :param damping: The damping factor.
+    :param tol: Stop once the L1 change between iterations is below this.
+    The change shrinks by about the damping factor each iteration, so a cold
+    start takes up to around 90 iterations to reach the default, and a warm
+    start from the scores of a slightly different graph takes a few.
+    :param max_iter: Stop after this many iterations, converged or not.
+    :param pr: An optional array of starting scores. Scores for nodes it
+    doesn't cover start at 1/n.
+    :return: A tuple of a numpy array of scores, indexed by opinion ID, and
+    the number of iterations that were done.
+    """
+    if len(citing) == 0:
+        return np.zeros(0), 0
+    n = int(max(citing.max(), cited.max())) + 1
+    out_degree = np.bincount(citing, minlength=n).astype(np.float64)
+    dangling = out_degree == 0
+    # Avoid dividing by zero. Dangling nodes have no edges to weight anyway.
+    out_degree[dangling] = 1
+
+    if pr is None:
+        pr = np.full(n, 1.0 / n)
+    else:
+        start = np.full(n, 1.0 / n)
+        overlap = min(len(pr), n)
+        start[:overlap] = pr[:overlap]
+        pr = start / start.sum()
+
+    for i in range(max_iter):
+        dangling_sum = pr[dangling].sum()
+        new_pr = damping * np.bincount(
+            cited, weights=pr[citing] / out_degree[citing], minlength=n
+        )
+        new_pr += (damping * dangling_sum + 1 - damping) / n
+        new_pr /= new_pr.sum()
+        change = np.abs(new_pr - pr).sum()
+        pr = new_pr
+        if change < tol:
+            logger.info("Pagerank converged after %s iterations.", i + 1)
+            break
+    else:
+        logger.warning(
+            "Pagerank did not converge after %s iterations.", max_iter
+        )
+    return pr, i + 1
 
 
 def make_sorted_pr_file(pr_results, result_file_path):
-    """Convert the pagerank results list into something Solr can use.
+    """Convert the pagerank results array into something Solr can use.
 
     Solr uses a file of the form:
 
@@ -35,48 +179,90 @@ def make_sorted_pr_file(pr_results, result_file_path):
         3=0.397399661529
 
     The IDs must be sorted for performance, and every ID should be listed. This
-    function takes the pagerank results and converts them into a file like this,
-    using the os's `sort` executable for fastest sorting.
+    function pulls the opinion IDs from the DB in order and writes the file
+    straight from the results array.
     """
-    temp_extension = ".tmp"
-    min_value = min(pr_results)
-    with open(result_file_path + temp_extension, "w") as f:
-        # pr_results has a score for every value between 0 and our highest
-        # opinion id that has citations. Write a file that only contains values
-        # matching valid Opinions.
-        for pk in Opinion.objects.values_list("pk", flat=True):
-            try:
-                score = pr_results[pk]
-            except IndexError:
-                # Happens because some items don't have citations, thus aren't
-                # in network.
-                score = min_value
+    opinion_ids = np.fromiter(
+        Opinion.objects.order_by("pk").values_list("pk", flat=True).iterator(),
+        dtype=np.int64,
+    )
+    # pr_results has a score for every value between 0 and our highest
+    # opinion id that has citations. Items above that don't have citations,
+    # so they aren't in the network. Give them the minimum score.
+    min_value = pr_results.min() if len(pr_results) else 0
+    in_network = opinion_ids < len(pr_results)
+    scores = np.full(len(opinion_ids), min_value)
+    scores[in_network] = pr_results[opinion_ids[in_network]]
+    with open(result_file_path, "w") as f:
+        for pk, score in zip(opinion_ids.tolist(), scores.tolist()):
             f.write("{}={}\n".format(pk, score))
 
-    # For improved Solr performance, sort the temp file, creating a new file
-    # without the temp_extension value.
-    os.system(
-        "sort -n %s%s > %s"
-        % (result_file_path, temp_extension, result_file_path)
-    )
-    os.remove(result_file_path + temp_extension)
+
+def get_peak_memory():
+    """Get the peak memory use of this process, in MB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
 
 
 class Command(VerboseCommand):
     args = "<args>"
     help = "Calculate pagerank value for every case"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            default=False,
+            help="Start from the checkpoint saved by the previous run, only "
+            "reading citations that changed since then and starting the "
+            "calculation from the previous scores. Does a full run if there "
+            "is no checkpoint.",
+        )
+
     @staticmethod
-    def do_pagerank():
-        g = make_and_populate_nx_graph()
-        pr_results = g.pagerank()
-        return pr_results
+    def do_pagerank(checkpoint_path=None, incremental=False):
+        """Calculate pagerank, optionally starting from a checkpoint.
+
+        :param checkpoint_path: Where to load and save the checkpoint. If
+        None, no checkpoint is used.
+        :param incremental: Whether to start from the checkpoint, if there is
+        one.
+        :return: A tuple of a numpy array of scores, indexed by opinion ID,
+        and the number of iterations that were done.
+        """
+        previous_scores = None
+        if incremental and checkpoint_path and os.path.exists(checkpoint_path):
+            ids, citing, cited, previous_scores = load_checkpoint(
+                checkpoint_path
+            )
+            ids, citing, cited = update_citation_edges(ids, citing, cited)
+        else:
+            if incremental:
+                logger.warning("No checkpoint found. Doing a full run.")
+            ids, citing, cited = get_citation_edges()
+        logger.info(
+            "Loaded %s citations. Peak memory: %.0fMB",
+            len(citing),
+            get_peak_memory(),
+        )
+        pr_results, iterations = pagerank(citing, cited, pr=previous_scores)
+        if checkpoint_path:
+            save_checkpoint(checkpoint_path, ids, citing, cited, pr_results)
+        return pr_results, iterations
 
     def handle(self, *args, **options):
         super(Command, self).handle(*args, **options)
-        pr_results = self.do_pagerank()
+        start = time.time()
         pr_dest_dir = settings.SOLR_PAGERANK_DEST_DIR
+        pr_results, _ = self.do_pagerank(
+            checkpoint_path=get_checkpoint_path(pr_dest_dir),
+            incremental=options["incremental"],
+        )
         make_sorted_pr_file(pr_results, pr_dest_dir)
+        logger.info(
+            "Pagerank done in %.0f seconds. Peak memory: %.0fMB",
+            time.time() - start,
+            get_peak_memory(),
+        )
         normal_dest_dir = get_data_dir("collection1") + "external_pagerank"
         print(
             "Pagerank file created at %s. Because of distributed servers, "
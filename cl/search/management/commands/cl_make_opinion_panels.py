@@ -0,0 +1,107 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.timezone import now
+
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.search_utils import make_citing_clusters, make_related_clusters
+from cl.search.models import Opinion, OpinionCluster
+
+
+def make_citing_panels(cluster_pks):
+    """Precompute the "Cited By" panels for a chunk of clusters."""
+    a_week = 60 * 60 * 24 * 7
+    citing = make_citing_clusters(cluster_pks)
+    caches["db_cache"].set_many(
+        {"citing:%s" % pk: value for pk, value in citing.items()}, a_week
+    )
+
+
+def make_related_panels(si, cluster_pks, since):
+    """Precompute the "Related Opinions" panels for a chunk of clusters.
+
+    Each panel is a MoreLikeThis query, which is too slow to run for every
+    cluster every night. Only clusters changed since `since` are done here.
+    The rest are made on their first page view after falling out of the
+    cache.
+    """
+    sub_opinions = defaultdict(list)
+    for cluster_id, pk in Opinion.objects.filter(
+        cluster_id__in=cluster_pks, cluster__date_modified__gte=since
+    ).values_list("cluster_id", "pk"):
+        sub_opinions[cluster_id].append(pk)
+
+    related = {}
+    for cluster_pk, sub_opinion_ids in sub_opinions.items():
+        related["mlt-cluster:%s" % cluster_pk] = make_related_clusters(
+            si, sub_opinion_ids
+        )
+    caches["db_cache"].set_many(related, settings.RELATED_CACHE_TIMEOUT)
+
+
+class Command(VerboseCommand):
+    help = (
+        "Precompute the cited by and related opinions panels shown on "
+        "opinion pages, so that page views don't have to query for them. "
+        "Run this nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--panels",
+            nargs="+",
+            choices=["citing", "related"],
+            default=["citing", "related"],
+            help="Which panels to make.",
+        )
+        parser.add_argument(
+            "--start-pk",
+            type=int,
+            default=0,
+            help="The cluster pk to start at. Useful for crashed runs.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="The number of clusters to do at a time.",
+        )
+        parser.add_argument(
+            "--related-days",
+            type=int,
+            default=2,
+            help="Only make related opinions panels for clusters changed "
+            "in this many days. Others are made when they're first viewed.",
+        )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        si = ExtraSolrInterface(settings.SOLR_OPINION_URL, mode="r")
+        related_since = now() - timedelta(days=options["related_days"])
+        last_pk = options["start_pk"]
+        count = 0
+        while True:
+            cluster_pks = list(
+                OpinionCluster.objects.filter(pk__gte=last_pk)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["chunk_size"]]
+            )
+            if not cluster_pks:
+                break
+
+            if "citing" in options["panels"]:
+                make_citing_panels(cluster_pks)
+            if "related" in options["panels"]:
+                make_related_panels(si, cluster_pks, related_since)
+
+            count += len(cluster_pks)
+            last_pk = cluster_pks[-1] + 1
+            logger.info(
+                "Made panels for %s clusters, through pk %s.",
+                count,
+                cluster_pks[-1],
+            )
+        si.conn.http_connection.close()
@@ -7,7 +7,7 @@ from django.conf import settings
 from cl.lib.argparse_types import valid_date_time
 from cl.lib.celery_utils import CeleryThrottle
 from cl.lib.command_utils import VerboseCommand
-from cl.lib.scorched_utils import ExtraSolrInterface
+from cl.lib.scorched_utils import ExtraSolrInterface, bump_solr_index_version
 from cl.lib.timer import print_timing
 from cl.people_db.models import Person
 from cl.search.models import Docket
@@ -212,6 +212,9 @@ class Command(VerboseCommand):
 
         if options.get("do_commit"):
             self.si.commit()
+        if self.solr_url is not None:
+            # Don't serve search results cached from before these changes.
+            bump_solr_index_version(self.solr_url)
 
         if options.get("optimize"):
             self.optimize()
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 09:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0098_abstract_datetime_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='docket',
+            name='ia_json_sha256',
+            field=models.CharField(blank=True, help_text="The SHA256 of the content of the docket JSON that was last uploaded to the Internet Archive, ignoring fields that change on every save. Used to skip uploading dockets that haven't changed.", max_length=64),
+        ),
+    ]
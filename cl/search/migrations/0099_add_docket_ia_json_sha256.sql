@@ -0,0 +1,7 @@
+BEGIN;
+--
+-- Add field ia_json_sha256 to docket
+--
+ALTER TABLE "search_docket" ADD COLUMN "ia_json_sha256" varchar(64) DEFAULT '' NOT NULL;
+ALTER TABLE "search_docket" ALTER COLUMN "ia_json_sha256" DROP DEFAULT;
+COMMIT;
@@ -4,15 +4,18 @@ from typing import Any, Dict, List
 
 from celery.canvas import chain
 from django.contrib.contenttypes.fields import GenericRelation
+from django.core.cache import caches
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Prefetch, Q, QuerySet
+from django.db import models, transaction
+from django.db.models import Prefetch, Q, QuerySet, Sum
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from django.template import loader
 from django.urls import NoReverseMatch, reverse
 from django.utils.encoding import force_str
 from django.utils.text import slugify
 
-from cl.citations.utils import get_citation_depth_between_clusters
+from cl.citations.utils import get_authorities_cache_key
 from cl.custom_filters.templatetags.text_filters import best_case_name
 from cl.lib import fields
 from cl.lib.date_time import midnight_pst
@@ -29,6 +32,7 @@ from cl.lib.search_index_utils import (
 )
 from cl.lib.storage import IncrementingFileSystemStorage
 from cl.lib.string_utils import trunc
+from cl.search.court_registry import get_court, invalidate_court_registry
 
 DOCUMENT_STATUSES = (
     ("Published", "Precedential"),
@@ -533,6 +537,16 @@ class Docket(AbstractDateTimeModel):
         max_length=1000,
         blank=True,
     )
+    ia_json_sha256 = models.CharField(
+        help_text=(
+            "The SHA256 of the content of the docket JSON that was last "
+            "uploaded to the Internet Archive, ignoring fields that change "
+            "on every save. Used to skip uploading dockets that haven't "
+            "changed."
+        ),
+        max_length=64,
+        blank=True,
+    )
     ia_upload_failure_count = models.SmallIntegerField(
         help_text="Number of times the upload to the Internet Archive failed.",
         null=True,
@@ -750,11 +764,12 @@ class Docket(AbstractDateTimeModel):
             out["referredTo"] = self.referred_to_str
 
         # Court
+        court = get_court(self.court_id)
         out.update(
             {
-                "court": self.court.full_name,
+                "court": court.full_name,
                 "court_exact": self.court_id,  # For faceting
-                "court_citation_string": self.court.citation_string,
+                "court_citation_string": court.citation_string,
             }
         )
 
@@ -1240,7 +1255,7 @@ class RECAPDocument(AbstractPacerDocument, AbstractPDF, AbstractDateTimeModel):
         # IDs
         out = {
             "docket_id": docket.pk,
-            "court_id": docket.court.pk,
+            "court_id": docket.court_id,
             "assigned_to_id": getattr(docket.assigned_to, "pk", None),
             "referred_to_id": getattr(docket.referred_to, "pk", None),
         }
@@ -1281,11 +1296,12 @@ class RECAPDocument(AbstractPacerDocument, AbstractPDF, AbstractDateTimeModel):
             out["referredTo"] = docket.referred_to_str
 
         # Court
+        court = get_court(docket.court_id)
         out.update(
             {
-                "court": docket.court.full_name,
+                "court": court.full_name,
                 "court_exact": docket.court_id,  # For faceting
-                "court_citation_string": docket.court.citation_string,
+                "court_citation_string": court.citation_string,
             }
         )
 
@@ -1816,6 +1832,14 @@ class Court(models.Model):
         ordering = ["position"]
 
 
+@receiver([post_save, post_delete], sender=Court)
+def invalidate_court_registry_on_change(sender, **kwargs):
+    invalidate_court_registry()
+    # Other processes can reload before the change is committed, so have them
+    # reload again once it is.
+    transaction.on_commit(invalidate_court_registry)
+
+
 class ClusterCitationQuerySet(models.query.QuerySet):
     """Add filtering on citation strings.
 
@@ -2151,7 +2175,9 @@ class OpinionCluster(AbstractDateTimeModel):
                 caption += ", %s" % citations[0]
 
         if self.docket.court_id != "scotus":
-            court = re.sub(" ", "&nbsp;", self.docket.court.citation_string)
+            court = re.sub(
+                " ", "&nbsp;", get_court(self.docket.court_id).citation_string
+            )
             # Strftime fails before 1900. Do it this way instead.
             year = self.date_filed.isoformat().split("-")[0]
             caption += "&nbsp;({court}&nbsp;{year})".format(
@@ -2209,16 +2235,46 @@ class OpinionCluster(AbstractDateTimeModel):
         appended related to citation counts, for eventual injection into a
         view template.
         The returned list is sorted by that citation count field.
+
+        The depths are summed up in a single query, and cached until the
+        citations of this cluster's opinions are found again. The clusters
+        themselves are always loaded fresh, so changes to them show up at
+        once.
         """
-        authorities_with_data = list(self.authorities)
-        for authority in authorities_with_data:
-            authority.citation_depth = get_citation_depth_between_clusters(
-                citing_cluster_pk=self.pk, cited_cluster_pk=authority.pk
+        if hasattr(self, "_authorities_with_data"):
+            return self._authorities_with_data
+
+        cache = caches["db_cache"]
+        cache_key = get_authorities_cache_key(self.pk)
+        depths = cache.get(cache_key)
+        if depths is None:
+            # Filtering before annotating makes the sum only count the depths
+            # of citations from this cluster.
+            depths = list(
+                OpinionCluster.objects.filter(
+                    sub_opinions__citing_opinions__citing_opinion__cluster=self
+                )
+                .annotate(
+                    citation_depth=Sum("sub_opinions__citing_opinions__depth")
+                )
+                .values_list("pk", "citation_depth")
             )
-
+            a_week = 60 * 60 * 24 * 7
+            cache.set(cache_key, depths, a_week)
+
+        depths = dict(depths)
+        authorities_with_data = list(
+            OpinionCluster.objects.filter(pk__in=depths.keys())
+            .select_related("docket__court")
+            .prefetch_related("citations", "sub_opinions")
+        )
+        for authority in authorities_with_data:
+            authority.citation_depth = depths[authority.pk]
         authorities_with_data.sort(
-            key=lambda x: x.citation_depth, reverse=True
+            key=lambda x: (x.citation_depth, x.citation_count, x.date_filed),
+            reverse=True,
         )
+        self._authorities_with_data = authorities_with_data
         return authorities_with_data
 
     def top_visualizations(self):
@@ -2261,10 +2317,11 @@ class OpinionCluster(AbstractDateTimeModel):
         out = {}
 
         # Court
+        court = get_court(self.docket.court_id)
         court = {
-            "court_id": self.docket.court.pk,
-            "court": self.docket.court.full_name,
-            "court_citation_string": self.docket.court.citation_string,
+            "court_id": court.pk,
+            "court": court.full_name,
+            "court_citation_string": court.citation_string,
             "court_exact": self.docket.court_id,
         }
         out.update(court)
@@ -2308,18 +2365,13 @@ class OpinionCluster(AbstractDateTimeModel):
                 ],
             }
         )
-        try:
-            out["lexisCite"] = str(
-                self.citations.filter(type=Citation.LEXIS)[0]
-            )
-        except IndexError:
-            pass
-        try:
-            out["neutralCite"] = str(
-                self.citations.filter(type=Citation.NEUTRAL)[0]
-            )
-        except IndexError:
-            pass
+        # Typed citations are picked out in Python so that prefetched
+        # citations can be used.
+        for cite in self.citations.all():
+            if cite.type == Citation.LEXIS:
+                out.setdefault("lexisCite", str(cite))
+            elif cite.type == Citation.NEUTRAL:
+                out.setdefault("neutralCite", str(cite))
 
         if self.date_filed is not None:
             out["dateFiled"] = midnight_pst(self.date_filed)
@@ -2674,7 +2726,7 @@ class Opinion(AbstractDateTimeModel):
             "id": self.pk,
             "docket_id": self.cluster.docket.pk,
             "cluster_id": self.cluster.pk,
-            "court_id": self.cluster.docket.court.pk,
+            "court_id": self.cluster.docket.court_id,
         }
 
         # Opinion
@@ -2714,19 +2766,13 @@ class Opinion(AbstractDateTimeModel):
                 "status_exact": self.cluster.get_precedential_status_display(),
             }
         )
-        try:
-            out["lexisCite"] = str(
-                self.cluster.citations.filter(type=Citation.LEXIS)[0]
-            )
-        except IndexError:
-            pass
-
-        try:
-            out["neutralCite"] = str(
-                self.cluster.citations.filter(type=Citation.NEUTRAL)[0]
-            )
-        except IndexError:
-            pass
+        # Typed citations are picked out in Python so that prefetched
+        # citations can be used.
+        for cite in self.cluster.citations.all():
+            if cite.type == Citation.LEXIS:
+                out.setdefault("lexisCite", str(cite))
+            elif cite.type == Citation.NEUTRAL:
+                out.setdefault("neutralCite", str(cite))
 
         if self.cluster.date_filed is not None:
             out["dateFiled"] = midnight_pst(self.cluster.date_filed)
@@ -2755,9 +2801,10 @@ class Opinion(AbstractDateTimeModel):
             )
         out.update(docket)
 
+        court = get_court(self.cluster.docket.court_id)
         court = {
-            "court": self.cluster.docket.court.full_name,
-            "court_citation_string": self.cluster.docket.court.citation_string,
+            "court": court.full_name,
+            "court_citation_string": court.citation_string,
             "court_exact": self.cluster.docket.court_id,  # For faceting
         }
         out.update(court)
@@ -4,12 +4,88 @@ from datetime import timedelta
 import scorched
 from django.apps import apps
 from django.conf import settings
+from django.db.models import Prefetch
 from django.utils.timezone import now
 from scorched.exc import SolrError
 
 from cl.celery_init import app
+from cl.lib.scorched_utils import bump_solr_index_version
 from cl.lib.search_index_utils import InvalidDocumentError
-from cl.search.models import Docket, OpinionCluster, RECAPDocument
+from cl.search.models import Docket, Opinion, OpinionCluster, RECAPDocument
+
+
+def get_opinions_for_search(opinion_pks):
+    """Get opinions with everything Opinion.as_search_dict needs.
+
+    Serializing an opinion touches around a dozen relations. Loading them up
+    front makes the number of queries the same no matter how many opinions
+    are requested.
+
+    :param opinion_pks: An iterable of Opinion PKs.
+    :return: A queryset of Opinion objects.
+    """
+    pk_only = Opinion.objects.only("pk", "cluster_id")
+    return (
+        Opinion.objects.filter(pk__in=opinion_pks)
+        .select_related("author", "cluster__docket")
+        .prefetch_related(
+            Prefetch("opinions_cited", queryset=pk_only),
+            Prefetch("cluster__sub_opinions", queryset=pk_only),
+            "joined_by",
+            "cluster__panel",
+            "cluster__non_participating_judges",
+            "cluster__citations",
+        )
+        .order_by()
+    )
+
+
+def get_clusters_for_search(cluster_pks):
+    """Get clusters with everything OpinionCluster.as_search_list needs.
+
+    :param cluster_pks: An iterable of OpinionCluster PKs.
+    :return: A queryset of OpinionCluster objects.
+    """
+    return (
+        OpinionCluster.objects.filter(pk__in=cluster_pks)
+        .select_related("docket")
+        .prefetch_related(
+            Prefetch(
+                "sub_opinions",
+                queryset=Opinion.objects.select_related("author"),
+            ),
+            Prefetch(
+                "sub_opinions__opinions_cited",
+                queryset=Opinion.objects.only("pk"),
+            ),
+            "sub_opinions__joined_by",
+            "panel",
+            "non_participating_judges",
+            "citations",
+        )
+        .order_by()
+    )
+
+
+def opinions_as_search_dicts(opinion_pks):
+    """Serialize a batch of opinions for Solr in a fixed number of queries.
+
+    :param opinion_pks: An iterable of Opinion PKs.
+    :return: A list of dicts, as made by Opinion.as_search_dict.
+    """
+    return [o.as_search_dict() for o in get_opinions_for_search(opinion_pks)]
+
+
+def clusters_as_search_lists(cluster_pks):
+    """Serialize a batch of clusters for Solr in a fixed number of queries.
+
+    :param cluster_pks: An iterable of OpinionCluster PKs.
+    :return: A list of dicts, as made by OpinionCluster.as_search_list.
+    """
+    search_dicts = []
+    for cluster in get_clusters_for_search(cluster_pks):
+        search_dicts.extend(cluster.as_search_list())
+    return search_dicts
 
 
 @app.task
@@ -23,7 +99,12 @@ def add_items_to_solr(item_pks, app_label, force_commit=False):
     """
     search_dicts = []
     model = apps.get_model(app_label)
-    items = model.objects.filter(pk__in=item_pks).order_by()
+    if model == Opinion:
+        items = get_opinions_for_search(item_pks)
+    elif model == OpinionCluster:
+        items = get_clusters_for_search(item_pks)
+    else:
+        items = model.objects.filter(pk__in=item_pks).order_by()
     for item in items:
         try:
             if model in [OpinionCluster, Docket]:
@@ -47,6 +128,7 @@ def add_items_to_solr(item_pks, app_label, force_commit=False):
     except (socket.error, SolrError) as exc:
         add_items_to_solr.retry(exc=exc, countdown=30)
     else:
+        bump_solr_index_version(settings.SOLR_URLS[app_label])
         # Mark dockets as updated if needed
         if model == Docket:
             items.update(date_modified=now(), date_last_index=now())
@@ -101,6 +183,7 @@ def add_or_update_recap_docket(
         except SolrError as exc:
             add_or_update_recap_docket.retry(exc=exc, countdown=30)
         else:
+            bump_solr_index_version(settings.SOLR_RECAP_URL)
             d.date_last_index = now()
             d.save()
 
@@ -134,6 +217,8 @@ def add_docket_to_solr_by_rds(item_pks, force_commit=False):
         si.conn.http_connection.close()
     except SolrError as exc:
         add_docket_to_solr_by_rds.retry(exc=exc, countdown=30)
+    else:
+        bump_solr_index_version(settings.SOLR_RECAP_URL)
 
 
 @app.task
@@ -146,3 +231,5 @@ def delete_items(items, app_label, force_commit=False):
         si.conn.http_connection.close()
     except SolrError as exc:
         delete_items.retry(exc=exc, countdown=30)
+    else:
+        bump_solr_index_version(settings.SOLR_URLS[app_label])
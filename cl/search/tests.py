@@ -1,15 +1,19 @@
 import io
 import os
+import tempfile
 import time
 from datetime import date
+from unittest import mock
 
+import numpy as np
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
 from django.core.management import call_command
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 from django.http import HttpRequest
 from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from lxml import etree, html
 from rest_framework.status import HTTP_200_OK
@@ -17,15 +21,27 @@ from selenium.common.exceptions import NoSuchElementException
 from selenium.webdriver.common.by import By
 from timeout_decorator import timeout_decorator
 
-from cl.lib.search_utils import cleanup_main_query
+from cl.lib.redis_utils import make_redis_interface
+from cl.lib.scorched_utils import ExtraSolrSearch, bump_solr_index_version
+from cl.lib.search_utils import cleanup_main_query, merge_form_with_courts
 from cl.lib.solr_core_admin import get_data_dir
 from cl.lib.test_helpers import (
     EmptySolrTestCase,
     IndexedSolrTestCase,
     SolrTestCase,
 )
+from cl.search.court_registry import (
+    COURT_REGISTRY_CHECK_INTERVAL,
+    COURT_REGISTRY_VERSION_KEY,
+    get_court,
+    get_court_registry,
+)
 from cl.search.feeds import JurisdictionFeed
-from cl.search.management.commands.cl_calculate_pagerank import Command
+from cl.search.forms import SearchForm
+from cl.search.management.commands.cl_calculate_pagerank import (
+    Command,
+    pagerank,
+)
 from cl.search.models import (
     DOCUMENT_STATUSES,
     SEARCH_TYPES,
@@ -35,10 +51,15 @@ from cl.search.models import (
     DocketEntry,
     Opinion,
     OpinionCluster,
+    OpinionsCited,
     RECAPDocument,
     sort_cites,
 )
-from cl.search.tasks import add_docket_to_solr_by_rds
+from cl.search.tasks import (
+    add_docket_to_solr_by_rds,
+    clusters_as_search_lists,
+    opinions_as_search_dicts,
+)
 from cl.search.views import do_search
 from cl.tests.base import SELENIUM_TIMEOUT, BaseSeleniumTest
 
@@ -741,6 +762,68 @@ class RelatedSearchTest(IndexedSolrTestCase):
         self.client.logout()
 
 
+class SearchResultCacheTest(IndexedSolrTestCase):
+    def search(self):
+        return self.client.get(reverse("show_results"), {"q": "supreme"})
+
+    def test_repeated_searches_are_cached(self) -> None:
+        """Are identical searches answered from the cache until the index
+        changes?
+        """
+        with mock.patch.object(
+            ExtraSolrSearch,
+            "execute_uncached",
+            autospec=True,
+            side_effect=ExtraSolrSearch.execute_uncached,
+        ) as execute:
+            r = self.search()
+            self.assertIn("Honda", r.content.decode())
+            solr_queries = execute.call_count
+            self.assertGreater(solr_queries, 0)
+
+            r = self.search()
+            self.assertIn("Honda", r.content.decode())
+            self.assertEqual(execute.call_count, solr_queries)
+
+            bump_solr_index_version(settings.SOLR_OPINION_URL)
+            r = self.search()
+            self.assertIn("Honda", r.content.decode())
+            self.assertEqual(execute.call_count, solr_queries * 2)
+
+
+class SearchPaginationTest(IndexedSolrTestCase):
+    def assert_one_solr_query(self, path, params):
+        with mock.patch.object(
+            ExtraSolrSearch,
+            "execute_uncached",
+            autospec=True,
+            side_effect=ExtraSolrSearch.execute_uncached,
+        ) as execute:
+            r = self.client.get(path, params)
+        self.assertEqual(r.status_code, HTTP_200_OK)
+        self.assertEqual(execute.call_count, 1)
+        return r
+
+    def test_search_page_takes_one_query(self) -> None:
+        """Do the results and the count of a search page come from one Solr
+        query?
+        """
+        r = self.assert_one_solr_query(reverse("show_results"), {"q": "*"})
+        self.assertIn(
+            "%s Opinions" % self.expected_num_results_opinion,
+            r.content.decode(),
+        )
+
+    def test_search_api_takes_one_query(self) -> None:
+        """Do the results and the count from the search API come from one
+        Solr query?
+        """
+        r = self.assert_one_solr_query(
+            reverse("search-list", kwargs={"version": "v3"}), {"q": "*"}
+        )
+        self.assertEqual(r.data["count"], self.expected_num_results_opinion)
+
+
 class GroupedSearchTest(EmptySolrTestCase):
     fixtures = ["opinions-issue-550.json"]
 
@@ -1069,7 +1152,7 @@ class PagerankTest(TestCase):
         # calculate pagerank of these 3 document
         comm = Command()
         self.verbosity = 1
-        pr_results = comm.do_pagerank()
+        pr_results, _ = comm.do_pagerank()
 
         # Verify that whether the answer is correct, based on calculations in
         # Gephi
@@ -1085,6 +1168,149 @@ class PagerankTest(TestCase):
                 "%s" % (key, pr_results[key], answers[key]),
             )
 
+    def test_pagerank_function(self):
+        """Does pagerank() converge to the Gephi answers without the DB?"""
+        citing = np.array([1, 1, 2, 3], dtype=np.int32)
+        cited = np.array([2, 3, 3, 1], dtype=np.int32)
+        pr_results, _ = pagerank(citing, cited)
+        for key, value in {1: 0.3693, 2: 0.2046, 3: 0.3785}.items():
+            self.assertAlmostEqual(pr_results[key], value, places=4)
+        self.assertAlmostEqual(pr_results.sum(), 1)
+
+    def test_incremental_pagerank(self):
+        """Does an incremental run pick up changed citations and give the
+        same answers as a full run? Does it start from the previous scores?
+        """
+        comm = Command()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint_path = os.path.join(tmp_dir, "pagerank.npz")
+            _, full_iterations = comm.do_pagerank(
+                checkpoint_path=checkpoint_path
+            )
+            # Nothing changed, so the previous scores have converged already.
+            _, iterations = comm.do_pagerank(
+                checkpoint_path=checkpoint_path, incremental=True
+            )
+            self.assertGreater(full_iterations, 2)
+            self.assertLessEqual(iterations, 2)
+
+            # Change the network, then compare both ways of calculating.
+            OpinionsCited.objects.filter(
+                citing_opinion_id=1, cited_opinion_id=2
+            ).delete()
+            OpinionsCited.objects.create(
+                citing_opinion_id=2, cited_opinion_id=1
+            )
+            incremental_results, _ = comm.do_pagerank(
+                checkpoint_path=checkpoint_path, incremental=True
+            )
+        full_results, _ = comm.do_pagerank()
+        self.assertEqual(len(incremental_results), len(full_results))
+        for key in range(len(full_results)):
+            self.assertAlmostEqual(
+                incremental_results[key], full_results[key], places=6
+            )
+
+
+class BatchSearchDictTest(TestCase):
+    fixtures = ["test_objects_search.json", "judge_judy.json"]
+
+    @staticmethod
+    def normalize(search_dicts):
+        """Sort the search dicts and their lists so they can be compared."""
+        return sorted(
+            (
+                {
+                    k: sorted(v) if isinstance(v, list) else v
+                    for k, v in d.items()
+                }
+                for d in search_dicts
+            ),
+            key=lambda d: d["id"],
+        )
+
+    def count_queries(self, f, pks):
+        # Load the courts first, so that it isn't counted.
+        get_court_registry()
+        with CaptureQueriesContext(connection) as queries:
+            f(pks)
+        return len(queries)
+
+    def test_opinion_batches_match_and_use_constant_queries(self) -> None:
+        """Are batched opinions the same as single ones, made in the same
+        number of queries no matter how many there are?
+        """
+        pks = list(Opinion.objects.values_list("pk", flat=True))
+        self.assertEqual(
+            self.normalize(opinions_as_search_dicts(pks)),
+            self.normalize(
+                o.as_search_dict() for o in Opinion.objects.filter(pk__in=pks)
+            ),
+        )
+        self.assertEqual(
+            self.count_queries(opinions_as_search_dicts, pks[:1]),
+            self.count_queries(opinions_as_search_dicts, pks),
+        )
+
+    def test_cluster_batches_match_and_use_constant_queries(self) -> None:
+        """Are batched clusters the same as single ones, made in the same
+        number of queries no matter how many there are?
+        """
+        pks = list(OpinionCluster.objects.values_list("pk", flat=True))
+        expected = []
+        for cluster in OpinionCluster.objects.filter(pk__in=pks):
+            expected.extend(cluster.as_search_list())
+        self.assertEqual(
+            self.normalize(clusters_as_search_lists(pks)),
+            self.normalize(expected),
+        )
+        self.assertEqual(
+            self.count_queries(clusters_as_search_lists, pks[:1]),
+            self.count_queries(clusters_as_search_lists, pks),
+        )
+
+
+class CourtRegistryTest(TestCase):
+    fixtures = ["test_court.json"]
+
+    def test_registry_is_reused_until_a_court_changes(self) -> None:
+        """Is the court table only queried again after a court is saved?"""
+        registry = get_court_registry()
+        self.assertEqual(
+            registry.get("test").full_name, "Testing Supreme Court"
+        )
+        with self.assertNumQueries(0):
+            self.assertIs(get_court_registry(), registry)
+
+        court = Court.objects.get(pk="test")
+        court.full_name = "Renamed Court"
+        court.save()
+        self.assertIsNot(get_court_registry(), registry)
+        self.assertEqual(get_court("test").full_name, "Renamed Court")
+
+    def test_registry_reloads_when_the_version_changes(self) -> None:
+        """Is the registry reloaded when another process saves a court?"""
+        registry = get_court_registry()
+        r = make_redis_interface("CACHE")
+        r.incr(COURT_REGISTRY_VERSION_KEY)
+        # Pretend it's been a while since the version was checked.
+        with mock.patch(
+            "cl.search.court_registry.time.monotonic",
+            return_value=time.monotonic() + COURT_REGISTRY_CHECK_INTERVAL,
+        ):
+            self.assertIsNot(get_court_registry(), registry)
+
+    def test_merging_form_does_not_change_registry(self) -> None:
+        """Are the checkboxes set on copies of the registry's courts?"""
+        registry = get_court_registry()
+        court_tabs, _, _ = merge_form_with_courts(
+            registry.in_use, SearchForm({"court_test": True})
+        )
+        test_court, ca1 = court_tabs["federal"]
+        self.assertTrue(test_court.checked)
+        self.assertFalse(ca1.checked)
+        self.assertFalse(hasattr(registry.get("test"), "checked"))
+
 
 class OpinionSearchFunctionalTest(BaseSeleniumTest):
     """
@@ -9,7 +9,7 @@ from django.contrib import messages
 from django.contrib.auth.models import User
 from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
-from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.paginator import EmptyPage, PageNotAnInteger
 from django.db.models import Count, Sum
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import HttpResponseRedirect, get_object_or_404, render
@@ -26,7 +26,9 @@ from cl.custom_filters.templatetags.text_filters import naturalduration
 from cl.lib.bot_detector import is_bot
 from cl.lib.ratelimiter import ratelimit_if_not_whitelisted
 from cl.lib.redis_utils import make_redis_interface
+from cl.lib.scorched_utils import SolrPaginator
 from cl.lib.search_utils import (
+    SEARCH_RESULT_CACHE_TIMEOUTS,
     add_depth_counts,
     build_main_query,
     get_mlt_query,
@@ -38,6 +40,7 @@ from cl.lib.search_utils import (
     regroup_snippets,
 )
 from cl.search.constants import RELATED_PATTERN
+from cl.search.court_registry import get_court_registry
 from cl.search.forms import SearchForm, _clean_form
 from cl.search.models import SEARCH_TYPES, Court, Opinion, OpinionCluster
 from cl.stats.models import Stat
@@ -74,7 +77,7 @@ def paginate_cached_solr_results(get_params, cd, results, rows, cache_key):
     if cd["type"] in [SEARCH_TYPES.RECAP, SEARCH_TYPES.DOCKETS]:
         rows = 10
 
-    paginator = Paginator(results, rows)
+    paginator = SolrPaginator(results, rows)
     try:
         paged_results = paginator.page(page)
     except PageNotAnInteger:
@@ -117,7 +120,7 @@ def do_search(
     error = False
     paged_results = None
     cited_cluster = None
-    courts = Court.objects.filter(in_use=True)
+    courts = get_court_registry().in_use
     related_cluster_pks = None
 
     # Add additional or overridden GET parameters
@@ -165,6 +168,7 @@ def do_search(
                 si.conn.http_connection.close()
 
             si.conn.http_connection.close()
+            results = results.cache(SEARCH_RESULT_CACHE_TIMEOUTS[cd["type"]])
 
             paged_results = paginate_cached_solr_results(
                 get_params, cd, results, rows, cache_key
@@ -199,13 +203,14 @@ def do_search(
         ]:
             # Exclude BAP courts from RECAP, Dockets, and People
             panel_courts = Court.FEDERAL_BANKRUPTCY_PANEL
-            courts = courts.exclude(jurisdiction=panel_courts)
+            courts = [c for c in courts if c.jurisdiction != panel_courts]
         elif cd["type"] in [SEARCH_TYPES.RECAP, SEARCH_TYPES.DOCKETS]:
             # Only use courts with pacer_court_id and no end date in RECAP
-            courts = courts.filter(
-                pacer_court_id__isnull=False,
-                end_date__isnull=True,
-            )
+            courts = [
+                c
+                for c in courts
+                if c.pacer_court_id is not None and c.end_date is None
+            ]
     else:
         error = True
 
@@ -474,12 +479,16 @@ def advanced(request: HttpRequest) -> HttpResponse:
         render_dict["search_form"] = SearchForm({"type": obj_type})
         return render(request, "advanced.html", render_dict)
     else:
-        courts = Court.objects.filter(in_use=True)
+        courts = get_court_registry().in_use
         if request.path == reverse("advanced_r"):
             obj_type = SEARCH_TYPES.RECAP
-            courts = courts.filter(
-                pacer_court_id__isnull=False, end_date__isnull=True
-            ).exclude(jurisdiction=Court.FEDERAL_BANKRUPTCY_PANEL)
+            courts = [
+                c
+                for c in courts
+                if c.pacer_court_id is not None
+                and c.end_date is None
+                and c.jurisdiction != Court.FEDERAL_BANKRUPTCY_PANEL
+            ]
         elif request.path == reverse("advanced_oa"):
             obj_type = SEARCH_TYPES.ORAL_ARGUMENT
         elif request.path == reverse("advanced_p"):
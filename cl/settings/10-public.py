@@ -186,6 +186,7 @@ REDIS_DATABASES = {
     "CACHE": 1,
     "STATS": 2,
     "ALERTS": 3,
+    "TIERED_CACHE": 4,
 }
 
 ##########
@@ -240,12 +241,33 @@ CACHES = {
         "LOCATION": "%s:%s" % (REDIS_HOST, REDIS_PORT),
         "OPTIONS": {"DB": REDIS_DATABASES["CACHE"], "MAX_ENTRIES": 1e5},
     },
+    # Named for the DatabaseCache it replaced. It holds sitemaps and the
+    # precomputed opinion panels, which are read often and are slow to make.
+    # See cl.lib.cache_backends for the options.
     "db_cache": {
-        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
-        "LOCATION": "django_cache",
-        "OPTIONS": {"MAX_ENTRIES": 2.5e5},
+        "BACKEND": "cl.lib.cache_backends.TieredCache",
+        "OPTIONS": {
+            "STORAGE": "db_cache_storage",
+            "MAX_ENTRIES": 1000,
+            "LOCAL_TIMEOUT": 60,
+            "LOCAL_MAX_VALUE_SIZE": 64 * 1024,
+            "COMPRESS_MIN_LENGTH": 1024,
+        },
+    },
+    "db_cache_storage": {
+        "BACKEND": "redis_cache.RedisCache",
+        "LOCATION": "%s:%s" % (REDIS_HOST, REDIS_PORT),
+        "OPTIONS": {"DB": REDIS_DATABASES["TIERED_CACHE"]},
     },
 }
+if "test" in sys.argv:
+    # Tests roll back the DB after each one, so keep the values there, and
+    # don't keep local copies that would outlive the rollback.
+    CACHES["db_cache"]["OPTIONS"]["MAX_ENTRIES"] = 0
+    CACHES["db_cache_storage"] = {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+    }
 # This sets Redis as the session backend. This is often advised against, but we
 # have pretty good persistency in Redis, so it's fairly well backed up.
 SESSION_ENGINE = "django.contrib.sessions.backends.cache"
@@ -279,6 +301,9 @@ STATIC_ROOT = os.path.join(INSTALL_ROOT, "cl/assets/static/")
 # Where should the bulk data be stored?
 BULK_DATA_DIR = os.path.join(INSTALL_ROOT, "cl/assets/media/bulk-data/")
 
+# Where cl_make_sitemaps writes the sitemaps
+SITEMAPS_DIR = os.path.join(INSTALL_ROOT, "cl/assets/media/sitemaps/")
+
 
 #####################
 # Payments & Prices #
@@ -1,20 +1,42 @@
+import gzip
 import hashlib
+import json
+import logging
+import os
 from calendar import timegm
 from datetime import datetime
-from typing import Dict, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
+from django.conf import settings
 from django.contrib.sitemaps import Sitemap
+from django.contrib.sitemaps import views as sitemaps_views
 from django.contrib.sitemaps.views import x_robots_tag
+from django.contrib.sites.models import Site
 from django.contrib.sites.shortcuts import get_current_site
 from django.core.cache import caches
 from django.core.paginator import EmptyPage, PageNotAnInteger
-from django.http import Http404, HttpRequest, HttpResponse
+from django.db.models import QuerySet
+from django.http import FileResponse, Http404, HttpRequest, HttpResponse
+from django.template import loader
 from django.template.response import TemplateResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django.utils.encoding import force_bytes, iri_to_uri
 from django.utils.http import http_date
+from django.views.decorators.cache import cache_page
 
 from cl.lib.ratelimiter import ratelimiter_all_2_per_m
 
+logger = logging.getLogger(__name__)
+
+# The sitemaps written by cl_make_sitemaps. Sections are split into pages the
+# same way the views split them, so a file can stand in for any page.
+SITEMAP_INDEX_FILE = "sitemap.xml.gz"
+SITEMAP_MANIFEST_FILE = "manifest.json"
+
+# How many rows to read from the DB at a time when writing sitemaps.
+SITEMAP_CHUNK_SIZE = 5_000
+
 
 def make_cache_key(request: HttpRequest, section: str) -> str:
     """Make a cache key for a URL
@@ -57,6 +79,14 @@ def cached_sitemap(
     site = sitemaps[section]
     page = request.GET.get("p", 1)
 
+    page_str = str(page)
+    if page_str.isdigit():
+        response = serve_sitemap_file(
+            request, make_sitemap_path(section, int(page_str))
+        )
+        if response is not None:
+            return response
+
     cache = caches["db_cache"]
     cache_key = make_cache_key(request, section)
     urls = cache.get(cache_key, [])
@@ -104,3 +134,328 @@ def cached_sitemap(
         # ConditionalGetMiddleware is able to send 304 NOT MODIFIED
         response["Last-Modified"] = http_date(timegm(lastmod))
     return response
+
+
+_cached_index = cache_page(60 * 60 * 24 * 14, cache="db_cache")(
+    sitemaps_views.index
+)
+
+
+@x_robots_tag
+def cached_sitemap_index(
+    request: HttpRequest,
+    sitemaps: Dict[str, Sitemap],
+    sitemap_url_name: str = "sitemaps",
+) -> HttpResponse:
+    """Serve the sitemap index written by cl_make_sitemaps, or make one from
+    the DB if it hasn't been written.
+    """
+    response = serve_sitemap_file(
+        request, os.path.join(settings.SITEMAPS_DIR, SITEMAP_INDEX_FILE)
+    )
+    if response is not None:
+        return response
+    return _cached_index(
+        request, sitemaps=sitemaps, sitemap_url_name=sitemap_url_name
+    )
+
+
+def serve_sitemap_file(
+    request: HttpRequest, path: str
+) -> Optional[HttpResponse]:
+    """Serve a gzipped sitemap file, compressed if the client accepts it.
+
+    :param request: The HttpRequest from the client
+    :param path: The path to the file
+    :return: An HttpResponse, or None if there's no file at path.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    mtime = os.fstat(f.fileno()).st_mtime
+
+    if "gzip" in request.META.get("HTTP_ACCEPT_ENCODING", ""):
+        response = FileResponse(f, content_type="application/xml")
+        response["Content-Encoding"] = "gzip"
+    else:
+        with f:
+            content = gzip.decompress(f.read())
+        response = HttpResponse(content, content_type="application/xml")
+    patch_vary_headers(response, ("Accept-Encoding",))
+    response["Last-Modified"] = http_date(mtime)
+    return response
+
+
+def make_sitemap_path(section: str, page: int) -> str:
+    return os.path.join(
+        settings.SITEMAPS_DIR, "sitemap-%s-%s.xml.gz" % (section, page)
+    )
+
+
+def iter_keyset(
+    qs: QuerySet, get_pk=lambda row: row.pk, chunk_size=SITEMAP_CHUNK_SIZE
+) -> Iterator[Any]:
+    """Iterate over a queryset ordered by PK, a chunk at a time.
+
+    Each chunk starts after the last PK of the one before, so it's as fast
+    to get the last chunk as the first, unlike with OFFSET.
+
+    :param qs: The queryset, ordered by pk.
+    :param get_pk: A function that gets the PK of a row of the queryset.
+    :param chunk_size: The number of rows to get in each query.
+    """
+    last_pk = None
+    while True:
+        chunk_qs = qs if last_pk is None else qs.filter(pk__gt=last_pk)
+        rows = list(chunk_qs[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = get_pk(rows[-1])
+
+
+def plan_pages(
+    rows: Iterator[Tuple[Any, ...]],
+    limit: int,
+    old_pages: List[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
+    """Split the rows of a sitemap into pages.
+
+    Pages end where they ended the last time the sitemap was written, so rows
+    that are added or deleted only change the pages they're on. A page that
+    would get more than limit rows is split, and the pages after it are
+    split again from scratch. The last page keeps growing until it's full.
+
+    :param rows: (pk, date_modified) tuples of each item, in PK order. They
+    can have a third value: a string of the item's attributes that can change
+    without changing date_modified, like its priority.
+    :param limit: The most items in a page.
+    :param old_pages: The pages from the last time the sitemap was written.
+    :return: A list of dicts describing each page: the first and last PKs,
+    the number of items, when the latest of them was modified, and a hash of
+    their other attributes, if there are any. If any of them change, the
+    page has to be written again.
+    """
+    last_pks = [p["last_pk"] for p in old_pages[:-1]]
+    pages = []
+    page = None
+    attrs_hash = None
+
+    def finish_page() -> None:
+        if attrs_hash is not None:
+            page["attrs"] = attrs_hash.hexdigest()
+        pages.append(page)
+
+    for pk, date_modified, *attrs in rows:
+        while last_pks and pk > last_pks[0]:
+            if page is not None:
+                finish_page()
+                page = None
+            last_pks.pop(0)
+        if page is None:
+            page = {"first_pk": pk, "count": 0, "lastmod": None}
+            attrs_hash = hashlib.md5() if attrs else None
+        page["last_pk"] = pk
+        page["count"] += 1
+        if date_modified is not None:
+            lastmod = date_modified.isoformat()
+            if page["lastmod"] is None or lastmod > page["lastmod"]:
+                page["lastmod"] = lastmod
+        if attrs_hash is not None:
+            attrs_hash.update(force_bytes("%s:%s\n" % (pk, attrs[0])))
+        if page["count"] == limit:
+            finish_page()
+            page = None
+            if last_pks and pk == last_pks[0]:
+                last_pks.pop(0)
+            else:
+                last_pks = []
+    if page is not None:
+        finish_page()
+    return pages
+
+
+def get_sitemap_attr(site: Sitemap, name: str, item: Any) -> Any:
+    attr = getattr(site, name, None)
+    if callable(attr):
+        return attr(item)
+    return attr
+
+
+def iter_sitemap_rows(site: Sitemap, items: QuerySet) -> Iterator[Tuple]:
+    """Get the rows plan_pages needs for the items of a sitemap.
+
+    Sitemaps can list the fields their priority and changefreq depend on in
+    rendered_fields. Those fields can change without changing date_modified,
+    as view_count does, so the attributes they give are added to each row.
+
+    :param site: The Sitemap.
+    :param items: The items of the sitemap.
+    :return: An iterator of (pk, date_modified) or (pk, date_modified,
+    attributes) tuples.
+    """
+    fields = list(getattr(site, "rendered_fields", []))
+    rows = iter_keyset(
+        items.values_list("pk", "date_modified", *fields),
+        get_pk=lambda row: row[0],
+    )
+    if not fields:
+        yield from rows
+        return
+    for pk, date_modified, *values in rows:
+        item = items.model(pk=pk, **dict(zip(fields, values)))
+        attrs = "%s:%s" % (
+            get_sitemap_attr(site, "priority", item),
+            get_sitemap_attr(site, "changefreq", item),
+        )
+        yield pk, date_modified, attrs
+
+
+def make_url_info(
+    site: Sitemap, item: Any, protocol: str, domain: str
+) -> Dict[str, Any]:
+    """Make the dict the sitemap template needs for an item, like
+    Sitemap.get_urls does.
+    """
+    priority = get_sitemap_attr(site, "priority", item)
+    return {
+        "item": item,
+        "location": "%s://%s%s"
+        % (protocol, domain, get_sitemap_attr(site, "location", item)),
+        "lastmod": get_sitemap_attr(site, "lastmod", item),
+        "changefreq": get_sitemap_attr(site, "changefreq", item),
+        "priority": str(priority if priority is not None else ""),
+    }
+
+
+def write_gzip_file(path: str, content: str) -> None:
+    """Write a file, moving it into place once it's done so the views never
+    serve a partial one.
+    """
+    tmp_path = "%s.tmp" % path
+    with gzip.open(tmp_path, "wb") as f:
+        f.write(content.encode())
+    os.replace(tmp_path, path)
+
+
+def write_sitemap_section(
+    section: str,
+    site: Sitemap,
+    old_pages: List[Dict[str, Any]],
+    protocol: str,
+    domain: str,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """Write the pages of a sitemap section that have changed.
+
+    :param section: The name of the section.
+    :param site: The Sitemap.
+    :param old_pages: The pages from the last time the section was written.
+    :param protocol: The protocol of the URLs.
+    :param domain: The domain of the URLs.
+    :return: A tuple of the pages of the section, and how many were written.
+    """
+    items = site.items()
+    limit = site.limit
+    if not isinstance(items, QuerySet):
+        # A short list of pages. Write them all.
+        pages = []
+        for page_number in site.paginator.page_range:
+            urls = [
+                make_url_info(site, item, protocol, domain)
+                for item in site.paginator.page(page_number).object_list
+            ]
+            write_gzip_file(
+                make_sitemap_path(section, page_number),
+                loader.render_to_string("sitemap.xml", {"urlset": urls}),
+            )
+            pages.append({"count": len(urls)})
+        return pages, len(pages)
+
+    pages = plan_pages(iter_sitemap_rows(site, items), limit, old_pages)
+    written = 0
+    for page_number, page in enumerate(pages, start=1):
+        path = make_sitemap_path(section, page_number)
+        old_page = (
+            old_pages[page_number - 1]
+            if page_number <= len(old_pages)
+            else None
+        )
+        if page == old_page and os.path.exists(path):
+            continue
+        page_items = items.filter(
+            pk__gte=page["first_pk"], pk__lte=page["last_pk"]
+        )
+        urls = [
+            make_url_info(site, item, protocol, domain)
+            for item in iter_keyset(page_items)
+        ]
+        write_gzip_file(
+            path, loader.render_to_string("sitemap.xml", {"urlset": urls})
+        )
+        written += 1
+    return pages, written
+
+
+def write_sitemaps(sitemaps: Dict[str, Sitemap]) -> None:
+    """Write every sitemap section and the sitemap index to SITEMAPS_DIR.
+
+    Pages are only written again if the rows in them have changed since the
+    last time this was run, as recorded in the manifest.
+
+    :param sitemaps: The sitemaps, by section, as passed to the views.
+    """
+    os.makedirs(settings.SITEMAPS_DIR, exist_ok=True)
+    manifest_path = os.path.join(settings.SITEMAPS_DIR, SITEMAP_MANIFEST_FILE)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+
+    protocol = "https"
+    domain = Site.objects.get_current().domain
+    locations = []
+    new_manifest = {}
+    for section, site in sitemaps.items():
+        if callable(site):
+            site = site()
+        old_pages = manifest.get(section, [])
+        pages, written = write_sitemap_section(
+            section, site, old_pages, protocol, domain
+        )
+        # Remove pages that are past the end of the section now.
+        for page_number in range(len(pages) + 1, len(old_pages) + 1):
+            try:
+                os.remove(make_sitemap_path(section, page_number))
+            except FileNotFoundError:
+                pass
+        new_manifest[section] = pages
+        logger.info(
+            "Wrote %s of %s sitemap pages for %s.",
+            written,
+            len(pages),
+            section,
+        )
+
+        # Like the index view, the first page has no page number.
+        location = "%s://%s%s" % (
+            protocol,
+            domain,
+            reverse("sitemaps", kwargs={"section": section}),
+        )
+        locations.append(location)
+        for page_number in range(2, len(pages) + 1):
+            locations.append("%s?p=%s" % (location, page_number))
+
+    write_gzip_file(
+        os.path.join(settings.SITEMAPS_DIR, SITEMAP_INDEX_FILE),
+        loader.render_to_string(
+            "sitemap_index.xml",
+            {"sitemaps": locations},
+        ),
+    )
+    tmp_path = "%s.tmp" % manifest_path
+    with open(tmp_path, "w") as f:
+        json.dump(new_manifest, f)
+    os.replace(tmp_path, manifest_path)
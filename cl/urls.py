@@ -2,8 +2,6 @@ from django.conf import settings
 from django.conf.urls import include, url
 from django.conf.urls.static import static
 from django.contrib import admin
-from django.contrib.sitemaps import views as sitemaps_views
-from django.views.decorators.cache import cache_page
 from django.views.generic import RedirectView
 
 from cl.audio.sitemap import AudioSitemap
@@ -12,7 +10,7 @@ from cl.people_db.sitemap import PersonSitemap
 from cl.search.models import SEARCH_TYPES
 from cl.simple_pages.sitemap import SimpleSitemap
 from cl.simple_pages.views import serve_static_file
-from cl.sitemap import cached_sitemap
+from cl.sitemap import cached_sitemap, cached_sitemap_index
 from cl.visualizations.sitemap import VizSitemap
 
 sitemaps = {
@@ -42,7 +40,7 @@ urlpatterns = [
     # Sitemaps
     url(
         r"^sitemap\.xml$",
-        cache_page(60 * 60 * 24 * 14, cache="db_cache")(sitemaps_views.index),
+        cached_sitemap_index,
         {"sitemaps": sitemaps, "sitemap_url_name": "sitemaps"},
     ),
     url(
@@ -0,0 +1,121 @@
+"""An in-memory index of the citations between Supreme Court clusters.
+
+Building a SCOTUSMap walks the citations of thousands of clusters. Querying
+the DB for each of them made big maps time out, so the citations are
+instead loaded ahead of time by the cl_make_citation_index command. The index
+is kept in the cache, and each process loads it into memory and keeps it until
+a newer one is made.
+
+Citations made since the index was built are missing from it until the next
+run of the command.
+"""
+import time
+from array import array
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional
+
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from cl.search.models import OpinionsCited
+
+CITATION_INDEX_CACHE_KEY = "scotus-citation-index"
+CITATION_INDEX_DATE_KEY = "scotus-citation-index:date-built"
+
+# How long a process uses its index before checking for a newer one.
+CITATION_INDEX_CHECK_INTERVAL = 5 * 60
+
+_index = None
+_last_checked = 0.0
+
+
+class CitationIndex(object):
+    """The Supreme Court clusters that each Supreme Court cluster cites.
+
+    For each citing cluster, the cited clusters are kept in one array of
+    (date_filed ordinal, cluster ID) pairs, in date order, which is much
+    smaller than a list of tuples.
+
+    :param authorities: A dict of citing cluster IDs to arrays of pairs.
+    :param date_built: When the citations were read from the DB.
+    """
+
+    def __init__(self, authorities: Dict[int, array], date_built) -> None:
+        self.authorities = authorities
+        self.date_built = date_built
+
+    def __len__(self) -> int:
+        return len(self.authorities)
+
+    def get_authority_ids(self, cluster_pk: int, date_filed: date) -> List:
+        """Get the IDs of the clusters a cluster cites, like
+        SCOTUSMap.get_authority_ids does.
+
+        :param cluster_pk: The ID of the citing cluster.
+        :param date_filed: The earliest date_filed of cited clusters to get.
+        :return: A list of cluster IDs, in date_filed order.
+        """
+        pairs = self.authorities.get(cluster_pk, ())
+        min_ordinal = date_filed.toordinal()
+        return [
+            pairs[i + 1]
+            for i in range(0, len(pairs), 2)
+            if pairs[i] >= min_ordinal
+        ]
+
+
+def make_citation_index() -> CitationIndex:
+    """Read the citations between Supreme Court clusters from the DB."""
+    date_built = now()
+    authorities = defaultdict(set)
+    for citing_pk, cited_pk, date_filed in (
+        OpinionsCited.objects.filter(
+            citing_opinion__cluster__docket__court="scotus",
+            cited_opinion__cluster__docket__court="scotus",
+        )
+        .values_list(
+            "citing_opinion__cluster_id",
+            "cited_opinion__cluster_id",
+            "cited_opinion__cluster__date_filed",
+        )
+        .iterator()
+    ):
+        authorities[citing_pk].add((date_filed.toordinal(), cited_pk))
+
+    return CitationIndex(
+        {
+            citing_pk: array("q", [n for pair in sorted(pairs) for n in pair])
+            for citing_pk, pairs in authorities.items()
+        },
+        date_built,
+    )
+
+
+def save_citation_index(index: CitationIndex, timeout: int) -> None:
+    """Store an index in the cache for every process to use."""
+    cache.set(CITATION_INDEX_CACHE_KEY, index, timeout)
+    cache.set(CITATION_INDEX_DATE_KEY, index.date_built, timeout)
+
+
+def get_citation_index() -> Optional[CitationIndex]:
+    """Get this process's citation index, loading it from the cache if a
+    newer one has been made.
+
+    :return: A CitationIndex, or None if none has been made.
+    """
+    global _index, _last_checked
+    now_ = time.monotonic()
+    if (
+        _index is not None
+        and now_ - _last_checked < CITATION_INDEX_CHECK_INTERVAL
+    ):
+        return _index
+
+    date_built = cache.get(CITATION_INDEX_DATE_KEY)
+    if date_built is None:
+        _index = None
+    elif _index is None or _index.date_built != date_built:
+        _index = cache.get(CITATION_INDEX_CACHE_KEY)
+    _last_checked = now_
+    return _index
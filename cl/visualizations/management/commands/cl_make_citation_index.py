@@ -0,0 +1,29 @@
+import time
+
+from cl.lib.command_utils import VerboseCommand, logger
+from cl.visualizations.citation_index import (
+    make_citation_index,
+    save_citation_index,
+)
+
+
+class Command(VerboseCommand):
+    help = (
+        "Index the citations between Supreme Court cases, so that SCOTUSMaps "
+        "can be built without querying the DB. Run this nightly."
+    )
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        t1 = time.time()
+        index = make_citation_index()
+        t2 = time.time()
+        # Keep it a few days, so maps are still fast if a run fails, but go
+        # back to querying the DB if the runs stop.
+        three_days = 60 * 60 * 24 * 3
+        save_citation_index(index, three_days)
+        logger.info(
+            "Indexed the citations of %s clusters in %.1f seconds.",
+            len(index),
+            t2 - t1,
+        )
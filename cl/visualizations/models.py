@@ -117,6 +117,7 @@ class SCOTUSMap(AbstractDateTimeModel):
         max_hops,
         hops_taken=0,
         max_nodes=70,
+        citation_index=None,
     ):
         """Recursively build a networkx graph
 
@@ -181,17 +182,65 @@ class SCOTUSMap(AbstractDateTimeModel):
         self.cluster_end
         :param max_hops: The maximum degree of separation for the network.
         :param max_nodes: The maximum number of nodes a network can contain.
+        :param citation_index: A CitationIndex to get citations from. If None,
+        they're queried from the DB.
         """
-        g = networkx.DiGraph()
         if len(good_nodes) == 0:
             # Add the beginning and end.
             good_nodes = {
                 self.cluster_start_id: {"shortest_path": 0},
             }
+        return self._build_nx_digraph(
+            parent_authority.pk,
+            visited_nodes,
+            good_nodes,
+            max_hops,
+            hops_taken,
+            max_nodes,
+            citation_index,
+        )
+
+    def get_authority_ids(self, cluster_pk, citation_index=None):
+        """Get the IDs of the Supreme Court clusters that a cluster cites,
+        that were filed on or after self.cluster_start.
+
+        :param cluster_pk: The ID of the citing cluster.
+        :param citation_index: A CitationIndex to get them from. If None,
+        they're queried from the DB.
+        :return: A list of cluster IDs, in date_filed order.
+        """
+        if citation_index is not None:
+            return citation_index.get_authority_ids(
+                cluster_pk, self.cluster_start.date_filed
+            )
+        return list(
+            OpinionCluster.objects.filter(
+                sub_opinions__citing_opinions__citing_opinion__cluster_id=cluster_pk,
+                docket__court="scotus",
+                date_filed__gte=self.cluster_start.date_filed,
+            )
+            .order_by("date_filed", "pk")
+            .values_list("pk", flat=True)
+            .distinct()
+        )
 
+    def _build_nx_digraph(
+        self,
+        parent_pk,
+        visited_nodes,
+        good_nodes,
+        max_hops,
+        hops_taken,
+        max_nodes,
+        citation_index,
+    ):
+        """Do the work of build_nx_digraph, using cluster IDs instead of
+        clusters.
+        """
+        g = networkx.DiGraph()
         is_already_handled_with_shorter_path = (
-            parent_authority.pk in visited_nodes
-            and visited_nodes[parent_authority.pk]["hops_taken"] < hops_taken
+            parent_pk in visited_nodes
+            and visited_nodes[parent_pk]["hops_taken"] < hops_taken
         )
         has_no_more_hops_remaining = hops_taken == max_hops
         blocking_conditions = [
@@ -199,67 +248,66 @@ class SCOTUSMap(AbstractDateTimeModel):
             has_no_more_hops_remaining,
         ]
         if not any(blocking_conditions):
-            visited_nodes[parent_authority.pk] = {"hops_taken": hops_taken}
+            visited_nodes[parent_pk] = {"hops_taken": hops_taken}
             hops_taken += 1
-            for child_authority in parent_authority.authorities.filter(
-                docket__court="scotus",
-                date_filed__gte=self.cluster_start.date_filed,
-            ).order_by("date_filed"):
+            for child_pk in self.get_authority_ids(parent_pk, citation_index):
                 # Combine our present graph with the result of the next
                 # recursion
                 sub_graph = networkx.DiGraph()
-                if child_authority == self.cluster_start:
+                if child_pk == self.cluster_start_id:
                     # Parent links to the starting point. Add an edge. No need
                     # to check distance here because we're already at the start
                     # node.
-                    g.add_edge(parent_authority.pk, child_authority.pk)
+                    g.add_edge(parent_pk, child_pk)
                     _ = set_shortest_path_to_end(
                         good_nodes,
-                        node_id=parent_authority.pk,
-                        target_id=child_authority.pk,
+                        node_id=parent_pk,
+                        target_id=child_pk,
                     )
-                elif child_authority.pk in good_nodes:
+                elif child_pk in good_nodes:
                     # Parent links to a node already in the network. Check if we
                     # could make it to the end in max_dod hops. Set
-                    # shortest_path for the child_authority
+                    # shortest_path for the child
                     if within_max_hops(
-                        good_nodes, child_authority.pk, hops_taken, max_hops
+                        good_nodes, child_pk, hops_taken, max_hops
                     ):
-                        g.add_edge(parent_authority.pk, child_authority.pk)
+                        g.add_edge(parent_pk, child_pk)
                         is_shorter = set_shortest_path_to_end(
                             good_nodes,
-                            node_id=parent_authority.pk,
-                            target_id=child_authority.pk,
+                            node_id=parent_pk,
+                            target_id=child_pk,
                         )
                         if is_shorter:
                             # New route to a node that's shorter than the old
                             # route. Thus, we must re-recurse its children.
-                            sub_graph = self.build_nx_digraph(
-                                parent_authority=child_authority,
+                            sub_graph = self._build_nx_digraph(
+                                parent_pk=child_pk,
                                 visited_nodes=visited_nodes,
                                 good_nodes=good_nodes,
                                 max_hops=max_hops,
                                 hops_taken=hops_taken,
                                 max_nodes=max_nodes,
+                                citation_index=citation_index,
                             )
                 else:
                     # No easy shortcuts. Recurse.
-                    sub_graph = self.build_nx_digraph(
-                        parent_authority=child_authority,
+                    sub_graph = self._build_nx_digraph(
+                        parent_pk=child_pk,
                         visited_nodes=visited_nodes,
                         good_nodes=good_nodes,
                         max_hops=max_hops,
                         hops_taken=hops_taken,
                         max_nodes=max_nodes,
+                        citation_index=citation_index,
                     )
 
                 if graphs_intersect(good_nodes, g, sub_graph):
                     # The graphs intersect. Merge them.
-                    g.add_edge(parent_authority.pk, child_authority.pk)
+                    g.add_edge(parent_pk, child_pk)
                     _ = set_shortest_path_to_end(
                         good_nodes,
-                        node_id=parent_authority.pk,
-                        target_id=child_authority.pk,
+                        node_id=parent_pk,
+                        target_id=child_pk,
                     )
                     g = networkx.compose(g, sub_graph)
 
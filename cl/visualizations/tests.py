@@ -2,7 +2,7 @@
 Unit tests for Visualizations
 """
 from django.contrib.auth.models import User
-from django.test import RequestFactory, TestCase
+from django.test import RequestFactory, TestCase, TransactionTestCase
 from django.urls import reverse
 from rest_framework.status import (
     HTTP_200_OK,
@@ -13,10 +13,12 @@ from rest_framework.status import (
 )
 from rest_framework.test import APITestCase
 
+from cl.lib.view_utils import flush_view_counts
 from cl.search.models import OpinionCluster
 from cl.tests.utils import make_client
 from cl.users.models import UserProfile
 from cl.visualizations import views
+from cl.visualizations.citation_index import make_citation_index
 from cl.visualizations.forms import VizForm
 from cl.visualizations.models import JSONVersion, SCOTUSMap
 from cl.visualizations.network_utils import reverse_endpoints_if_needed
@@ -88,6 +90,27 @@ class TestVizModels(TestCase):
         g = viz.build_nx_digraph(**build_kwargs)
         self.assertTrue(len(g.edges()) > 0)
 
+    def test_citation_index_builds_same_graph(self):
+        """Do we build the same graph from the citation index as from the
+        DB, without querying the DB?
+        """
+        viz = SCOTUSMap(
+            user=self.user,
+            cluster_start=self.start,
+            cluster_end=self.end,
+            title="Test SCOTUSMap",
+            notes="Test Notes",
+        )
+        index = make_citation_index()
+        for max_hops in (1, 2, 3):
+            g = viz.build_nx_digraph(self.end, {}, {}, max_hops)
+            with self.assertNumQueries(0):
+                indexed_g = viz.build_nx_digraph(
+                    self.end, {}, {}, max_hops, citation_index=index
+                )
+            self.assertEqual(set(g.nodes()), set(indexed_g.nodes()))
+            self.assertEqual(set(g.edges()), set(indexed_g.edges()))
+
     def test_SCOTUSMap_deletes_cascade(self):
         """
         Make sure we delete JSONVersion instances when deleted SCOTUSMaps
@@ -188,11 +211,25 @@ class TestViews(TestCase):
         self.assertNotEqual(response.status_code, 200)
         self.assertNotIn("My Private Visualization", response.content.decode())
 
+
+class TestVizViewCounts(TransactionTestCase):
+    """View counts are written to the DB when the flush commits, so this
+    needs real transactions.
+    """
+
+    fixtures = ["scotus_map_data.json", "visualizations.json"]
+
+    def setUp(self):
+        self.user = User.objects.create_user("user", "user@cl.com", "password")
+        UserProfile.objects.create(user=self.user, email_confirmed=True)
+
     def test_view_counts_increment_by_one(self):
         """Test the view count for a Visualization increments on page view
 
         Ensure that the date_modified does not change.
         """
+        # Write out any views left over from other tests.
+        flush_view_counts()
         viz = SCOTUSMap.objects.get(pk=1)
         old_view_count = viz.view_count
         old_date_modified = viz.date_modified
@@ -202,6 +239,7 @@ class TestViews(TestCase):
         )
         response = self.client.get(viz.get_absolute_url())
 
+        flush_view_counts()
         viz.refresh_from_db(fields=["view_count", "date_modified"])
         self.assertEqual(response.status_code, 200)
         self.assertEqual(old_view_count + 1, viz.view_count)
@@ -4,6 +4,7 @@ from django.conf import settings
 from django.contrib import messages
 
 from cl.stats.utils import tally_stat
+from cl.visualizations.citation_index import get_citation_index
 from cl.visualizations.exceptions import TooManyNodes
 from cl.visualizations.models import JSONVersion
 
@@ -20,6 +21,9 @@ def build_visualization(viz):
         "good_nodes": {},
         "max_hops": 3,
     }
+    if viz.cluster_end.docket.court_id == "scotus":
+        # The index only has citations from the Supreme Court.
+        build_kwargs["citation_index"] = get_citation_index()
     t1 = time.time()
     try:
         g = viz.build_nx_digraph(**build_kwargs)